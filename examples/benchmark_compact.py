@@ -0,0 +1,291 @@
+"""Benchmark compact-mode truncation on a synthetic multi-megabyte trace payload.
+
+Compares compact_encode, which process_compact_data uses, with a copy of the original
+multi-pass truncate_large_strings, and checks that the size compact_encode reports is the
+byte length of its output as compact JSON. The two do not return identical output: the
+original counts its budget in characters and compact_encode in serialized bytes.
+
+    uv run examples/benchmark_compact.py --observations 2000 --repeat 5
+"""
+
+import argparse
+import json
+import logging
+import random
+import time
+from typing import Any
+
+from langfuse_mcp.__main__ import (
+    ESSENTIAL_FIELDS,
+    LOWER_LARGE_FIELDS,
+    MAX_FIELD_LENGTH,
+    MAX_RESPONSE_SIZE,
+    TRUNCATE_SUFFIX,
+    compact_encode,
+)
+
+logger = logging.getLogger("langfuse_mcp")
+
+
+def truncate_large_strings(
+    obj: Any,
+    max_length: int = MAX_FIELD_LENGTH,
+    max_response_size: int = MAX_RESPONSE_SIZE,
+    path: str = "",
+    current_size: int = 0,
+    truncation_level: int = 0,
+) -> tuple[Any, int]:
+    """Recursively process an object and truncate large string values with intelligent list handling.
+
+    Copy of the multi-pass implementation compact output used before compact_encode, kept
+    here as the benchmark baseline.
+
+    Args:
+        obj: The object to process (dict, list, string, etc.)
+        max_length: Maximum length for string values
+        max_response_size: Maximum total response size in characters
+        path: Current path in the object (for nested objects)
+        current_size: Current size of the processed object
+        truncation_level: Level of truncation to apply (0=normal, 1=aggressive, 2=minimal)
+
+    Returns:
+        Tuple of (processed object, size of processed object)
+    """
+    # Calculate adjusted max_length based on truncation level
+    adjusted_max_length = max_length
+    if truncation_level == 1:
+        # More aggressive truncation for level 1
+        adjusted_max_length = max(50, max_length // 2)
+    elif truncation_level == 2:
+        # Minimal representation for level 2 (extreme truncation)
+        adjusted_max_length = max(20, max_length // 5)
+
+    # Base case: if we've already exceeded max response size by a lot, return minimal representation
+    if current_size > max_response_size * 1.5:
+        return "[TRUNCATED]", len("[TRUNCATED]")
+
+    # Handle different types
+    if isinstance(obj, dict):
+        result = {}
+        result_size = 2  # Count braces
+
+        # First pass: always process essential fields first
+        for key in list(obj.keys()):
+            if key in ESSENTIAL_FIELDS:
+                processed_value, value_size = truncate_large_strings(
+                    obj[key],
+                    adjusted_max_length,
+                    max_response_size,
+                    f"{path}.{key}" if path else key,
+                    current_size + result_size,
+                    truncation_level,
+                )
+                result[key] = processed_value
+                result_size += len(str(key)) + 2 + value_size  # key + colon + value size
+
+        # Second pass: process known large fields next
+        if truncation_level < 2:  # Skip detailed content at highest truncation level
+            for key in list(obj.keys()):
+                lower_key = key.lower()
+                if lower_key in LOWER_LARGE_FIELDS or any(field in lower_key for field in LOWER_LARGE_FIELDS):
+                    if key not in result:  # Skip if already processed
+                        value = obj[key]
+                        if isinstance(value, str) and len(value) > adjusted_max_length:
+                            # For stacktraces, keep first and last few lines
+                            if "stack" in key.lower() and "\n" in value:
+                                lines = value.split("\n")
+                                if len(lines) > 6:
+                                    # Keep first 3 and last 3 lines for context
+                                    truncated_stack = "\n".join(lines[:3] + ["..."] + lines[-3:])
+                                    result[key] = truncated_stack
+                                    logger.debug(f"Truncated stack in {path}.{key} from {len(lines)} lines to 7 lines")
+                                    result_size += len(str(key)) + 2 + len(truncated_stack)
+                                else:
+                                    result[key] = value
+                                    result_size += len(str(key)) + 2 + len(value)
+                            else:
+                                # For other large text fields, regular truncation
+                                result[key] = value[:adjusted_max_length] + TRUNCATE_SUFFIX
+                                logger.debug(f"Truncated field {path}.{key} from {len(value)} to {adjusted_max_length} chars")
+                                result_size += len(str(key)) + 2 + adjusted_max_length + len(TRUNCATE_SUFFIX)
+                        else:
+                            processed_value, value_size = truncate_large_strings(
+                                value,
+                                adjusted_max_length,
+                                max_response_size,
+                                f"{path}.{key}" if path else key,
+                                current_size + result_size,
+                                truncation_level,
+                            )
+                            result[key] = processed_value
+                            result_size += len(str(key)) + 2 + value_size
+
+        # Final pass: process remaining fields if we have size budget remaining
+        remaining_fields = [k for k in obj if k not in result]
+
+        # Skip non-essential fields at highest truncation level
+        if truncation_level >= 2 and len(remaining_fields) > 0:
+            result["_note"] = f"{len(remaining_fields)} non-essential fields omitted"
+            result_size += len("_note") + 2 + len(result["_note"])
+        else:
+            for key in remaining_fields:
+                # Skip if we're approaching max size and apply more aggressive truncation
+                if current_size + result_size > max_response_size * 0.9:
+                    # Instead of breaking, increase truncation level for remaining fields
+                    next_truncation_level = min(2, truncation_level + 1)
+                    if next_truncation_level > truncation_level:
+                        result["_truncation_note"] = "Response truncated due to size constraints"
+                        result_size += len("_truncation_note") + 2 + len(result["_truncation_note"])
+
+                processed_value, value_size = truncate_large_strings(
+                    obj[key],
+                    adjusted_max_length,
+                    max_response_size,
+                    f"{path}.{key}" if path else key,
+                    current_size + result_size,
+                    min(2, truncation_level + (1 if current_size + result_size > max_response_size * 0.7 else 0)),
+                )
+                result[key] = processed_value
+                result_size += len(str(key)) + 2 + value_size
+
+        return result, result_size
+
+    elif isinstance(obj, list):
+        result = []
+        result_size = 2  # Count brackets
+
+        # Special handling for empty lists
+        if not obj:
+            return [], 2
+
+        # Estimate average item size to plan truncation strategy
+        # We'll sample the first item or use a default
+        sample_size = 0
+        if obj:
+            sample_item, sample_size = truncate_large_strings(
+                obj[0], adjusted_max_length, max_response_size, f"{path}[0]", current_size + result_size, truncation_level
+            )
+
+        estimated_total_size = sample_size * len(obj)
+
+        # Determine the appropriate truncation strategy based on estimated size
+        target_truncation_level = truncation_level
+        if estimated_total_size > max_response_size * 0.8:
+            # If the list would be too large, increase truncation level
+            target_truncation_level = min(2, truncation_level + 1)
+
+        # If even at max truncation we'd exceed size, we need to limit the number of items
+        will_need_item_limit = False
+        if target_truncation_level == 2 and estimated_total_size > max_response_size:
+            will_need_item_limit = True
+            max_items = max(5, int(max_response_size * 0.8 / (sample_size or 100)))
+        else:
+            max_items = len(obj)
+
+        # Process items with appropriate truncation level
+        for i, item in enumerate(obj):
+            if will_need_item_limit and i >= max_items:
+                result.append({"_note": f"List truncated, {len(obj) - i} of {len(obj)} items omitted due to size constraints"})
+                result_size += 2 + len(result[-1]["_note"])
+                break
+
+            item_truncation_level = target_truncation_level
+            # Apply even more aggressive truncation as we approach the limit
+            if current_size + result_size > max_response_size * 0.8:
+                item_truncation_level = 2
+
+            processed_item, item_size = truncate_large_strings(
+                item, adjusted_max_length, max_response_size, f"{path}[{i}]", current_size + result_size, item_truncation_level
+            )
+            result.append(processed_item)
+            result_size += item_size
+            if i < len(obj) - 1:
+                result_size += 1  # Count comma
+
+        return result, result_size
+
+    elif isinstance(obj, str):
+        # String truncation strategy based on truncation level
+        if len(obj) <= adjusted_max_length:
+            return obj, len(obj)
+
+        # Special handling for stacktraces at normal truncation level
+        if truncation_level == 0 and ("stacktrace" in path.lower() or "stack" in path.lower()) and "\n" in obj:
+            lines = obj.split("\n")
+            if len(lines) > 6:
+                # Keep first 3 and last 3 lines for context at normal level
+                truncated = "\n".join(lines[:3] + ["..."] + lines[-3:])
+                return truncated, len(truncated)
+
+        # Regular string truncation with adjusted max length
+        if len(obj) > adjusted_max_length:
+            truncated = obj[:adjusted_max_length] + TRUNCATE_SUFFIX
+            return truncated, len(truncated)
+
+        return obj, len(obj)
+
+    else:
+        # For other types (int, float, bool, None), return as is
+        return obj, len(str(obj))
+
+
+def build_payload(observation_count: int, seed: int = 0) -> list[dict]:
+    """Build a list of observations shaped like a large LangGraph trace."""
+    rng = random.Random(seed)
+    stack = "\n".join(f'  File "graph/node_{i}.py", line {i * 7}, in run' for i in range(30))
+    observations = []
+    for i in range(observation_count):
+        observations.append(
+            {
+                "id": f"obs_{i}",
+                "trace_id": "trace_1",
+                "type": rng.choice(["GENERATION", "SPAN", "EVENT"]),
+                "name": f"node_{i % 17}",
+                "start_time": "2024-01-01T00:00:00Z",
+                "input": {"messages": [{"role": "user", "content": "x" * rng.randint(200, 4000)} for _ in range(3)]},
+                "output": {"content": "y" * rng.randint(200, 4000)},
+                "metadata": {"langgraph_node": f"node_{i % 17}", "stackTrace": stack, "tags": ["a", "b"]},
+                "usage": {"input": rng.randint(10, 4000), "output": rng.randint(10, 4000)},
+            }
+        )
+    return observations
+
+
+def best_of(func, payload, repeat: int) -> float:
+    """Return the fastest wall-clock time of ``repeat`` runs in seconds."""
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func(payload)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main() -> None:
+    """Run the benchmark and print timings and output sizes for both implementations."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--observations", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    payload = build_payload(args.observations)
+    print(f"payload: {args.observations} observations, {len(json.dumps(payload)) / 1e6:.1f} MB as JSON")
+
+    processed, size = compact_encode(payload)
+    serialized = len(json.dumps(processed, separators=(",", ":"), ensure_ascii=False).encode("utf-8"))
+    if size != serialized:
+        raise SystemExit(f"compact_encode reported {size} bytes, output serializes to {serialized}")
+    reference_output, reference_size = truncate_large_strings(payload)
+    reference_serialized = len(json.dumps(reference_output, separators=(",", ":"), ensure_ascii=False).encode("utf-8"))
+
+    reference = best_of(truncate_large_strings, payload, args.repeat)
+    single_pass = best_of(compact_encode, payload, args.repeat)
+    print(
+        f"truncate_large_strings: {reference * 1000:8.2f} ms, "
+        f"output {reference_serialized} bytes (estimated {reference_size} characters)"
+    )
+    print(f"compact_encode:         {single_pass * 1000:8.2f} ms, output {size} bytes  ({reference / single_pass:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
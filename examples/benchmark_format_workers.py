@@ -0,0 +1,86 @@
+"""Benchmark formatting training samples in a worker thread versus a process pool.
+
+Formats synthetic GENERATION observations page by page through _format_samples, the
+way fetch_llm_training_data does: once in a worker thread and once with a process pool
+of --workers processes (the --format-workers option). The pool is started before the
+timed run, so the numbers show steady-state throughput of large extractions.
+
+    uv run examples/benchmark_format_workers.py --observations 20000 --workers 4
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from types import SimpleNamespace
+from typing import Any
+
+from langfuse_mcp.__main__ import _format_samples
+
+
+def build_observations(count: int, prompt_chars: int, seed: int = 0) -> list[dict[str, Any]]:
+    """Build chat GENERATION observations with a system prompt, a few turns and metadata."""
+    rng = random.Random(seed)
+    words = ["alpha", "bravo", "charlie", "delta", "echo", "foxtrot", "golf", "hotel", "india", "juliet"]
+
+    def text(chars: int) -> str:
+        return " ".join(rng.choice(words) for _ in range(chars // 6))
+
+    return [
+        {
+            "id": f"gen-{k}",
+            "type": "GENERATION",
+            "start_time": "2024-05-01T12:00:00Z",
+            "model": "gpt-4o",
+            "model_parameters": {"temperature": 0.2, "max_tokens": 1024},
+            "usage": {"input": prompt_chars // 4, "output": 120, "total": prompt_chars // 4 + 120},
+            "input": [
+                {"role": "system", "content": text(prompt_chars // 2)},
+                {"role": "user", "content": text(prompt_chars // 4)},
+                {"role": "assistant", "content": text(200)},
+                {"role": "user", "content": text(prompt_chars // 4)},
+            ],
+            "output": {"role": "assistant", "content": text(600)},
+            "metadata": {"langgraph_node": "llm_call", "agent_name": "worker", "ls_model_name": "gpt-4o"},
+        }
+        for k in range(count)
+    ]
+
+
+async def run(state: Any, pages: list[list[dict[str, Any]]], output_format: str) -> tuple[float, int]:
+    """Format every page in order; return (seconds, samples)."""
+    started = time.perf_counter()
+    samples = 0
+    for page in pages:
+        samples += sum(1 for sample in await _format_samples(state, page, output_format, True) if sample)
+    return time.perf_counter() - started, samples
+
+
+def main() -> None:
+    """Run the benchmark and print a summary."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--observations", type=int, default=20_000)
+    parser.add_argument("--prompt-chars", type=int, default=8_000)
+    parser.add_argument("--page-size", type=int, default=100)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--output-format", default="openai", choices=["openai", "anthropic", "generic", "dpo"])
+    args = parser.parse_args()
+
+    observations = build_observations(args.observations, args.prompt_chars)
+    pages = [observations[i : i + args.page_size] for i in range(0, len(observations), args.page_size)]
+    print(f"{len(observations)} observations in {len(pages)} pages, ~{args.prompt_chars} prompt characters each")
+
+    thread_seconds, samples = asyncio.run(run(SimpleNamespace(format_executor=None), pages, args.output_format))
+    print(f"    thread: {thread_seconds:.2f}s ({samples / thread_seconds:,.0f} samples/s)")
+
+    context = multiprocessing.get_context("fork" if "fork" in multiprocessing.get_all_start_methods() else "spawn")
+    with ProcessPoolExecutor(max_workers=args.workers, mp_context=context) as executor:
+        list(executor.map(int, range(args.workers)))  # start the workers before timing
+        pool_seconds, pooled = asyncio.run(run(SimpleNamespace(format_executor=executor), pages, args.output_format))
+    print(f"{args.workers:>2} workers: {pool_seconds:.2f}s ({pooled / pool_seconds:,.0f} samples/s), {thread_seconds / pool_seconds:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""Benchmark the JSON backends of JSONCodec on a synthetic trace dump.
+
+Times compact encoding, pretty-printed encoding and decoding for every installed
+backend (json, and orjson / msgspec when available) on traces with CJK content,
+the shape written by full_json_file dumps and the observation store.
+
+    uv run --with orjson --with msgspec examples/benchmark_json.py --traces 200 --repeat 5
+"""
+
+import argparse
+import random
+import time
+
+from langfuse_mcp.__main__ import JSON_BACKENDS, JSONCodec
+
+
+def build_payload(trace_count: int, seed: int = 0) -> list[dict]:
+    """Build traces with embedded observations and mixed ASCII / CJK text."""
+    rng = random.Random(seed)
+    text = "用户询问了关于订单状态的问题。The assistant checked the order service. "
+    traces = []
+    for t in range(trace_count):
+        observations = [
+            {
+                "id": f"obs_{t}_{o}",
+                "trace_id": f"trace_{t}",
+                "type": "GENERATION",
+                "start_time": "2024-01-01T00:00:00.000Z",
+                "model": "gpt-4o",
+                "input": {"messages": [{"role": "user", "content": text * rng.randint(5, 60)}]},
+                "output": {"content": text * rng.randint(5, 60)},
+                "metadata": {"langgraph_node": f"node_{o}", "ls_model_name": "gpt-4o"},
+                "usage": {"input": rng.randint(10, 4000), "output": rng.randint(10, 4000), "total_cost": rng.random()},
+            }
+            for o in range(10)
+        ]
+        traces.append({"id": f"trace_{t}", "name": "订单助手", "tags": ["prod"], "observations": observations})
+    return traces
+
+
+def best_of(func, repeat: int) -> float:
+    """Return the fastest wall-clock time of ``repeat`` runs in seconds."""
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main() -> None:
+    """Run the benchmark and print one row per installed backend."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--traces", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    payload = build_payload(args.traces)
+    document = JSONCodec("json").dumps_bytes(payload)
+    print(f"payload: {args.traces} traces, {len(document) / 1e6:.1f} MB as JSON")
+    print(f"{'backend':<10}{'dumps':>12}{'dumps indent':>15}{'loads':>12}")
+
+    for backend in JSON_BACKENDS[1:]:
+        try:
+            codec = JSONCodec(backend)
+        except ValueError:
+            print(f"{backend:<10}{'not installed':>12}")
+            continue
+        dumps = best_of(lambda: codec.dumps(payload), args.repeat)
+        dumps_indent = best_of(lambda: codec.dumps_bytes(payload, indent=True), args.repeat)
+        loads = best_of(lambda: codec.loads(document), args.repeat)
+        print(f"{backend:<10}{dumps * 1000:10.1f}ms{dumps_indent * 1000:13.1f}ms{loads * 1000:10.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""Benchmark MinHash/LSH near-duplicate filtering of training prompts.
+
+Streams synthetic prompts through NearDuplicateFilter page by page, the way
+fetch_llm_training_data does. Each prompt is one of --distinct templates and
+differs from its template only in timestamps and ticket IDs. The script reports
+throughput, peak traced memory and how many prompts were kept.
+
+    uv run --with numpy examples/benchmark_near_dedupe.py --samples 100000 --distinct 20000
+"""
+
+import argparse
+import random
+import string
+import time
+import tracemalloc
+
+from langfuse_mcp.__main__ import NearDuplicateFilter
+
+
+def build_prompts(samples: int, distinct: int, seed: int = 0) -> list[str]:
+    """Build prompts from `distinct` templates with varying timestamps and IDs."""
+    rng = random.Random(seed)
+    vocabulary = ["".join(rng.choice(string.ascii_lowercase) for _ in range(6)) for _ in range(5000)]
+    templates = [" ".join(rng.choice(vocabulary) for _ in range(60)) for _ in range(distinct)]
+    return [
+        f"[2024-05-{i % 28 + 1:02d}T{i % 24:02d}:{i % 60:02d}:00Z] ticket #{100000 + i}: {templates[i % distinct]}"
+        for i in range(samples)
+    ]
+
+
+def main() -> None:
+    """Run the benchmark and print a summary."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--samples", type=int, default=100_000)
+    parser.add_argument("--distinct", type=int, default=20_000)
+    parser.add_argument("--threshold", type=float, default=0.8)
+    parser.add_argument("--page-size", type=int, default=100)
+    args = parser.parse_args()
+
+    prompts = build_prompts(args.samples, args.distinct)
+    near = NearDuplicateFilter(args.threshold)
+    print(f"{args.samples} prompts from {args.distinct} templates, threshold {args.threshold}, bands {near.bands}x{near.rows}")
+
+    tracemalloc.start()
+    started = time.perf_counter()
+    kept = 0
+    for offset in range(0, len(prompts), args.page_size):
+        kept += sum(near.filter(prompts[offset : offset + args.page_size]))
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+
+    print(f"kept {kept}, dropped {near.duplicates} in {elapsed:.1f}s ({args.samples / elapsed:,.0f} prompts/s)")
+    print(f"peak traced memory: {peak / 1e6:.0f} MB")
+
+
+if __name__ == "__main__":
+    main()
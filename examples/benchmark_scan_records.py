@@ -0,0 +1,155 @@
+"""Benchmark the span records kept by the exception scans.
+
+Decodes synthetic SPAN pages the way the REST client does, then keeps the spans
+with exception events either as full observation dicts (the previous scan path)
+or as SpanRecord objects, buckets them with ObservationBucketCache and stitches
+the window back together. The script reports the CPU time of decoding (shared by
+both variants) and of keeping, bucketing and stitching, plus peak traced memory
+and the memory still held by the cached spans for each variant.
+
+    uv run examples/benchmark_scan_records.py --spans 100000 --exception-ratio 0.3
+"""
+
+import argparse
+import gc
+import random
+import time
+import tracemalloc
+from datetime import UTC, datetime, timedelta
+from typing import Any
+
+from cachetools import LRUCache
+
+from langfuse_mcp.__main__ import (
+    ObservationBucketCache,
+    SpanRecord,
+    _normalize_api_payload,
+    _record,
+    _to_epoch,
+    json_codec,
+)
+
+
+def build_pages(spans: int, exception_ratio: float, page_size: int, now: datetime, seed: int = 0) -> list[bytes]:
+    """Encode synthetic spans as REST API pages, newest first."""
+    rng = random.Random(seed)
+    pages, page = [], []
+    for k in range(spans):
+        events = []
+        if rng.random() < exception_ratio:
+            events.append(
+                {
+                    "id": f"event-{k}",
+                    "name": "exception",
+                    "attributes": {
+                        "exception.type": rng.choice(["ValueError", "KeyError", "TimeoutError"]),
+                        "exception.message": f"failed to process item {k}",
+                        "exception.stacktrace": "Traceback (most recent call last):\n" + '  File "app.py", line 42\n' * 8,
+                    },
+                }
+            )
+        page.append(
+            {
+                "id": f"span-{k}",
+                "traceId": f"trace-{k // 7}",
+                "type": "SPAN",
+                "name": f"handler_{k % 20}",
+                "startTime": (now - timedelta(seconds=3 * k)).isoformat().replace("+00:00", "Z"),
+                "endTime": (now - timedelta(seconds=3 * k - 1)).isoformat().replace("+00:00", "Z"),
+                "input": {"query": "lorem ipsum " * 40, "user": f"user-{k % 500}"},
+                "output": {"result": "dolor sit amet " * 40},
+                "metadata": {
+                    "code.filepath": f"services/module_{k % 30}.py",
+                    "code.function": f"handler_{k % 20}",
+                    "code.lineno": 40 + k % 100,
+                    "service.name": "api",
+                    "deployment.environment": "production",
+                },
+                "events": events,
+                "level": "ERROR" if events else "DEFAULT",
+            }
+        )
+        if len(page) == page_size:
+            pages.append(json_codec.dumps_bytes({"data": page, "meta": {}}))
+            page = []
+    if page:
+        pages.append(json_codec.dumps_bytes({"data": page, "meta": {}}))
+    return pages
+
+
+def keep_dict(item: dict[str, Any]) -> dict[str, Any] | None:
+    """Previous scan path: keep a copy of the whole observation when it has exception events."""
+    observation = _record(item)
+    for event in observation.get("events") or []:
+        if (event.get("attributes") or {}).get("exception.type"):
+            return observation if _to_epoch(observation.get("start_time")) is not None else None
+    return None
+
+
+def run(pages: list[bytes], keep: Any, start: datetime, end: datetime) -> tuple[float, float, int]:
+    """Scan, bucket and stitch the pages; return (decode seconds, keep/bucket/stitch seconds, kept spans)."""
+    decode = process = 0.0
+    kept = []
+    for page in pages:
+        started = time.perf_counter()
+        items = _normalize_api_payload(json_codec.loads(page)["data"])
+        decoded = time.perf_counter()
+        for item in items:
+            span = keep(item)
+            if span is not None:
+                kept.append(span)
+        del items
+        decode += decoded - started
+        process += time.perf_counter() - decoded
+    started = time.perf_counter()
+    cache = ObservationBucketCache(LRUCache(maxsize=100_000), settle_delay=0)
+    buckets = cache.store("SPAN:exceptions", start, end, kept, now=end)
+    del kept
+    ObservationBucketCache.stitch(buckets, start, end)
+    process += time.perf_counter() - started
+    return decode, process, sum(len(bucket) for bucket in buckets.values())
+
+
+def measure_memory(pages: list[bytes], keep: Any, start: datetime, end: datetime) -> tuple[int, int]:
+    """Return (peak bytes, bytes retained by the cached spans) of one scan."""
+    gc.collect()
+    tracemalloc.start()
+    kept = []
+    for page in pages:
+        for item in _normalize_api_payload(json_codec.loads(page)["data"]):
+            span = keep(item)
+            if span is not None:
+                kept.append(span)
+    buckets = ObservationBucketCache(LRUCache(maxsize=100_000), settle_delay=0).store("SPAN:exceptions", start, end, kept, now=end)
+    del kept
+    gc.collect()
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del buckets
+    return peak, retained
+
+
+def main() -> None:
+    """Run the benchmark and print a summary."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--spans", type=int, default=100_000)
+    parser.add_argument("--exception-ratio", type=float, default=0.3)
+    parser.add_argument("--page-size", type=int, default=100)
+    args = parser.parse_args()
+
+    end = datetime.now(UTC).replace(minute=0, second=0, microsecond=0) + timedelta(hours=1)
+    start = end - timedelta(seconds=3 * args.spans + 3600)
+    pages = build_pages(args.spans, args.exception_ratio, args.page_size, end - timedelta(hours=1))
+    print(f"{args.spans} spans in {len(pages)} pages ({sum(map(len, pages)) / 1e6:.0f} MB encoded), exception ratio {args.exception_ratio}")
+
+    for name, keep in (("dict", keep_dict), ("SpanRecord", SpanRecord.from_item)):
+        decode, process, kept = run(pages, keep, start, end)
+        peak, retained = measure_memory(pages, keep, start, end)
+        print(
+            f"{name:>10}: decode {decode:.2f}s + keep/bucket/stitch {process:.2f}s, kept {kept}, "
+            f"peak {peak / 1e6:.0f} MB, retained {retained / 1e6:.1f} MB"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -6,24 +6,41 @@ agents to query trace data, observations, and exceptions from Langfuse.
 
 import argparse
 import asyncio
+import gzip
+import hashlib
+import heapq
 import inspect
+import itertools
 import json
 import logging
+import math
+import multiprocessing
 import os
 import random
+import re
+import shutil
+import sqlite3
+import struct
 import sys
+import tempfile
+import threading
 import time
-from collections import Counter
-from collections.abc import AsyncIterator, Callable
+import uuid
+from collections import Counter, deque
+from collections.abc import AsyncIterator, Awaitable, Callable, Iterable, Iterator
+from concurrent.futures import Executor, ProcessPoolExecutor
 from contextlib import asynccontextmanager, contextmanager
 from dataclasses import dataclass, field
 from datetime import UTC, datetime, timedelta
+from email.utils import parsedate_to_datetime
 from enum import Enum
 from functools import lru_cache
 from importlib.metadata import PackageNotFoundError, version
 from logging.handlers import RotatingFileHandler
 from pathlib import Path
+from types import SimpleNamespace
 from typing import Annotated, Any, Literal, cast
+from urllib.parse import quote
 
 from cachetools import LRUCache
 import httpx
@@ -38,6 +55,31 @@ from langfuse import Langfuse
 from mcp.server.fastmcp import Context, FastMCP
 from pydantic import AfterValidator, BaseModel, Field
 
+try:
+    import orjson
+except ImportError:  # Optional fast JSON backend
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:  # Optional fast JSON backend
+    msgspec = None
+
+try:
+    import numpy
+except ImportError:  # Optional: only needed for near-duplicate filtering of training samples
+    numpy = None
+
+try:
+    import zstandard
+except ImportError:  # Optional: only needed for zstd-compressed dumps
+    zstandard = None
+
+try:
+    import fcntl
+except ImportError:  # Not available on Windows; dedupe files are then only locked within this process
+    fcntl = None
+
 try:
     __version__ = version("langfuse-mcp")
 except PackageNotFoundError:
@@ -89,8 +131,34 @@ logger = logging.getLogger("langfuse_mcp")
 HOUR = 60  # minutes
 DAY = 24 * HOUR
 MAX_FIELD_LENGTH = 500  # Maximum string length for field values
-MAX_RESPONSE_SIZE = 20000  # Maximum size of response object in characters
+MAX_RESPONSE_SIZE = 20000  # Maximum size of a compact response in UTF-8 bytes of JSON
 TRUNCATE_SUFFIX = "..."  # Suffix to add to truncated fields
+DUMP_COMPRESSIONS = ("none", "gzip", "zstd")  # Supported compression for full_json_file dumps
+DUMP_FILE_EXTENSIONS = {"none": ".json", "gzip": ".json.gz", "zstd": ".json.zst"}
+DUMP_WRITE_BUFFER = 1 << 16  # Bytes of encoded JSON collected before a dump writes to its file or compressor
+JSON_BACKENDS = ("auto", "orjson", "msgspec", "json")  # Selectable serialization backends
+HYDRATION_PAGE_SIZE = 100  # Page size for bulk per-trace observation listing
+HYDRATION_CONCURRENCY = 8  # Concurrent requests when embedding observations into traces
+STORE_SETTLE_DELAY = 3600  # Seconds after which observation time ranges are treated as immutable
+OBSERVATION_BUCKET_SECONDS = 3600  # Width of the aligned time buckets of the observation cache
+OBSERVATION_CACHE_TTL = 60  # Seconds a cached bucket that may still receive observations is reused
+SESSION_TRACES_PAGE_SIZE = 100  # Page size of the trace walks behind get_user_sessions and get_session_details
+SESSION_IDLE_SECONDS = 3600  # Seconds without new traces after which get_session_details caches a session as immutable
+MAX_FILE_EXCEPTIONS = 10  # Newest exceptions returned by find_exceptions_in_file
+EXCEPTION_SCOPE = "SPAN:exceptions"  # Cache and index scope of spans carrying exception events
+CHECKPOINT_SUFFIX = ".checkpoint"  # Sidecar of an incremental training-data file recording extraction progress
+CHECKPOINT_VERSION = 1
+MAX_TRAINING_JOBS = 2  # Background training-data jobs running at the same time
+DEDUPE_MODES = ("off", "exact", "bloom")  # Content deduplication of training samples
+DEDUPE_MEMORY_LIMIT = 1_000_000  # Sample digests held in memory before spilling to disk
+DEDUPE_BLOOM_CAPACITY = 10_000_000  # Samples the dedupe Bloom filter is sized for (about 18 MB)
+DEDUPE_BLOOM_ERROR_RATE = 0.001  # Fraction of unique samples the Bloom filter may drop
+DEDUPE_SQLITE_TIMEOUT = 30.0  # Seconds an exact-mode run waits for another run's write to the shared seen set
+FORMAT_CHUNK_SIZE = 25  # Observations per task sent to the formatting pool; a 100-observation page fans out to 4 tasks
+TRAINING_PREVIEW_SAMPLES = 20  # Samples returned inline when training data is streamed to disk
+TRAINING_WRITE_QUEUE_PAGES = 4  # Formatted pages waiting for the training-data writer before the scan pauses
+NEAR_DEDUPE_PERMUTATIONS = 128  # MinHash signature length of near-duplicate filtering
+NEAR_DEDUPE_SHINGLE_SIZE = 5  # Byte shingle length of near-duplicate filtering
 
 # Common field names that often contain large values
 LARGE_FIELDS = [
@@ -148,6 +216,24 @@ ESSENTIAL_FIELDS = [
     "session_id",
 ]
 
+# Field groups of the traces `fields` selector and the top-level keys only they return
+TRACE_FIELD_GROUPS = {
+    "io": {"input", "output", "metadata"},
+    "scores": {"scores"},
+    "observations": {"observations"},
+    "metrics": {"latency", "total_cost"},
+}
+
+# Training-data metadata predicates that translate into the observations `filter` query parameter.
+# ls_model_name is a case-insensitive substring match, which has no server-side equivalent.
+PUSHDOWN_METADATA_FILTERS = ("langgraph_node", "agent_name")
+
+FIELDS_DESCRIPTION = (
+    "Optional comma-separated dotted paths to return instead of whole objects, e.g. 'id,name,metadata.langgraph_node,usage'. "
+    "Paths use the snake_case keys of the returned objects and apply to every element of a list. "
+    "Fields that are not requested are dropped before truncation and serialization."
+)
+
 
 # Literal enum for output modes
 class OutputMode(str, Enum):
@@ -306,10 +392,18 @@ class ErrorClassifier:
             if retry_after:
                 try:
                     # Try to parse as seconds
-                    return float(retry_after)
+                    return max(0.0, float(retry_after))
                 except ValueError:
-                    # Could be HTTP-date format, not handling for now
+                    pass
+                try:
+                    # Fall back to the HTTP-date form, e.g. "Wed, 21 Oct 2015 07:28:00 GMT"
+                    retry_at = parsedate_to_datetime(retry_after)
+                except (TypeError, ValueError):
                     logger.debug(f"Could not parse Retry-After header: {retry_after}")
+                    return None
+                if retry_at.tzinfo is None:
+                    retry_at = retry_at.replace(tzinfo=UTC)
+                return max(0.0, (retry_at - datetime.now(UTC)).total_seconds())
         return None
 
 
@@ -324,6 +418,222 @@ class RetryConfig:
     jitter: bool = True  # Add random jitter to avoid thundering herd
 
 
+class RateLimiter:
+    """Process-wide async limiter shared by every Langfuse API request.
+
+    Combines a token bucket (sustained request rate plus a burst allowance), a cap on the
+    number of concurrent requests, and a global pause that is triggered when Langfuse answers
+    with HTTP 429 so that all tools back off together instead of retrying independently.
+    """
+
+    RATE_WINDOW = 10.0  # Seconds of history used to report the observed request rate
+
+    def __init__(self, rate: float = 10.0, max_concurrency: int = 8, burst: int | None = None):
+        """Initialize the limiter.
+
+        Args:
+            rate: Sustained requests per second (0 or negative disables the token bucket)
+            max_concurrency: Maximum number of requests in flight
+            burst: Token bucket capacity (defaults to one second worth of requests)
+        """
+        self.rate = rate
+        self.max_concurrency = max(1, max_concurrency)
+        # max_concurrency is adjusted at runtime by AdaptiveConcurrency; this keeps the configured cap
+        self.concurrency_ceiling = self.max_concurrency
+        self.burst = burst if burst is not None else max(1, math.ceil(rate))
+        self._tokens = float(self.burst)
+        self._last_refill = time.monotonic()
+        self._paused_until = 0.0
+        self._pause_count = 0
+        self._in_flight = 0
+        self._waiting = 0
+        self._recent: deque[float] = deque()
+        self._condition: asyncio.Condition | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+
+    def _get_condition(self) -> asyncio.Condition:
+        """Return the condition for the running event loop, recreating it if the loop changed."""
+        loop = asyncio.get_running_loop()
+        if self._condition is None or self._loop is not loop:
+            self._condition = asyncio.Condition()
+            self._loop = loop
+        return self._condition
+
+    def _refill(self, now: float) -> None:
+        """Add tokens accumulated since the last refill."""
+        self._tokens = min(float(self.burst), self._tokens + (now - self._last_refill) * self.rate)
+        self._last_refill = now
+
+    async def acquire(self) -> None:
+        """Wait for a concurrency slot, a token and the end of any global pause."""
+        condition = self._get_condition()
+        self._waiting += 1
+        try:
+            async with condition:
+                while True:
+                    now = time.monotonic()
+                    timeout: float | None = self._paused_until - now
+                    if timeout <= 0:
+                        if self._in_flight >= self.max_concurrency:
+                            timeout = None  # Woken up by release()
+                        elif self.rate > 0:
+                            self._refill(now)
+                            if self._tokens >= 1:
+                                self._tokens -= 1
+                                break
+                            timeout = (1 - self._tokens) / self.rate
+                        else:
+                            break
+                    try:
+                        await asyncio.wait_for(condition.wait(), timeout=timeout)
+                    except asyncio.TimeoutError:
+                        pass
+                self._in_flight += 1
+                self._recent.append(now)
+        finally:
+            self._waiting -= 1
+
+    async def release(self) -> None:
+        """Free a concurrency slot and wake one waiter."""
+        condition = self._get_condition()
+        async with condition:
+            self._in_flight -= 1
+            # Wake more than one waiter when the concurrency cap was raised in the meantime
+            condition.notify(max(1, self.max_concurrency - self._in_flight))
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        """Hold a request slot for the duration of the block."""
+        await self.acquire()
+        try:
+            yield
+        finally:
+            await self.release()
+
+    def pause(self, seconds: float) -> None:
+        """Stop handing out slots to every caller for the given number of seconds."""
+        paused_until = time.monotonic() + max(0.0, seconds)
+        if paused_until > self._paused_until:
+            self._paused_until = paused_until
+            self._pause_count += 1
+
+    def stats(self) -> dict[str, Any]:
+        """Return the configured limits, the observed request rate and the current queue depth."""
+        now = time.monotonic()
+        while self._recent and self._recent[0] < now - self.RATE_WINDOW:
+            self._recent.popleft()
+        return {
+            "configured_rate": self.rate,
+            "current_rate": round(len(self._recent) / self.RATE_WINDOW, 2),
+            "max_concurrency": self.max_concurrency,
+            "in_flight": self._in_flight,
+            "queue_depth": self._waiting,
+            "paused_for": round(max(0.0, self._paused_until - now), 2),
+            "rate_limit_pauses": self._pause_count,
+        }
+
+
+class AdaptiveConcurrency:
+    """AIMD controller for the number of concurrent Langfuse API requests.
+
+    Drives `RateLimiter.max_concurrency` from request latency samples: the limit grows by one
+    after a full limit's worth of successful requests whose latency stays within
+    `latency_tolerance` times the smoothed latency, and is halved on timeouts, server errors and
+    rate limiting. Failures of requests that started before the last decrease are ignored so a
+    single overload burst only halves the limit once.
+    """
+
+    BACKOFF_ERRORS = frozenset({ErrorType.TIMEOUT, ErrorType.SERVER_ERROR, ErrorType.RATE_LIMIT})
+
+    def __init__(
+        self,
+        limiter: RateLimiter,
+        min_limit: int = 1,
+        max_limit: int | None = None,
+        initial_limit: int | None = None,
+        latency_tolerance: float = 2.0,
+        smoothing: float = 0.2,
+    ):
+        """Initialize the controller and apply the initial limit to the limiter.
+
+        Args:
+            limiter: Rate limiter whose concurrency cap is adjusted
+            min_limit: Lowest concurrency the limit is halved down to
+            max_limit: Highest concurrency (defaults to the limiter's concurrency_ceiling)
+            initial_limit: Starting concurrency (defaults to half of max_limit)
+            latency_tolerance: Latency multiple of the smoothed latency still considered stable
+            smoothing: Weight of a new sample in the smoothed latency (0-1)
+        """
+        self.limiter = limiter
+        self.max_limit = max(1, max_limit if max_limit is not None else limiter.concurrency_ceiling)
+        self.min_limit = min(max(1, min_limit), self.max_limit)
+        if initial_limit is None:
+            initial_limit = self.max_limit // 2
+        self.limit = min(max(initial_limit, self.min_limit), self.max_limit)
+        self.latency_tolerance = latency_tolerance
+        self.smoothing = smoothing
+        self.smoothed_latency: float | None = None
+        self._successes = 0
+        self._last_decrease = float("-inf")
+        self._increases = 0
+        self._decreases = 0
+        self.limiter.max_concurrency = self.limit
+
+    def record(self, duration: float, error: Exception | None = None) -> None:
+        """Feed one request outcome into the controller.
+
+        Args:
+            duration: Request latency in seconds
+            error: Exception raised by the request, if any
+        """
+        if error is not None:
+            if ErrorClassifier.classify(error) not in self.BACKOFF_ERRORS:
+                return
+            now = time.monotonic()
+            if now - duration < self._last_decrease:
+                return
+            self._last_decrease = now
+            self._successes = 0
+            new_limit = max(self.min_limit, self.limit // 2)
+            if new_limit < self.limit:
+                self._decreases += 1
+                logger.info(f"Adaptive concurrency: {error.__class__.__name__} received, lowering limit {self.limit} -> {new_limit}")
+                self._set_limit(new_limit)
+            return
+
+        stable = self.smoothed_latency is None or duration <= self.smoothed_latency * self.latency_tolerance
+        if self.smoothed_latency is None:
+            self.smoothed_latency = duration
+        else:
+            self.smoothed_latency += self.smoothing * (duration - self.smoothed_latency)
+
+        if not stable:
+            self._successes = 0
+            return
+        self._successes += 1
+        if self._successes >= self.limit and self.limit < self.max_limit:
+            self._successes = 0
+            self._increases += 1
+            logger.debug(f"Adaptive concurrency: latency stable, raising limit {self.limit} -> {self.limit + 1}")
+            self._set_limit(self.limit + 1)
+
+    def _set_limit(self, limit: int) -> None:
+        """Apply a new limit to the controller and the rate limiter."""
+        self.limit = limit
+        self.limiter.max_concurrency = limit
+
+    def stats(self) -> dict[str, Any]:
+        """Return the current limit, its bounds and how often it was adjusted."""
+        return {
+            "limit": self.limit,
+            "min_limit": self.min_limit,
+            "max_limit": self.max_limit,
+            "smoothed_latency": round(self.smoothed_latency, 3) if self.smoothed_latency is not None else None,
+            "increases": self._increases,
+            "decreases": self._decreases,
+        }
+
+
 class RetryManager:
     """Manager for retry logic with exponential backoff."""
     
@@ -366,6 +676,9 @@ class RetryManager:
         **kwargs
     ) -> Any:
         """Execute function with retry logic (synchronous version).
+
+        This blocks the calling thread while backing off; async code must use
+        execute_with_retry_async instead.
         
         Args:
             func: Function to execute
@@ -469,6 +782,7 @@ class RetryManager:
                 
                 # Calculate delay
                 if error_type == ErrorType.RATE_LIMIT:
+                    # _call_api has already paused the shared limiter for this response
                     delay = ErrorClassifier.get_retry_after(e) or self.calculate_delay(attempt)
                 else:
                     delay = self.calculate_delay(attempt)
@@ -499,14 +813,17 @@ class PartialResultMetadata:
 class PartialResultHandler:
     """Handler for collecting partial results when some requests fail."""
     
-    def __init__(self, allow_partial: bool = True):
+    def __init__(self, allow_partial: bool = True, keep_items: bool = True):
         """Initialize partial result handler.
         
         Args:
             allow_partial: If True, return partial results on failure. If False, raise exception.
+            keep_items: If False, only count the items of successful pages (for results streamed elsewhere)
         """
         self.allow_partial = allow_partial
+        self.keep_items = keep_items
         self.collected_items: list[Any] = []
+        self.items_collected = 0
         self.pages_attempted = 0
         self.successful_pages = 0
         self.last_error: Exception | None = None
@@ -517,7 +834,9 @@ class PartialResultHandler:
         Args:
             items: List of items from the successful page
         """
-        self.collected_items.extend(items)
+        if self.keep_items:
+            self.collected_items.extend(items)
+        self.items_collected += len(items)
         self.pages_attempted += 1
         self.successful_pages += 1
     
@@ -555,7 +874,7 @@ class PartialResultHandler:
             successful_pages=self.successful_pages,
             failed_at_page=self.pages_attempted if self.last_error else None,
             error_message=str(self.last_error) if self.last_error else None,
-            items_collected=len(self.collected_items),
+            items_collected=self.items_collected,
         )
         
         # If partial results not allowed and there was an error, raise it
@@ -602,10 +921,15 @@ class RequestMetrics:
 class RequestTracker:
     """Tracker for monitoring request progress and performance."""
     
-    def __init__(self):
-        """Initialize request tracker."""
+    def __init__(self, controller: AdaptiveConcurrency | None = None):
+        """Initialize request tracker.
+
+        Args:
+            controller: Optional adaptive concurrency controller fed with every latency sample
+        """
         self.metrics = RequestMetrics()
         self.start_time: float | None = None
+        self.controller = controller
     
     @contextmanager
     def track_request(self):
@@ -621,12 +945,19 @@ class RequestTracker:
         """
         start = time.time()
         success = False
+        error: Exception | None = None
         try:
             yield
             success = True
+        except Exception as e:
+            error = e
+            raise
         finally:
             duration = time.time() - start
             self.metrics.update(duration, success)
+            # Cancelled requests say nothing about upstream capacity
+            if self.controller is not None and (success or error is not None):
+                self.controller.record(duration, error)
     
     def log_progress(self, current_page: int, total_items: int) -> None:
         """Log progress information.
@@ -643,6 +974,804 @@ class RequestTracker:
             )
 
 
+@dataclass
+class PageResult:
+    """A fetched page yielded by PagePrefetcher."""
+
+    segment_index: int
+    page: int
+    items: list[Any]
+    pagination: dict[str, Any]
+    error: Exception | None = None
+
+
+@dataclass
+class _SegmentCursor:
+    """Scheduling state of one time segment inside PagePrefetcher."""
+
+    next_page: int = 1
+    # Highest page that may be requested before more is known (None = no bound). Only page 1
+    # is requested until the first page reveals whether the segment has more.
+    page_hint: int | None = 1
+    # Last page of the segment once a short, empty or failed page has been seen.
+    end_page: int | None = None
+
+
+class PagePrefetcher:
+    """Fetch pages of a time-segmented listing with bounded concurrency.
+
+    Up to `concurrency` pages are in flight or buffered at any time, across pages and across
+    time segments. Results are yielded strictly in (segment, page) order, so consumers see the
+    same sequence as a sequential walk. A segment ends at the first page that returns fewer
+    than `page_size` items or fails; speculative requests beyond that page are cancelled and
+    their results discarded. Leaving the `async with` block cancels all outstanding pages.
+
+    Example:
+        async with PagePrefetcher(fetch_page, segment_count=5, page_size=100, concurrency=4) as pages:
+            async for result in pages:
+                ...
+    """
+
+    def __init__(
+        self,
+        fetch_page: Callable[[int, int], Awaitable[tuple[list[Any], dict[str, Any]]]],
+        segment_count: int,
+        page_size: int,
+        concurrency: int | Callable[[], int] = 4,
+    ):
+        """Initialize the prefetcher.
+
+        Args:
+            fetch_page: Coroutine function taking (segment_index, page) and returning (items, pagination)
+            segment_count: Number of time segments to walk
+            page_size: Requested page size, used to detect the last page of a segment
+            concurrency: Maximum number of pages in flight or awaiting consumption, or a callable
+                returning the current maximum (e.g. an adaptive concurrency limit)
+        """
+        self._fetch_page = fetch_page
+        self._page_size = page_size
+        self._concurrency = concurrency
+        self._segments = [_SegmentCursor() for _ in range(segment_count)]
+        self._tasks: dict[tuple[int, int], asyncio.Task] = {}
+        self._results: dict[tuple[int, int], PageResult] = {}
+        self._cancelled: set[asyncio.Task] = set()
+        self._yield_segment = 0
+        self._yield_page = 1
+
+    async def __aenter__(self) -> "PagePrefetcher":
+        """Return the prefetcher for iteration."""
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        """Cancel any pages that are still outstanding."""
+        await self.aclose()
+
+    async def aclose(self) -> None:
+        """Cancel all outstanding page requests and wait for them to finish."""
+        tasks = list(self._tasks.values()) + list(self._cancelled)
+        self._tasks.clear()
+        self._results.clear()
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    @property
+    def in_flight(self) -> int:
+        """Number of page requests currently running."""
+        return len(self._tasks)
+
+    @property
+    def concurrency(self) -> int:
+        """Current maximum number of pages in flight or awaiting consumption."""
+        concurrency = self._concurrency() if callable(self._concurrency) else self._concurrency
+        return max(1, concurrency)
+
+    async def _run(self, segment_index: int, page: int) -> PageResult:
+        """Fetch one page, capturing failures so they are reported in order."""
+        try:
+            items, pagination = await self._fetch_page(segment_index, page)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            return PageResult(segment_index, page, [], {}, error=e)
+        return PageResult(segment_index, page, list(items), pagination or {})
+
+    def _start(self, segment_index: int, page: int) -> None:
+        """Start fetching a page."""
+        self._tasks[(segment_index, page)] = asyncio.create_task(self._run(segment_index, page))
+        cursor = self._segments[segment_index]
+        cursor.next_page = max(cursor.next_page, page + 1)
+
+    def _schedule(self) -> None:
+        """Fill free slots with the earliest eligible pages."""
+        for segment_index in range(self._yield_segment, len(self._segments)):
+            cursor = self._segments[segment_index]
+            while cursor.end_page is None and (cursor.page_hint is None or cursor.next_page <= cursor.page_hint):
+                if len(self._tasks) + len(self._results) >= self.concurrency:
+                    return
+                self._start(segment_index, cursor.next_page)
+
+    def _end_segment(self, segment_index: int, page: int) -> None:
+        """Mark `page` as the last page of a segment and drop anything requested beyond it."""
+        cursor = self._segments[segment_index]
+        if cursor.end_page is not None and cursor.end_page <= page:
+            return
+        cursor.end_page = page
+        for key in [key for key in self._tasks if key[0] == segment_index and key[1] > page]:
+            task = self._tasks.pop(key)
+            task.cancel()
+            self._cancelled.add(task)
+            task.add_done_callback(self._cancelled.discard)
+        for key in [key for key in self._results if key[0] == segment_index and key[1] > page]:
+            del self._results[key]
+
+    def _record(self, result: PageResult) -> None:
+        """Update segment state from a completed page and buffer it for in-order delivery."""
+        cursor = self._segments[result.segment_index]
+        if cursor.end_page is not None and result.page > cursor.end_page:
+            return
+
+        if result.error is not None or len(result.items) < self._page_size:
+            self._end_segment(result.segment_index, result.page)
+        elif cursor.page_hint is not None:
+            total_pages = result.pagination.get("total_pages")
+            if isinstance(total_pages, int):
+                # A full last page may still be followed by more data; always probe one page further.
+                cursor.page_hint = max(cursor.page_hint, total_pages, result.page + 1)
+            else:
+                cursor.page_hint = None
+
+        self._results[(result.segment_index, result.page)] = result
+
+    async def _wait_for_any(self) -> None:
+        """Wait until at least one in-flight page completes and record the finished ones."""
+        await asyncio.wait(list(self._tasks.values()), return_when=asyncio.FIRST_COMPLETED)
+        for key, task in list(self._tasks.items()):
+            # Recording a page can end its segment and drop later pages that also just finished.
+            if task.done() and self._tasks.pop(key, None) is not None:
+                self._record(task.result())
+
+    async def __aiter__(self) -> AsyncIterator[PageResult]:
+        """Yield pages in (segment, page) order while keeping later pages in flight."""
+        self._schedule()
+        while self._yield_segment < len(self._segments):
+            cursor = self._segments[self._yield_segment]
+            if cursor.end_page is not None and self._yield_page > cursor.end_page:
+                self._yield_segment += 1
+                self._yield_page = 1
+                self._schedule()
+                continue
+
+            key = (self._yield_segment, self._yield_page)
+            if key in self._results:
+                result = self._results.pop(key)
+                self._yield_page += 1
+                self._schedule()
+                yield result
+                continue
+
+            if key not in self._tasks:
+                self._start(*key)
+            await self._wait_for_any()
+            self._schedule()
+
+
+def _to_epoch(value: Any) -> float | None:
+    """Convert a datetime or ISO 8601 timestamp to epoch seconds (naive values are treated as UTC)."""
+    if isinstance(value, datetime):
+        parsed = value
+    elif isinstance(value, str) and value:
+        try:
+            parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+        except ValueError:
+            return None
+    else:
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=UTC)
+    return parsed.timestamp()
+
+
+def _merge_intervals(intervals: list[tuple[float, float]]) -> list[tuple[float, float]]:
+    """Merge overlapping or touching (start, end) intervals."""
+    merged: list[tuple[float, float]] = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+@dataclass
+class WindowPart:
+    """A slice of a requested time window and where its observations come from."""
+
+    start: datetime
+    end: datetime
+    local: bool  # True when the slice is settled and fully stored on disk
+    window: int = 0  # Index of the requested window the slice belongs to
+
+
+class ObservationStore:
+    """SQLite store of raw observations with per-scope coverage of settled time ranges.
+
+    Observations are stored per scope (the observation type plus any upstream filters) and a
+    time range is recorded as covered once every page of it has been fetched. Ranges that end
+    more than `settle_delay` seconds ago are treated as immutable, so covered ranges are served
+    locally and only uncovered or recent ranges are fetched from Langfuse. All methods block and
+    are meant to be called through `asyncio.to_thread`.
+    """
+
+    FILENAME = "observations.sqlite3"
+
+    def __init__(self, directory: str, settle_delay: float = STORE_SETTLE_DELAY):
+        """Open (or create) the store.
+
+        Args:
+            directory: Directory holding the SQLite database; created if missing
+            settle_delay: Seconds after which a time range is considered immutable
+        """
+        os.makedirs(directory, exist_ok=True)
+        self.path = os.path.join(directory, self.FILENAME)
+        self.settle_delay = settle_delay
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS observations ("
+                "scope TEXT NOT NULL, id TEXT NOT NULL, start_time REAL NOT NULL, data TEXT NOT NULL, "
+                "PRIMARY KEY (scope, id))"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS observations_by_time ON observations (scope, start_time)")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS coverage (scope TEXT NOT NULL, start REAL NOT NULL, end REAL NOT NULL)"
+            )
+
+    def settled_before(self, now: datetime | None = None) -> datetime:
+        """Return the instant before which time ranges are treated as immutable."""
+        return (now or datetime.now(UTC)) - timedelta(seconds=self.settle_delay)
+
+    def _coverage(self, scope: str) -> list[tuple[float, float]]:
+        rows = self._conn.execute("SELECT start, end FROM coverage WHERE scope = ? ORDER BY start", (scope,))
+        return [(start, end) for start, end in rows]
+
+    def plan(self, scope: str, start: datetime, end: datetime, now: datetime | None = None) -> list[WindowPart]:
+        """Split a window into stored and to-be-fetched parts, newest first.
+
+        Args:
+            scope: Store scope of the listing
+            start: Window start
+            end: Window end
+            now: Reference time for the settle delay (defaults to the current time)
+
+        Returns:
+            Parts covering the whole window; the part after the settle point is never local
+        """
+        settled = min(end, max(start, self.settled_before(now)))
+        parts: list[WindowPart] = []
+        if end > settled:
+            parts.append(WindowPart(settled, end, local=False))
+
+        with self._lock:
+            coverage = self._coverage(scope)
+        cursor = settled.timestamp()
+        floor = start.timestamp()
+        for covered_start, covered_end in reversed(coverage):
+            if cursor <= floor:
+                break
+            if covered_start >= cursor or covered_end <= floor:
+                continue
+            if covered_end < cursor:
+                parts.append(WindowPart(datetime.fromtimestamp(covered_end, UTC), datetime.fromtimestamp(cursor, UTC), local=False))
+            local_start = max(covered_start, floor)
+            local_end = min(covered_end, cursor)
+            parts.append(WindowPart(datetime.fromtimestamp(local_start, UTC), datetime.fromtimestamp(local_end, UTC), local=True))
+            cursor = local_start
+        if cursor > floor:
+            parts.append(WindowPart(start, datetime.fromtimestamp(cursor, UTC), local=False))
+        return parts
+
+    def put(self, scope: str, observations: list[dict[str, Any]]) -> int:
+        """Insert or replace observations; records without an id or start time are skipped."""
+        rows = []
+        for obs in observations:
+            start_time = _to_epoch(obs.get("start_time"))
+            if obs.get("id") and start_time is not None:
+                rows.append((scope, obs["id"], start_time, json_codec.dumps(obs)))
+        if rows:
+            with self._lock, self._conn:
+                self._conn.executemany("INSERT OR REPLACE INTO observations VALUES (?, ?, ?, ?)", rows)
+        return len(rows)
+
+    def mark_covered(self, scope: str, start: datetime, end: datetime, now: datetime | None = None) -> None:
+        """Record that every observation of a range is stored; the unsettled tail is never recorded."""
+        end = min(end, self.settled_before(now))
+        if end <= start:
+            return
+        with self._lock, self._conn:
+            merged = _merge_intervals(self._coverage(scope) + [(start.timestamp(), end.timestamp())])
+            self._conn.execute("DELETE FROM coverage WHERE scope = ?", (scope,))
+            self._conn.executemany("INSERT INTO coverage VALUES (?, ?, ?)", [(scope, s, e) for s, e in merged])
+
+    def read(self, scope: str, start: datetime, end: datetime, limit: int, offset: int = 0) -> list[dict[str, Any]]:
+        """Read stored observations in [start, end), newest first.
+
+        The end is exclusive so an observation on the boundary of two adjacent parts is only
+        returned by the newer one.
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT data FROM observations WHERE scope = ? AND start_time >= ? AND start_time < ? "
+                "ORDER BY start_time DESC, id LIMIT ? OFFSET ?",
+                (scope, start.timestamp(), end.timestamp(), limit, offset),
+            ).fetchall()
+        return [json_codec.loads(data) for (data,) in rows]
+
+    def close(self) -> None:
+        """Close the database connection."""
+        with self._lock:
+            self._conn.close()
+
+
+class ObservationScan:
+    """Page through observations of one or more time windows, reading settled stored ranges locally.
+
+    Without an observation store this is a PagePrefetcher over the windows. With a store, each
+    window is split into stored and remote parts (see ObservationStore.plan); remote pages are
+    written to the store as they arrive and a settled remote part is marked as covered once all
+    of its pages were fetched without errors. Pages are yielded in (part, page) order, newest
+    part first.
+
+    Example:
+        async with ObservationScan(state, tracker, obs_type="SPAN", windows=[(start, end)]) as scan:
+            async for result in scan:
+                ...
+    """
+
+    def __init__(
+        self,
+        state: "MCPState",
+        tracker: RequestTracker,
+        *,
+        obs_type: str | None,
+        windows: list[tuple[datetime, datetime]],
+        page_size: int = 100,
+        concurrency: int | Callable[[], int] | None = None,
+        filter_conditions: list[dict[str, Any]] | None = None,
+    ):
+        """Initialize the scan.
+
+        Args:
+            state: MCP state with the data-access client and optional observation store
+            tracker: RequestTracker recording request performance
+            obs_type: Observation type to list (also the store scope)
+            windows: Time windows to scan, newest first
+            page_size: Page size for remote and local pages
+            concurrency: Pages in flight; defaults to the adaptive concurrency limit
+            filter_conditions: Server-side `filter` conditions; filtered pages are stored under their own scope
+        """
+        self._state = state
+        self._tracker = tracker
+        self._obs_type = obs_type
+        self._windows = windows
+        self._page_size = page_size
+        self._concurrency = concurrency if concurrency is not None else (lambda: state.concurrency.limit)
+        self._filter_conditions = filter_conditions
+        self._store = state.observation_store
+        self._scope = obs_type or "ALL"
+        if filter_conditions:
+            digest = hashlib.sha1(json.dumps(filter_conditions, sort_keys=True).encode("utf-8")).hexdigest()[:12]
+            self._scope = f"{self._scope}:filter:{digest}"
+        self._failed_parts: set[int] = set()
+        self._prefetcher: PagePrefetcher | None = None
+        self.parts: list[WindowPart] = []
+        self.local_pages = 0
+        self.remote_pages = 0
+
+    async def __aenter__(self) -> "ObservationScan":
+        """Plan the windows against the store and start prefetching."""
+        if self._store is None:
+            self.parts = [WindowPart(start, end, local=False, window=i) for i, (start, end) in enumerate(self._windows)]
+        else:
+            now = datetime.now(UTC)
+            for i, (start, end) in enumerate(self._windows):
+                for part in await asyncio.to_thread(self._store.plan, self._scope, start, end, now):
+                    part.window = i
+                    self.parts.append(part)
+            local = sum(1 for part in self.parts if part.local)
+            logger.info(f"Observation store: {local}/{len(self.parts)} window parts for scope {self._scope} served locally")
+        self._prefetcher = PagePrefetcher(
+            self._fetch_page, segment_count=len(self.parts), page_size=self._page_size, concurrency=self._concurrency
+        )
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        """Cancel any pages that are still outstanding."""
+        if self._prefetcher is not None:
+            await self._prefetcher.aclose()
+
+    @property
+    def in_flight(self) -> int:
+        """Number of page requests currently running."""
+        return self._prefetcher.in_flight if self._prefetcher is not None else 0
+
+    async def _fetch_page(self, part_index: int, page: int) -> tuple[list[Any], dict[str, Any]]:
+        """Fetch one page of a part from the store or from Langfuse."""
+        part = self.parts[part_index]
+        if part.local:
+            items = await asyncio.to_thread(
+                self._store.read, self._scope, part.start, part.end, self._page_size, (page - 1) * self._page_size
+            )
+            return items, {}
+
+        items, pagination = await _list_observations_with_retry(
+            self._state,
+            self._tracker,
+            limit=self._page_size,
+            page=page,
+            from_start_time=part.start,
+            to_start_time=part.end,
+            obs_type=self._obs_type,
+            filter_conditions=self._filter_conditions,
+        )
+        if self._store is not None and items:
+            await asyncio.to_thread(self._store.put, self._scope, items)
+        return items, pagination
+
+    async def __aiter__(self) -> AsyncIterator[PageResult]:
+        """Yield pages in (part, page) order, recording completed remote parts in the store."""
+        async for result in self._prefetcher:
+            part = self.parts[result.segment_index]
+            if part.local:
+                self.local_pages += 1
+            else:
+                self.remote_pages += 1
+                if result.error is not None:
+                    self._failed_parts.add(result.segment_index)
+                elif (
+                    self._store is not None
+                    and len(result.items) < self._page_size
+                    and result.segment_index not in self._failed_parts
+                ):
+                    await asyncio.to_thread(self._store.mark_covered, self._scope, part.start, part.end)
+            yield result
+
+
+class SpanRecord:
+    """Compact record of a span with exception events, as kept by the exception scans.
+
+    Scans read only a handful of fields of each span, so a record extracts them from the
+    decoded API item while its page is processed, and the item with its input, output and
+    remaining metadata is dropped with the page. The start time is parsed once. `exceptions`
+    holds one (type, message, stacktrace) tuple per exception event.
+    """
+
+    __slots__ = ("id", "trace_id", "start_time", "start_ts", "filepath", "function", "lineno", "exceptions")
+
+    def __init__(
+        self,
+        id: str | None,
+        trace_id: str | None,
+        start_time: Any,
+        start_ts: float,
+        filepath: str | None,
+        function: str | None,
+        lineno: Any,
+        exceptions: tuple[tuple[str, str, str], ...],
+    ):
+        """Initialize the record from fields already extracted from a span."""
+        self.id = id
+        self.trace_id = trace_id
+        self.start_time = start_time
+        self.start_ts = start_ts
+        self.filepath = filepath
+        self.function = function
+        self.lineno = lineno
+        self.exceptions = exceptions
+
+    @classmethod
+    def from_item(cls, item: Any) -> "SpanRecord | None":
+        """Extract a record from an observation returned by the API.
+
+        Args:
+            item: Observation as plain data (or an SDK model)
+
+        Returns:
+            The record, or None when the span has no exception events or no start time
+        """
+        if not isinstance(item, dict):
+            item = _sdk_object_to_python(item)
+            if not isinstance(item, dict):
+                return None
+        exceptions = []
+        for event in item.get("events") or ():
+            attributes = (event if isinstance(event, dict) else _sdk_object_to_python(event)).get("attributes") or {}
+            exc_type = attributes.get("exception.type")
+            if exc_type:
+                exceptions.append((exc_type, attributes.get("exception.message", ""), attributes.get("exception.stacktrace", "")))
+        if not exceptions:
+            return None
+        start_time = item.get("start_time")
+        start_ts = _to_epoch(start_time)
+        if start_ts is None:
+            return None
+        metadata = item.get("metadata")
+        if not isinstance(metadata, dict):
+            metadata = {}
+        return cls(
+            item.get("id"),
+            item.get("trace_id"),
+            start_time,
+            start_ts,
+            metadata.get("code.filepath"),
+            metadata.get("code.function"),
+            metadata.get("code.lineno"),
+            tuple(exceptions),
+        )
+
+    def __repr__(self) -> str:
+        """Return a short representation with the exception count instead of the exceptions."""
+        return f"SpanRecord(id={self.id!r}, trace_id={self.trace_id!r}, start_time={self.start_time!r}, exceptions={len(self.exceptions)})"
+
+
+def _start_epoch(observation: "dict[str, Any] | SpanRecord") -> float | None:
+    """Return the start time of an observation dict or span record as epoch seconds."""
+    if isinstance(observation, SpanRecord):
+        return observation.start_ts
+    return _to_epoch(observation.get("start_time"))
+
+
+@dataclass
+class _CachedBucket:
+    """Observations (or span records) of one aligned time bucket held by ObservationBucketCache."""
+
+    observations: list[Any]
+    fetched_at: float
+    final: bool  # True when the bucket had settled at fetch time and can no longer change
+
+
+class ObservationBucketCache:
+    """Cache of observation listings split into fixed, aligned time buckets.
+
+    A window is mapped onto the buckets it overlaps, so overlapping requests with different
+    `now`-relative bounds hit the same entries. Only buckets that are missing (or expired) are
+    fetched, as contiguous runs, and each run is split back into buckets by observation start
+    time. Buckets that had settled when they were fetched never expire; recent buckets are
+    reused for `ttl` seconds. Entries live in an LRU cache, keyed by (scope, bucket index).
+    """
+
+    def __init__(
+        self,
+        cache: LRUCache,
+        bucket_seconds: int = OBSERVATION_BUCKET_SECONDS,
+        settle_delay: float = STORE_SETTLE_DELAY,
+        ttl: float = OBSERVATION_CACHE_TTL,
+    ):
+        """Initialize the cache.
+
+        Args:
+            cache: LRU cache holding the bucket entries
+            bucket_seconds: Width of each aligned bucket in seconds
+            settle_delay: Seconds after which a bucket is treated as immutable
+            ttl: Seconds a bucket that may still change stays valid
+        """
+        self.cache = cache
+        self.bucket_seconds = bucket_seconds
+        self.settle_delay = settle_delay
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+
+    def _bucket_range(self, start: datetime, end: datetime) -> range:
+        """Indexes of the buckets overlapping [start, end]."""
+        return range(math.floor(start.timestamp() / self.bucket_seconds), math.floor(end.timestamp() / self.bucket_seconds) + 1)
+
+    def _bucket_bounds(self, first: int, last: int) -> tuple[datetime, datetime]:
+        """Start and end of the run of buckets first..last."""
+        return (
+            datetime.fromtimestamp(first * self.bucket_seconds, UTC),
+            datetime.fromtimestamp((last + 1) * self.bucket_seconds, UTC),
+        )
+
+    def lookup(
+        self, scope: str, start: datetime, end: datetime, now: datetime | None = None
+    ) -> tuple[dict[int, list[dict[str, Any]]], list[tuple[datetime, datetime]]]:
+        """Split a window into cached buckets and runs of buckets that must be fetched.
+
+        Args:
+            scope: Cache scope of the listing
+            start: Window start
+            end: Window end
+            now: Reference time for expiring recent buckets
+
+        Returns:
+            Tuple of (bucket index -> cached observations, missing runs as aligned (start, end) newest first)
+        """
+        now_ts = (now or datetime.now(UTC)).timestamp()
+        hits: dict[int, list[dict[str, Any]]] = {}
+        missing: list[int] = []
+        for index in self._bucket_range(start, end):
+            entry = self.cache.get((scope, index))
+            if entry is not None and (entry.final or now_ts - entry.fetched_at < self.ttl):
+                hits[index] = entry.observations
+            else:
+                missing.append(index)
+        self.hits += len(hits)
+        self.misses += len(missing)
+
+        runs: list[tuple[datetime, datetime]] = []
+        for index in reversed(missing):
+            if runs and runs[-1][0].timestamp() == (index + 1) * self.bucket_seconds:
+                runs[-1] = (self._bucket_bounds(index, index)[0], runs[-1][1])
+            else:
+                runs.append(self._bucket_bounds(index, index))
+        return hits, runs
+
+    def store(
+        self, scope: str, start: datetime, end: datetime, observations: list[dict[str, Any]], now: datetime | None = None
+    ) -> dict[int, list[dict[str, Any]]]:
+        """Cache a completely fetched, aligned run of buckets.
+
+        Args:
+            scope: Cache scope of the listing
+            start: Run start (aligned to a bucket boundary)
+            end: Run end (aligned to a bucket boundary, exclusive)
+            observations: Every observation of the run; others are ignored
+            now: Fetch time, used to decide which buckets had settled
+
+        Returns:
+            Bucket index -> observations for the run, newest first
+        """
+        now_ts = (now or datetime.now(UTC)).timestamp()
+        buckets: dict[int, list[tuple[float, dict[str, Any]]]] = {
+            index: [] for index in self._bucket_range(start, end - timedelta(microseconds=1))
+        }
+        for obs in observations:
+            start_time = _start_epoch(obs)
+            if start_time is None:
+                continue
+            index = math.floor(start_time / self.bucket_seconds)
+            if index in buckets:
+                buckets[index].append((start_time, obs))
+
+        result: dict[int, list[dict[str, Any]]] = {}
+        for index, entries in buckets.items():
+            entries.sort(key=lambda entry: entry[0], reverse=True)
+            result[index] = [obs for _, obs in entries]
+            final = (index + 1) * self.bucket_seconds <= now_ts - self.settle_delay
+            self.cache[(scope, index)] = _CachedBucket(result[index], fetched_at=now_ts, final=final)
+        return result
+
+    @staticmethod
+    def stitch(buckets: dict[int, list[dict[str, Any]]], start: datetime, end: datetime) -> list[dict[str, Any]]:
+        """Join bucket contents newest first, keeping observations inside [start, end]."""
+        start_ts, end_ts = start.timestamp(), end.timestamp()
+        stitched = []
+        for index in sorted(buckets, reverse=True):
+            for obs in buckets[index]:
+                start_time = _start_epoch(obs)
+                if start_time is not None and start_ts <= start_time <= end_ts:
+                    stitched.append(obs)
+        return stitched
+
+
+def _file_exception_info(record: SpanRecord, exception: tuple[str, str, str]) -> dict[str, Any]:
+    """Build the exception record returned by find_exceptions_in_file."""
+    exc_type, message, stacktrace = exception
+    return {
+        "observation_id": record.id or "unknown",
+        "trace_id": record.trace_id or "unknown",
+        "timestamp": record.start_time or "unknown",
+        "exception_type": exc_type,
+        "exception_message": message,
+        "exception_stacktrace": stacktrace,
+        "function": record.function or "unknown",
+        "line_number": record.lineno if record.lineno is not None else "unknown",
+    }
+
+
+class ExceptionIndex:
+    """Inverted index from file path, function and exception type to exception spans, per time bucket.
+
+    Each cached bucket of exception spans gets posting lists of (start time, observation id,
+    exception count) per key, plus the exception records of every file. Postings live in the
+    LRU maps declared on MCPState under the same (scope, bucket index) keys as the bucket
+    cache; a posting list that was evicted on its own is rebuilt from the bucket's spans.
+    Queries therefore cost O(matches) instead of a rescan of every span.
+    """
+
+    UNKNOWN_KEYS = {"file": "unknown_file", "function": "unknown_function", "type": "unknown_exception"}
+
+    def __init__(self, by_file: LRUCache, by_function: LRUCache, by_type: LRUCache, details_by_file: LRUCache):
+        """Initialize the index over the given posting maps.
+
+        Args:
+            by_file: (scope, bucket) -> file path -> postings
+            by_function: (scope, bucket) -> function name -> postings
+            by_type: (scope, bucket) -> exception type -> postings
+            details_by_file: (scope, bucket) -> file path -> [(start time, exception record)]
+        """
+        self._maps = {"file": by_file, "function": by_function, "type": by_type}
+        self._details_by_file = details_by_file
+
+    def _build(self, records: list[SpanRecord]) -> dict[str, dict[str, Any]]:
+        """Build all posting lists of one bucket."""
+        postings: dict[str, dict[str, Any]] = {"file": {}, "function": {}, "type": {}, "details": {}}
+        for record in records:
+            obs_id, start_time = record.id, record.start_ts
+            if not obs_id:
+                continue
+            file = record.filepath if record.filepath is not None else self.UNKNOWN_KEYS["file"]
+            function = record.function if record.function is not None else self.UNKNOWN_KEYS["function"]
+
+            type_counts: Counter = Counter()
+            for exception in record.exceptions:
+                type_counts[exception[0]] += 1
+                postings["details"].setdefault(file, []).append((start_time, _file_exception_info(record, exception)))
+
+            total = len(record.exceptions)
+            postings["file"].setdefault(file, []).append((start_time, obs_id, total))
+            postings["function"].setdefault(function, []).append((start_time, obs_id, total))
+            for exc_type, count in type_counts.items():
+                postings["type"].setdefault(exc_type, []).append((start_time, obs_id, count))
+        return postings
+
+    def index_bucket(self, scope: str, index: int, records: list[SpanRecord]) -> dict[str, dict[str, Any]]:
+        """(Re)build the postings of a bucket, replacing any previous version."""
+        postings = self._build(records)
+        for dimension, mapping in self._maps.items():
+            mapping[(scope, index)] = postings[dimension]
+        self._details_by_file[(scope, index)] = postings["details"]
+        return postings
+
+    def _bucket(self, mapping: LRUCache, scope: str, index: int, records: list[SpanRecord], part: str) -> dict[str, Any]:
+        """Return one posting map of a bucket, rebuilding the bucket's postings if it was evicted."""
+        bucket = mapping.get((scope, index))
+        if bucket is None:
+            bucket = self.index_bucket(scope, index, records)[part]
+        return bucket
+
+    def count(
+        self, dimension: str, scope: str, buckets: dict[int, list[SpanRecord]], start: datetime, end: datetime
+    ) -> Counter:
+        """Count exceptions per key of a dimension ("file", "function" or "type") within [start, end]."""
+        start_ts, end_ts = start.timestamp(), end.timestamp()
+        counts: Counter = Counter()
+        mapping = self._maps[dimension]
+        for index, records in buckets.items():
+            for key, postings in self._bucket(mapping, scope, index, records, dimension).items():
+                total = sum(count for start_time, _, count in postings if start_ts <= start_time <= end_ts)
+                if total:
+                    counts[key] += total
+        return counts
+
+    def observation_ids(
+        self, dimension: str, key: str, scope: str, buckets: dict[int, list[SpanRecord]], start: datetime, end: datetime
+    ) -> set[str]:
+        """Return the ids of spans with exceptions for one key of a dimension within [start, end]."""
+        start_ts, end_ts = start.timestamp(), end.timestamp()
+        ids: set[str] = set()
+        mapping = self._maps[dimension]
+        for index, records in buckets.items():
+            postings = self._bucket(mapping, scope, index, records, dimension).get(key, [])
+            ids.update(obs_id for start_time, obs_id, _ in postings if start_ts <= start_time <= end_ts)
+        return ids
+
+    def file_exceptions(
+        self, filepath: str, scope: str, buckets: dict[int, list[SpanRecord]], start: datetime, end: datetime
+    ) -> list[tuple[float, dict[str, Any]]]:
+        """Return (start time, exception record) for every exception raised in a file within [start, end]."""
+        start_ts, end_ts = start.timestamp(), end.timestamp()
+        matches = []
+        for index, records in buckets.items():
+            details = self._bucket(self._details_by_file, scope, index, records, "details").get(filepath, [])
+            matches.extend(entry for entry in details if start_ts <= entry[0] <= end_ts)
+        return matches
+
+
 def _ensure_output_mode(mode: OUTPUT_MODE_LITERAL | OutputMode | str | OutputMode) -> OutputMode:
     """Normalize user-provided output mode values."""
     if isinstance(mode, OutputMode):
@@ -718,6 +1847,20 @@ def _build_arg_parser(env_defaults: dict[str, Any]) -> argparse.ArgumentParser:
             "Directory to save full JSON dumps when 'output_mode' is 'full_json_file'. The directory will be created if it doesn't exist."
         ),
     )
+    parser.add_argument(
+        "--dump-compression",
+        type=str,
+        default="none",
+        choices=DUMP_COMPRESSIONS,
+        help="Compression of full_json_file dumps (defaults to none). 'zstd' requires the 'zstandard' package.",
+    )
+    parser.add_argument(
+        "--json-backend",
+        type=str,
+        default="auto",
+        choices=JSON_BACKENDS,
+        help="JSON serializer for dumps, JSON strings and training data (defaults to auto: orjson, then msgspec, then json).",
+    )
     parser.add_argument(
         "--log-level",
         type=str,
@@ -767,6 +1910,69 @@ def _build_arg_parser(env_defaults: dict[str, Any]) -> argparse.ArgumentParser:
         default=10.0,
         help="Maximum delay in seconds between retries (default: 10.0).",
     )
+    parser.add_argument(
+        "--max-connections",
+        type=int,
+        default=20,
+        help="Maximum number of pooled HTTP connections to the Langfuse API shared by all tools (default: 20).",
+    )
+    parser.add_argument(
+        "--rate-limit",
+        type=float,
+        default=10.0,
+        help="Maximum sustained Langfuse API requests per second across all tools (default: 10, 0 disables).",
+    )
+    parser.add_argument(
+        "--max-concurrent-requests",
+        type=int,
+        default=8,
+        help=(
+            "Upper bound for concurrent Langfuse API requests across all tools (default: 8). The actual limit "
+            "adapts between --min-concurrent-requests and this value based on latency and errors."
+        ),
+    )
+    parser.add_argument(
+        "--min-concurrent-requests",
+        type=int,
+        default=1,
+        help="Lower bound the adaptive concurrency limit backs off to on timeouts, 5xx and 429 responses (default: 1).",
+    )
+    parser.add_argument(
+        "--store-dir",
+        type=str,
+        default=None,
+        help=(
+            "Directory for a persistent SQLite store of raw observations. Settled time ranges that were fetched "
+            "completely are served from it, so repeated extractions only fetch uncovered or recent data (default: disabled)."
+        ),
+    )
+    parser.add_argument(
+        "--store-settle-minutes",
+        type=float,
+        default=STORE_SETTLE_DELAY / 60,
+        help="Minutes after which a time range is treated as immutable by the observation store (default: 60).",
+    )
+    parser.add_argument(
+        "--session-idle-minutes",
+        type=float,
+        default=SESSION_IDLE_SECONDS / 60,
+        help="Minutes without new traces after which get_session_details caches a session as immutable; 0 disables (default: 60).",
+    )
+    parser.add_argument(
+        "--max-jobs",
+        type=int,
+        default=MAX_TRAINING_JOBS,
+        help=(
+            "Background training-data jobs (start_training_data_job) running at the same time; "
+            f"later jobs queue (default: {MAX_TRAINING_JOBS})."
+        ),
+    )
+    parser.add_argument(
+        "--format-workers",
+        type=int,
+        default=0,
+        help="Processes formatting training samples in parallel; 0 formats in a worker thread (default: 0).",
+    )
     parser.add_argument(
         "--no-log-to-console",
         action="store_false",
@@ -808,6 +2014,18 @@ def _sdk_object_to_python(obj: Any) -> Any:
     return obj
 
 
+def _record(item: Any) -> Any:
+    """Return an API record as plain Python data without walking it again.
+
+    The data-access layer already returns plain JSON values, so a dict is only shallow-copied
+    (tools add keys such as ``observations`` to their copy). Anything else, such as an SDK model,
+    goes through _sdk_object_to_python.
+    """
+    if isinstance(item, dict):
+        return dict(item)
+    return _sdk_object_to_python(item)
+
+
 def _extract_items_from_response(response: Any) -> tuple[list[Any], dict[str, Any]]:
     """Normalize Langfuse SDK list responses into items and pagination metadata."""
     if response is None:
@@ -835,51 +2053,387 @@ def _extract_items_from_response(response: Any) -> tuple[list[Any], dict[str, An
     return [response], {}
 
 
+def _plain_page(response: Any) -> dict[str, Any]:
+    """Convert an SDK list response into the `{"data": [...], "meta": {...}}` shape of the REST client."""
+    items, pagination = _extract_items_from_response(response)
+    return {"data": [_sdk_object_to_python(item) for item in items], "meta": pagination}
+
+
 def _metadata_matches(item: Any, metadata_filter: dict[str, Any]) -> bool:
     """Determine whether the provided item matches the requested metadata filter."""
-    item_dict = _sdk_object_to_python(item)
+    item_dict = item if isinstance(item, dict) else _sdk_object_to_python(item)
     metadata = item_dict.get("metadata") or {}
     return all(metadata.get(key) == value for key, value in metadata_filter.items())
 
 
-def _list_traces(
-    langfuse_client: Any,
-    *,
-    limit: int,
-    page: int,
-    include_observations: bool,
-    tags: list[str] | None,
-    from_timestamp: datetime,
-    name: str | None,
-    user_id: str | None,
-    session_id: str | None,
-    metadata: dict[str, Any] | None,
-) -> tuple[list[Any], dict[str, Any]]:
-    """Fetch traces via the Langfuse SDK handling both v2 and v3 signatures."""
-    if not hasattr(langfuse_client, "api") or not hasattr(langfuse_client.api, "trace"):
-        raise RuntimeError("Unsupported Langfuse client: no trace listing method available")
+# User-supplied payload fields returned by the REST API; their keys are kept verbatim.
+_OPAQUE_API_FIELDS = frozenset({"metadata", "input", "output", "model_parameters", "usage_details", "cost_details"})
 
-    list_kwargs: dict[str, Any] = {
-        "limit": limit or None,
-        "page": page or None,
-        "user_id": user_id,
-        "name": name,
-        "session_id": session_id,
-        "from_timestamp": from_timestamp,
-        "tags": tags,
+
+@lru_cache(maxsize=1024)
+def _camel_to_snake(name: str) -> str:
+    """Convert a camelCase API field name into the snake_case name used by the SDK models."""
+    chars = []
+    for index, char in enumerate(name):
+        if char.isupper():
+            if index and not name[index - 1].isupper():
+                chars.append("_")
+            chars.append(char.lower())
+        else:
+            chars.append(char)
+    return "".join(chars)
+
+
+def _snake_to_camel(name: str) -> str:
+    """Convert a snake_case SDK argument name into the camelCase REST query parameter."""
+    head, *rest = name.split("_")
+    return head + "".join(part[:1].upper() + part[1:] for part in rest)
+
+
+def _normalize_api_payload(value: Any) -> Any:
+    """Convert a decoded REST payload into the snake_case shape produced by the SDK models."""
+    if isinstance(value, list):
+        return [_normalize_api_payload(item) for item in value]
+    if isinstance(value, dict):
+        normalized = {}
+        for key, item in value.items():
+            snake_key = _camel_to_snake(key)
+            normalized[snake_key] = item if snake_key in _OPAQUE_API_FIELDS else _normalize_api_payload(item)
+        return normalized
+    return value
+
+
+def _normalize_api_meta(meta: dict[str, Any]) -> dict[str, Any]:
+    """Translate REST pagination metadata into the `next_page`/`total` keys used by the tools."""
+    page = meta.get("page")
+    total_pages = meta.get("totalPages")
+    next_page = None
+    if isinstance(page, int) and isinstance(total_pages, int) and page < total_pages:
+        next_page = page + 1
+    return {
+        "page": page,
+        "limit": meta.get("limit"),
+        "total": meta.get("totalItems"),
+        "total_pages": total_pages,
+        "next_page": next_page,
     }
 
-    # Include observation payloads via the fields selector when requested.
+
+def _to_query_params(params: dict[str, Any]) -> dict[str, Any]:
+    """Convert SDK-style keyword arguments into REST query parameters."""
+    query: dict[str, Any] = {}
+    for key, value in params.items():
+        if value is None:
+            continue
+        if isinstance(value, datetime):
+            if value.tzinfo is None:
+                value = value.replace(tzinfo=UTC)
+            value = value.astimezone(UTC).isoformat().replace("+00:00", "Z")
+        elif isinstance(value, bool):
+            value = "true" if value else "false"
+        query[_snake_to_camel(key)] = value
+    return query
+
+
+class LangfuseAPIClient:
+    """Async client for the Langfuse public REST API.
+
+    All requests share one pooled `httpx.AsyncClient`, so concurrent tool calls overlap on the
+    event loop instead of blocking it the way the synchronous SDK does. Response bodies are
+    decoded by the JSON codec straight into plain dictionaries using the same snake_case keys
+    as the SDK models; no SDK models are built.
+    """
+
+    def __init__(
+        self,
+        host: str,
+        public_key: str,
+        secret_key: str,
+        timeout_config: TimeoutConfig | None = None,
+        max_connections: int = 20,
+        transport: httpx.AsyncBaseTransport | None = None,
+    ):
+        """Initialize the pooled HTTP client.
+
+        Args:
+            host: Langfuse host URL
+            public_key: Langfuse public key
+            secret_key: Langfuse secret key
+            timeout_config: HTTP timeout configuration (defaults to TimeoutConfig())
+            max_connections: Maximum number of pooled connections
+            transport: Optional custom transport (used by tests)
+        """
+        timeout_config = timeout_config or TimeoutConfig()
+        self._client = httpx.AsyncClient(
+            base_url=host.rstrip("/"),
+            auth=(public_key, secret_key),
+            timeout=timeout_config.to_httpx_timeout(),
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+            headers={"Accept": "application/json", "User-Agent": f"langfuse-mcp/{__version__}"},
+            transport=transport,
+        )
+
+    async def _get(self, path: str, params: dict[str, Any] | None = None) -> Any:
+        """Issue a GET request and return the decoded JSON body."""
+        response = await self._client.get(path, params=_to_query_params(params or {}))
+        response.raise_for_status()
+        return json_codec.loads(response.content)
+
+    async def _get_page(self, path: str, params: dict[str, Any]) -> dict[str, Any]:
+        """Fetch one page of a list endpoint as a `{"data": [...], "meta": {...}}` dictionary."""
+        body = await self._get(path, params)
+        return {
+            "data": _normalize_api_payload(body.get("data") or []),
+            "meta": _normalize_api_meta(body.get("meta") or {}),
+        }
+
+    async def list_traces(self, **params: Any) -> dict[str, Any]:
+        """List traces (GET /api/public/traces)."""
+        return await self._get_page("/api/public/traces", params)
+
+    async def get_trace(self, trace_id: str) -> dict[str, Any]:
+        """Fetch a single trace with its observations (GET /api/public/traces/{traceId})."""
+        return _normalize_api_payload(await self._get(f"/api/public/traces/{quote(trace_id, safe='')}"))
+
+    async def list_observations(self, **params: Any) -> dict[str, Any]:
+        """List observations (GET /api/public/observations)."""
+        return await self._get_page("/api/public/observations", params)
+
+    async def get_observation(self, observation_id: str) -> dict[str, Any]:
+        """Fetch a single observation (GET /api/public/observations/{observationId})."""
+        return _normalize_api_payload(await self._get(f"/api/public/observations/{quote(observation_id, safe='')}"))
+
+    async def list_sessions(self, **params: Any) -> dict[str, Any]:
+        """List sessions (GET /api/public/sessions)."""
+        return await self._get_page("/api/public/sessions", params)
+
+    async def get_session(self, session_id: str) -> dict[str, Any]:
+        """Fetch a single session with its traces (GET /api/public/sessions/{sessionId})."""
+        return _normalize_api_payload(await self._get(f"/api/public/sessions/{quote(session_id, safe='')}"))
+
+    async def aclose(self) -> None:
+        """Close the underlying connection pool."""
+        await self._client.aclose()
+
+
+class LangfuseSDKAdapter:
+    """Async facade over the synchronous Langfuse SDK client.
+
+    Used when no REST client is configured (e.g. an injected SDK client). Each call runs in a
+    worker thread so that a slow request does not stall other tools on the event loop. SDK
+    models are converted to plain data in that thread, so callers receive the same shapes as
+    from LangfuseAPIClient.
+    """
+
+    def __init__(self, langfuse_client: Any):
+        """Wrap a Langfuse SDK client.
+
+        Args:
+            langfuse_client: Langfuse SDK client instance
+        """
+        self._client = langfuse_client
+
+    def _resource(self, name: str, purpose: str) -> Any:
+        """Return an SDK API resource or raise if the client does not expose it."""
+        if not hasattr(self._client, "api") or not hasattr(self._client.api, name):
+            raise RuntimeError(f"Unsupported Langfuse client: no {purpose} method available")
+        return getattr(self._client.api, name)
+
+    async def list_traces(self, **params: Any) -> Any:
+        """List traces via the SDK trace resource."""
+        list_traces = self._resource("trace", "trace listing").list
+        return await asyncio.to_thread(lambda: _plain_page(list_traces(**params)))
+
+    async def get_trace(self, trace_id: str) -> Any:
+        """Fetch a single trace via the SDK trace resource.
+
+        Note: Some Langfuse SDK versions do not support a `fields` selector on `get()`. We avoid
+        passing `fields` here and rely on embedding observations separately when requested.
+        """
+        get_trace = self._resource("trace", "trace getter").get
+        return await asyncio.to_thread(lambda: _sdk_object_to_python(get_trace(trace_id=trace_id)))
+
+    async def list_observations(self, **params: Any) -> Any:
+        """List observations via the SDK observations resource."""
+        get_many = self._resource("observations", "observation listing").get_many
+        return await asyncio.to_thread(lambda: _plain_page(get_many(**params)))
+
+    async def get_observation(self, observation_id: str) -> Any:
+        """Fetch a single observation using either the v3 or v2 SDK surface."""
+        if hasattr(self._client, "api") and hasattr(self._client.api, "observations"):
+            get_observation = self._client.api.observations.get
+            return await asyncio.to_thread(lambda: _sdk_object_to_python(get_observation(observation_id=observation_id)))
+
+        if hasattr(self._client, "fetch_observation"):
+
+            def fetch_observation() -> Any:
+                response = self._client.fetch_observation(observation_id)
+                return _sdk_object_to_python(getattr(response, "data", response))
+
+            return await asyncio.to_thread(fetch_observation)
+
+        raise RuntimeError("Unsupported Langfuse client: no observation getter available")
+
+    async def list_sessions(self, **params: Any) -> Any:
+        """List sessions via the SDK sessions resource."""
+        list_sessions = self._resource("sessions", "session listing").list
+        return await asyncio.to_thread(lambda: _plain_page(list_sessions(**params)))
+
+    async def get_session(self, session_id: str) -> Any:
+        """Fetch a single session via the SDK sessions resource."""
+        get_session = self._resource("sessions", "session getter").get
+        return await asyncio.to_thread(lambda: _sdk_object_to_python(get_session(session_id=session_id)))
+
+    async def aclose(self) -> None:
+        """Nothing to release; the SDK client is shut down by the lifespan handler."""
+        return None
+
+
+def _get_api(state: "MCPState") -> "LangfuseAPIClient | LangfuseSDKAdapter":
+    """Return the async data-access client for this server, wrapping the SDK client if needed."""
+    if state.api_client is None:
+        state.api_client = LangfuseSDKAdapter(state.langfuse_client)
+    return state.api_client
+
+
+async def _call_api(state: "MCPState", operation: str, *args: Any, **kwargs: Any) -> Any:
+    """Invoke a data-access operation through the process-wide rate limiter.
+
+    Every upstream request passes through here, so the limiter's rate and concurrency caps
+    apply across all tools, and its latency feeds the adaptive concurrency controller. A 429
+    response pauses the limiter for every caller, using the Retry-After header when present.
+    """
+    async with state.rate_limiter.slot():
+        try:
+            # Timed inside the slot so queueing at the limiter does not count as upstream latency
+            with state.request_tracker.track_request():
+                return await getattr(_get_api(state), operation)(*args, **kwargs)
+        except Exception as e:
+            if ErrorClassifier.classify(e) == ErrorType.RATE_LIMIT:
+                delay = ErrorClassifier.get_retry_after(e) or state.retry_manager.calculate_delay(0)
+                state.rate_limiter.pause(delay)
+                logger.warning(f"Langfuse rate limit hit during {operation}; pausing all requests for {delay:.2f}s")
+            raise
+
+
+def _parse_field_paths(fields: str | None) -> dict[str, Any] | None:
+    """Parse comma-separated dotted paths into a projection tree.
+
+    Each key maps to None (keep the whole value) or to the tree of its requested children, so
+    ``"id,metadata.langgraph_node,metadata.agent"`` becomes
+    ``{"id": None, "metadata": {"langgraph_node": None, "agent": None}}``.
+
+    Args:
+        fields: Comma-separated dotted paths, or None
+
+    Returns:
+        Projection tree, or None when no fields were requested
+    """
+    if not fields:
+        return None
+
+    tree: dict[str, Any] = {}
+    for path in fields.split(","):
+        parts = [part for part in path.strip().split(".") if part]
+        node = tree
+        for index, part in enumerate(parts):
+            if index == len(parts) - 1:
+                node[part] = None
+            elif node.get(part, {}) is None:
+                break  # An ancestor is already kept whole
+            else:
+                node = node.setdefault(part, {})
+    return tree or None
+
+
+def _project_fields(value: Any, tree: dict[str, Any] | None) -> Any:
+    """Keep only the paths of a projection tree; lists are projected element by element.
+
+    Keys that contain dots themselves, such as the ``code.filepath`` metadata attribute, are
+    matched when no key exists for the first path segment.
+
+    Args:
+        value: Record, list of records or nested value
+        tree: Projection tree from _parse_field_paths; None keeps the value whole
+
+    Returns:
+        The projected value (new dicts and lists; kept leaves are shared)
+    """
+    if tree is None:
+        return value
+    if isinstance(value, list):
+        return [_project_fields(item, tree) for item in value]
+    if isinstance(value, dict):
+        projected = {}
+        for key, subtree in tree.items():
+            if key in value:
+                projected[key] = _project_fields(value[key], subtree)
+            elif subtree:
+                projected.update(_project_fields(value, {f"{key}.{child}": grandchild for child, grandchild in subtree.items()}))
+        return projected
+    return value
+
+
+def _trace_field_groups(tree: dict[str, Any], metadata_filter: dict[str, Any] | None) -> str:
+    """Return the traces `fields` selector that covers a projection tree.
+
+    Args:
+        tree: Projection tree of the requested trace fields
+        metadata_filter: Client-side metadata filter, which needs the `io` group
+
+    Returns:
+        Comma-separated field groups, always including `core`
+    """
+    needed = set(tree)
+    if metadata_filter:
+        needed.add("metadata")
+    return ",".join(["core"] + [group for group, keys in TRACE_FIELD_GROUPS.items() if keys & needed])
+
+
+async def _list_traces(
+    state: "MCPState",
+    *,
+    limit: int,
+    page: int,
+    include_observations: bool,
+    tags: list[str] | None,
+    from_timestamp: datetime,
+    name: str | None,
+    user_id: str | None,
+    session_id: str | None,
+    metadata: dict[str, Any] | None,
+    field_groups: str | None = None,
+    to_timestamp: datetime | None = None,
+) -> tuple[list[Any], dict[str, Any]]:
+    """Fetch a page of traces through the async data-access layer.
+
+    ``field_groups`` overrides the `fields` selector derived from include_observations and
+    metadata, so a projection can leave out groups such as `io` it does not need.
+    """
+    list_kwargs: dict[str, Any] = {
+        "limit": limit or None,
+        "page": page or None,
+        "user_id": user_id,
+        "name": name,
+        "session_id": session_id,
+        "from_timestamp": from_timestamp,
+        "to_timestamp": to_timestamp,
+        "tags": tags,
+    }
+
+    # Include observation payloads via the fields selector when requested.
     if include_observations and metadata:
         list_kwargs["fields"] = "core,io,observations"
     elif include_observations:
         list_kwargs["fields"] = "core,observations"
     elif metadata:
         list_kwargs["fields"] = "core,io"
+    if field_groups:
+        list_kwargs["fields"] = field_groups
 
     list_kwargs = {k: v for k, v in list_kwargs.items() if v is not None}
 
-    response = langfuse_client.api.trace.list(**list_kwargs)
+    response = await _call_api(state, "list_traces", **list_kwargs)
     items, pagination = _extract_items_from_response(response)
 
     if metadata:
@@ -889,12 +2443,72 @@ def _list_traces(
     return items, pagination
 
 
-def _list_observations(
-    langfuse_client: Any,
+async def _list_traces_with_retry(
+    state: "MCPState",
+    tracker: RequestTracker,
+    *,
+    limit: int,
+    page: int,
+    include_observations: bool,
+    from_timestamp: datetime,
+    to_timestamp: datetime | None = None,
+    user_id: str | None = None,
+    session_id: str | None = None,
+    field_groups: str | None = None,
+) -> tuple[list[Any], dict[str, Any]]:
+    """Fetch traces with retry logic and request tracking.
+
+    This wrapper adds retry logic and performance tracking to _list_traces.
+
+    Args:
+        state: MCPState providing the data-access client and retry manager
+        tracker: RequestTracker instance for monitoring performance
+        limit: Maximum number of traces per page
+        page: Page number (1-based)
+        include_observations: Whether to request observation payloads with each trace
+        from_timestamp: Only include traces at or after this time
+        to_timestamp: Only include traces before this time (no upper bound when None)
+        user_id: Only include traces of this user
+        session_id: Only include traces of this session
+        field_groups: Comma-separated `fields` selector overriding the one derived from include_observations
+
+    Returns:
+        Tuple of (items, pagination metadata)
+
+    Raises:
+        Exception: If all retries fail
+    """
+    error_context = f"Fetching traces page {page}"
+
+    async def fetch_with_tracking():
+        with tracker.track_request():
+            return await _list_traces(
+                state,
+                limit=limit,
+                page=page,
+                include_observations=include_observations,
+                tags=None,
+                from_timestamp=from_timestamp,
+                to_timestamp=to_timestamp,
+                name=None,
+                user_id=user_id,
+                session_id=session_id,
+                metadata=None,
+                field_groups=field_groups,
+            )
+
+    return await state.retry_manager.execute_with_retry_async(
+        fetch_with_tracking,
+        error_context=error_context,
+    )
+
+
+async def _list_observations(
+    state: "MCPState",
     *,
     limit: int,
     page: int,
-    from_start_time: datetime,
+    from_start_time: datetime | None,
     to_start_time: datetime | None,
     obs_type: str | None,
     name: str | None,
@@ -902,11 +2516,13 @@ def _list_observations(
     trace_id: str | None,
     parent_observation_id: str | None,
     metadata: dict[str, Any] | None,
+    filter_conditions: list[dict[str, Any]] | None = None,
 ) -> tuple[list[Any], dict[str, Any]]:
-    """Fetch observations via the Langfuse SDK handling v2/v3 differences."""
-    if not hasattr(langfuse_client, "api") or not hasattr(langfuse_client.api, "observations"):
-        raise RuntimeError("Unsupported Langfuse client: no observation listing method available")
+    """Fetch a page of observations through the async data-access layer.
 
+    ``filter_conditions`` are sent as the JSON `filter` query parameter and evaluated by the
+    server; ``metadata`` is always matched client-side.
+    """
     list_kwargs: dict[str, Any] = {
         "limit": limit or None,
         "page": page or None,
@@ -917,10 +2533,11 @@ def _list_observations(
         "parent_observation_id": parent_observation_id,
         "from_start_time": from_start_time,
         "to_start_time": to_start_time,
+        "filter": json_codec.dumps(filter_conditions) if filter_conditions else None,
     }
     list_kwargs = {k: v for k, v in list_kwargs.items() if v is not None}
 
-    response = langfuse_client.api.observations.get_many(**list_kwargs)
+    response = await _call_api(state, "list_observations", **list_kwargs)
     items, pagination = _extract_items_from_response(response)
 
     if metadata:
@@ -930,14 +2547,13 @@ def _list_observations(
     return items, pagination
 
 
-def _list_observations_with_retry(
-    retry_manager: RetryManager,
+async def _list_observations_with_retry(
+    state: "MCPState",
     tracker: RequestTracker,
-    langfuse_client: Any,
     *,
     limit: int,
     page: int,
-    from_start_time: datetime,
+    from_start_time: datetime | None,
     to_start_time: datetime | None,
     obs_type: str | None,
     name: str | None = None,
@@ -945,29 +2561,39 @@ def _list_observations_with_retry(
     trace_id: str | None = None,
     parent_observation_id: str | None = None,
     metadata: dict[str, Any] | None = None,
+    filter_conditions: list[dict[str, Any]] | None = None,
 ) -> tuple[list[Any], dict[str, Any]]:
     """Fetch observations with retry logic and request tracking.
-    
+
     This wrapper adds retry logic and performance tracking to _list_observations.
-    
+
     Args:
-        retry_manager: RetryManager instance for handling retries
+        state: MCPState providing the data-access client and retry manager
         tracker: RequestTracker instance for monitoring performance
-        langfuse_client: Langfuse client instance
-        ... (same as _list_observations)
-        
+        limit: Maximum number of observations per page
+        page: Page number (1-based)
+        from_start_time: Only include observations starting at or after this time
+        to_start_time: Only include observations starting before this time
+        obs_type: Only include observations of this type (e.g. 'GENERATION', 'SPAN')
+        name: Only include observations with this name
+        user_id: Only include observations of this user's traces
+        trace_id: Only include observations of this trace
+        parent_observation_id: Only include children of this observation
+        metadata: Exact-match metadata filter applied client-side
+        filter_conditions: Conditions sent as the JSON `filter` query parameter and evaluated by the server
+
     Returns:
         Tuple of (items, pagination metadata)
-        
+
     Raises:
         Exception: If all retries fail
     """
     error_context = f"Fetching observations page {page}"
-    
-    def fetch_with_tracking():
+
+    async def fetch_with_tracking():
         with tracker.track_request():
-            return _list_observations(
-                langfuse_client,
+            return await _list_observations(
+                state,
                 limit=limit,
                 page=page,
                 from_start_time=from_start_time,
@@ -978,49 +2604,105 @@ def _list_observations_with_retry(
                 trace_id=trace_id,
                 parent_observation_id=parent_observation_id,
                 metadata=metadata,
+                filter_conditions=filter_conditions,
             )
-    
-    return retry_manager.execute_with_retry(
+
+    return await state.retry_manager.execute_with_retry_async(
         fetch_with_tracking,
         error_context=error_context,
     )
 
 
-def _get_observation(langfuse_client: Any, observation_id: str) -> Any:
-    """Fetch a single observation using either the v3 or v2 SDK surface."""
-    if hasattr(langfuse_client, "api") and hasattr(langfuse_client.api, "observations"):
-        return langfuse_client.api.observations.get(observation_id=observation_id)
+def _metadata_filter_conditions(predicates: dict[str, str | None]) -> list[dict[str, Any]]:
+    """Translate exact-match metadata predicates into observations `filter` conditions."""
+    return [
+        {"type": "stringObject", "column": "metadata", "key": key, "operator": "=", "value": value}
+        for key, value in predicates.items()
+        if value is not None
+    ]
 
-    if hasattr(langfuse_client, "fetch_observation"):
-        response = langfuse_client.fetch_observation(observation_id)
-        return getattr(response, "data", response)
 
-    raise RuntimeError("Unsupported Langfuse client: no observation getter available")
+async def _probe_filter_pushdown(
+    state: "MCPState", filter_conditions: list[dict[str, Any]], obs_type: str | None, window: tuple[datetime, datetime]
+) -> bool:
+    """Check whether the server evaluates the observations `filter` parameter.
 
+    One single-item request is sent with the filter. A 400/422 response or an SDK that does not
+    accept the argument means the server cannot filter; an item that does not match means the
+    parameter was silently ignored. Either outcome is remembered on the state so later calls
+    filter client-side straight away. Other errors only disable pushdown for this call.
 
-def _get_trace(langfuse_client: Any, trace_id: str, include_observations: bool) -> Any:
-    """Fetch a single trace handling SDK version differences.
+    Args:
+        state: MCP state with the data-access client
+        filter_conditions: Conditions to probe
+        obs_type: Observation type of the scan
+        window: Time window of the scan to probe in
 
-    Note: Some Langfuse SDK versions do not support a `fields` selector on `get()`. We avoid
-    passing `fields` here and rely on embedding observations separately when requested.
+    Returns:
+        True if the scan should send the filter to the server
     """
-    if not hasattr(langfuse_client, "api") or not hasattr(langfuse_client.api, "trace"):
-        raise RuntimeError("Unsupported Langfuse client: no trace getter available")
+    if state.filter_pushdown is not None:
+        return state.filter_pushdown
+
+    try:
+        items, _ = await _list_observations(
+            state,
+            limit=1,
+            page=1,
+            from_start_time=window[0],
+            to_start_time=window[1],
+            obs_type=obs_type,
+            name=None,
+            user_id=None,
+            trace_id=None,
+            parent_observation_id=None,
+            metadata=None,
+            filter_conditions=filter_conditions,
+        )
+    except (TypeError, httpx.HTTPStatusError) as e:
+        if isinstance(e, httpx.HTTPStatusError) and e.response.status_code not in (400, 422):
+            logger.warning(f"Filter pushdown probe failed, filtering client-side for this call: {str(e)}")
+            return False
+        logger.info(f"Langfuse does not accept the observations filter parameter, filtering client-side: {str(e)}")
+        state.filter_pushdown = False
+        return False
+    except Exception as e:
+        logger.warning(f"Filter pushdown probe failed, filtering client-side for this call: {str(e)}")
+        return False
+
+    if items:
+        metadata = _record(items[0]).get("metadata") or {}
+        state.filter_pushdown = all(metadata.get(c["key"]) == c["value"] for c in filter_conditions)
+        if not state.filter_pushdown:
+            logger.info("Langfuse ignored the observations filter parameter, filtering client-side")
+        return state.filter_pushdown
+    # Nothing matched in this window, which does not prove the filter was applied; probe again next time
+    return True
+
 
-    return langfuse_client.api.trace.get(trace_id=trace_id)
+async def _get_observation(state: "MCPState", observation_id: str) -> Any:
+    """Fetch a single observation through the async data-access layer."""
+    return await _call_api(state, "get_observation", observation_id)
 
 
-def _list_sessions(
-    langfuse_client: Any,
+async def _get_trace(state: "MCPState", trace_id: str, include_observations: bool) -> Any:
+    """Fetch a single trace through the async data-access layer."""
+    return await _call_api(state, "get_trace", trace_id)
+
+
+async def _get_session(state: "MCPState", session_id: str) -> Any:
+    """Fetch a single session with its traces through the async data-access layer."""
+    return await _call_api(state, "get_session", session_id)
+
+
+async def _list_sessions(
+    state: "MCPState",
     *,
     limit: int,
     page: int,
     from_timestamp: datetime,
 ) -> tuple[list[Any], dict[str, Any]]:
-    """Fetch sessions via the Langfuse SDK handling v2/v3 differences."""
-    if not hasattr(langfuse_client, "api") or not hasattr(langfuse_client.api, "sessions"):
-        raise RuntimeError("Unsupported Langfuse client: no session listing method available")
-
+    """Fetch a page of sessions through the async data-access layer."""
     list_kwargs: dict[str, Any] = {
         "limit": limit or None,
         "page": page or None,
@@ -1028,207 +2710,232 @@ def _list_sessions(
     }
     list_kwargs = {k: v for k, v in list_kwargs.items() if v is not None}
 
-    response = langfuse_client.api.sessions.list(**list_kwargs)
+    response = await _call_api(state, "list_sessions", **list_kwargs)
     return _extract_items_from_response(response)
 
 
-def truncate_large_strings(
-    obj: Any,
-    max_length: int = MAX_FIELD_LENGTH,
-    max_response_size: int = MAX_RESPONSE_SIZE,
-    path: str = "",
-    current_size: int = 0,
-    truncation_level: int = 0,
+_ESSENTIAL_FIELD_SET = frozenset(ESSENTIAL_FIELDS)
+_TRUNCATION_NOTE = "Response truncated due to size constraints"
+_TRUNCATED_VALUE = "[TRUNCATED]"
+
+
+@lru_cache(maxsize=4096)
+def _classify_key(key: Any) -> tuple[bool, bool]:
+    """Return (is a known large field, mentions "stack") for a dict key."""
+    lower_key = str(key).lower()
+    return any(field in lower_key for field in LOWER_LARGE_FIELDS), "stack" in lower_key
+
+
+def _json_size(value: Any) -> int:
+    """Return the UTF-8 byte length of a scalar in compact JSON output."""
+    if isinstance(value, str):
+        return len(json.encoder.encode_basestring(value).encode("utf-8"))
+    return len(json.dumps(value, default=str, ensure_ascii=False).encode("utf-8"))
+
+
+@lru_cache(maxsize=4096, typed=True)
+def _member_size(key: Any) -> int:
+    """Return the byte length of a dict key and its colon in compact JSON output."""
+    return _json_size(_json_key(key)) + 1
+
+
+def _estimate_compact_size(obj: Any, max_length: int, cap: int) -> int:
+    """Estimate the compact JSON size of a value with strings cut at max_length.
+
+    Quotes and escapes are ignored, and the walk stops once the estimate passes ``cap``, so
+    the cost is bounded by the budget rather than by the size of the value.
+
+    Args:
+        obj: The value to estimate
+        max_length: Length strings are truncated to
+        cap: Size past which the estimate is not refined further
+
+    Returns:
+        Estimated size in bytes, possibly stopped short just past ``cap``
+    """
+    if isinstance(obj, str):
+        return min(len(obj), max_length + len(TRUNCATE_SUFFIX)) + 2
+    if isinstance(obj, dict):
+        size = 2
+        for key, value in obj.items():
+            size += len(str(key)) + 4 + _estimate_compact_size(value, max_length, cap - size)
+            if size > cap:
+                break
+        return size
+    if isinstance(obj, list):
+        size = 2
+        for item in obj:
+            size += 1 + _estimate_compact_size(item, max_length, cap - size)
+            if size > cap:
+                break
+        return size
+    return len(str(obj))
+
+
+def _compact_encode(
+    obj: Any, max_length: int, max_response_size: int, in_stack: bool, current_size: int, truncation_level: int
 ) -> tuple[Any, int]:
-    """Recursively process an object and truncate large string values with intelligent list handling.
+    """Recursive worker of compact_encode.
 
     Args:
-        obj: The object to process (dict, list, string, etc.)
-        max_length: Maximum length for string values
-        max_response_size: Maximum total response size in characters
-        path: Current path in the object (for nested objects)
-        current_size: Current size of the processed object
+        obj: The value to process
+        max_length: Maximum length for string values before the truncation level is applied
+        max_response_size: Size budget of the whole response in bytes
+        in_stack: Whether the value sits under a key mentioning "stack"
+        current_size: Bytes already used by the output before this value
         truncation_level: Level of truncation to apply (0=normal, 1=aggressive, 2=minimal)
 
     Returns:
-        Tuple of (processed object, size of processed object)
+        Tuple of (processed value, its byte length in compact JSON)
     """
-    # Calculate adjusted max_length based on truncation level
-    adjusted_max_length = max_length
     if truncation_level == 1:
-        # More aggressive truncation for level 1
         adjusted_max_length = max(50, max_length // 2)
     elif truncation_level == 2:
-        # Minimal representation for level 2 (extreme truncation)
         adjusted_max_length = max(20, max_length // 5)
+    else:
+        adjusted_max_length = max_length
 
-    # Base case: if we've already exceeded max response size by a lot, return minimal representation
     if current_size > max_response_size * 1.5:
-        return "[TRUNCATED]", len("[TRUNCATED]")
+        return _TRUNCATED_VALUE, len(_TRUNCATED_VALUE) + 2
 
-    # Handle different types
     if isinstance(obj, dict):
         result = {}
-        result_size = 2  # Count braces
+        result_size = 2
+        keys = list(obj)
 
-        # First pass: always process essential fields first
-        for key in list(obj.keys()):
-            if key in ESSENTIAL_FIELDS:
-                processed_value, value_size = truncate_large_strings(
+        # Essential fields first, then known large fields, then everything else
+        for key in keys:
+            if key in _ESSENTIAL_FIELD_SET:
+                value, value_size = _compact_encode(
                     obj[key],
                     adjusted_max_length,
                     max_response_size,
-                    f"{path}.{key}" if path else key,
+                    in_stack or _classify_key(key)[1],
                     current_size + result_size,
                     truncation_level,
                 )
-                result[key] = processed_value
-                result_size += len(str(key)) + 2 + value_size  # key + colon + value size
-
-        # Second pass: process known large fields next
-        if truncation_level < 2:  # Skip detailed content at highest truncation level
-            for key in list(obj.keys()):
-                lower_key = key.lower()
-                if lower_key in LOWER_LARGE_FIELDS or any(field in lower_key for field in LOWER_LARGE_FIELDS):
-                    if key not in result:  # Skip if already processed
-                        value = obj[key]
-                        if isinstance(value, str) and len(value) > adjusted_max_length:
-                            # For stacktraces, keep first and last few lines
-                            if "stack" in key.lower() and "\n" in value:
-                                lines = value.split("\n")
-                                if len(lines) > 6:
-                                    # Keep first 3 and last 3 lines for context
-                                    truncated_stack = "\n".join(lines[:3] + ["..."] + lines[-3:])
-                                    result[key] = truncated_stack
-                                    logger.debug(f"Truncated stack in {path}.{key} from {len(lines)} lines to 7 lines")
-                                    result_size += len(str(key)) + 2 + len(truncated_stack)
-                                else:
-                                    result[key] = value
-                                    result_size += len(str(key)) + 2 + len(value)
-                            else:
-                                # For other large text fields, regular truncation
-                                result[key] = value[:adjusted_max_length] + TRUNCATE_SUFFIX
-                                logger.debug(f"Truncated field {path}.{key} from {len(value)} to {adjusted_max_length} chars")
-                                result_size += len(str(key)) + 2 + adjusted_max_length + len(TRUNCATE_SUFFIX)
-                        else:
-                            processed_value, value_size = truncate_large_strings(
-                                value,
-                                adjusted_max_length,
-                                max_response_size,
-                                f"{path}.{key}" if path else key,
-                                current_size + result_size,
-                                truncation_level,
-                            )
-                            result[key] = processed_value
-                            result_size += len(str(key)) + 2 + value_size
-
-        # Final pass: process remaining fields if we have size budget remaining
-        remaining_fields = [k for k in obj if k not in result]
-
-        # Skip non-essential fields at highest truncation level
-        if truncation_level >= 2 and len(remaining_fields) > 0:
-            result["_note"] = f"{len(remaining_fields)} non-essential fields omitted"
-            result_size += len("_note") + 2 + len(result["_note"])
+                result_size += bool(result) + _member_size(key) + value_size
+                result[key] = value
+
+        if truncation_level < 2:
+            for key in keys:
+                is_large, is_stack = _classify_key(key)
+                if not is_large or key in result:
+                    continue
+                value = obj[key]
+                if isinstance(value, str) and len(value) > adjusted_max_length:
+                    # Stack traces keep their first and last three lines; other text is cut
+                    if is_stack and value.count("\n") >= 6:
+                        lines = value.split("\n")
+                        value = "\n".join(lines[:3] + ["..."] + lines[-3:])
+                    elif not (is_stack and "\n" in value):
+                        value = value[:adjusted_max_length] + TRUNCATE_SUFFIX
+                    value_size = _json_size(value)
+                else:
+                    value, value_size = _compact_encode(
+                        value,
+                        adjusted_max_length,
+                        max_response_size,
+                        in_stack or is_stack,
+                        current_size + result_size,
+                        truncation_level,
+                    )
+                result_size += bool(result) + _member_size(key) + value_size
+                result[key] = value
+
+        remaining_fields = [key for key in keys if key not in result]
+        if truncation_level >= 2 and remaining_fields:
+            note = f"{len(remaining_fields)} non-essential fields omitted"
+            result_size += bool(result) + _member_size("_note") + _json_size(note)
+            result["_note"] = note
         else:
             for key in remaining_fields:
-                # Skip if we're approaching max size and apply more aggressive truncation
-                if current_size + result_size > max_response_size * 0.9:
-                    # Instead of breaking, increase truncation level for remaining fields
-                    next_truncation_level = min(2, truncation_level + 1)
-                    if next_truncation_level > truncation_level:
-                        result["_truncation_note"] = "Response truncated due to size constraints"
-                        result_size += len("_truncation_note") + 2 + len(result["_truncation_note"])
-
-                processed_value, value_size = truncate_large_strings(
+                if current_size + result_size > max_response_size * 0.9 and truncation_level < 2 and "_truncation_note" not in result:
+                    result_size += bool(result) + _member_size("_truncation_note") + _json_size(_TRUNCATION_NOTE)
+                    result["_truncation_note"] = _TRUNCATION_NOTE
+                value, value_size = _compact_encode(
                     obj[key],
                     adjusted_max_length,
                     max_response_size,
-                    f"{path}.{key}" if path else key,
+                    in_stack or _classify_key(key)[1],
                     current_size + result_size,
                     min(2, truncation_level + (1 if current_size + result_size > max_response_size * 0.7 else 0)),
                 )
-                result[key] = processed_value
-                result_size += len(str(key)) + 2 + value_size
+                result_size += bool(result) + _member_size(key) + value_size
+                result[key] = value
 
         return result, result_size
 
-    elif isinstance(obj, list):
-        result = []
-        result_size = 2  # Count brackets
-
-        # Special handling for empty lists
+    if isinstance(obj, list):
         if not obj:
             return [], 2
 
-        # Estimate average item size to plan truncation strategy
-        # We'll sample the first item or use a default
-        sample_size = 0
-        if obj:
-            sample_item, sample_size = truncate_large_strings(
-                obj[0], adjusted_max_length, max_response_size, f"{path}[0]", current_size + result_size, truncation_level
-            )
+        result_list = []
+        result_size = 2
+        item_count = len(obj)
 
-        estimated_total_size = sample_size * len(obj)
+        # The level is chosen from an estimate of the first item so that every item is encoded once
+        sample_size = _estimate_compact_size(obj[0], adjusted_max_length, max_response_size)
+        estimated_total_size = (sample_size + 1) * item_count
 
-        # Determine the appropriate truncation strategy based on estimated size
         target_truncation_level = truncation_level
         if estimated_total_size > max_response_size * 0.8:
-            # If the list would be too large, increase truncation level
             target_truncation_level = min(2, truncation_level + 1)
 
-        # If even at max truncation we'd exceed size, we need to limit the number of items
-        will_need_item_limit = False
-        if target_truncation_level == 2 and estimated_total_size > max_response_size:
-            will_need_item_limit = True
-            max_items = max(5, int(max_response_size * 0.8 / (sample_size or 100)))
-        else:
-            max_items = len(obj)
+        will_need_item_limit = target_truncation_level == 2 and estimated_total_size > max_response_size
+        max_items = max(5, int(max_response_size * 0.8 / (sample_size or 100))) if will_need_item_limit else item_count
 
-        # Process items with appropriate truncation level
         for i, item in enumerate(obj):
             if will_need_item_limit and i >= max_items:
-                result.append({"_note": f"List truncated, {len(obj) - i} of {len(obj)} items omitted due to size constraints"})
-                result_size += 2 + len(result[-1]["_note"])
+                note = f"List truncated, {item_count - i} of {item_count} items omitted due to size constraints"
+                result_list.append({"_note": note})
+                result_size += 1 + 2 + _member_size("_note") + _json_size(note)
                 break
 
             item_truncation_level = target_truncation_level
-            # Apply even more aggressive truncation as we approach the limit
             if current_size + result_size > max_response_size * 0.8:
                 item_truncation_level = 2
 
-            processed_item, item_size = truncate_large_strings(
-                item, adjusted_max_length, max_response_size, f"{path}[{i}]", current_size + result_size, item_truncation_level
+            processed_item, item_size = _compact_encode(
+                item, adjusted_max_length, max_response_size, in_stack, current_size + result_size + bool(i), item_truncation_level
             )
-            result.append(processed_item)
-            result_size += item_size
-            if i < len(obj) - 1:
-                result_size += 1  # Count comma
+            result_list.append(processed_item)
+            result_size += bool(i) + item_size
 
-        return result, result_size
+        return result_list, result_size
 
-    elif isinstance(obj, str):
-        # String truncation strategy based on truncation level
-        if len(obj) <= adjusted_max_length:
-            return obj, len(obj)
+    if isinstance(obj, str):
+        if len(obj) > adjusted_max_length:
+            if truncation_level == 0 and in_stack and obj.count("\n") >= 6:
+                lines = obj.split("\n")
+                obj = "\n".join(lines[:3] + ["..."] + lines[-3:])
+            else:
+                obj = obj[:adjusted_max_length] + TRUNCATE_SUFFIX
+        return obj, _json_size(obj)
 
-        # Special handling for stacktraces at normal truncation level
-        if truncation_level == 0 and ("stacktrace" in path.lower() or "stack" in path.lower()) and "\n" in obj:
-            lines = obj.split("\n")
-            if len(lines) > 6:
-                # Keep first 3 and last 3 lines for context at normal level
-                truncated = "\n".join(lines[:3] + ["..."] + lines[-3:])
-                return truncated, len(truncated)
+    return obj, _json_size(obj)
 
-        # Regular string truncation with adjusted max length
-        if len(obj) > adjusted_max_length:
-            truncated = obj[:adjusted_max_length] + TRUNCATE_SUFFIX
-            return truncated, len(truncated)
 
-        return obj, len(obj)
+def compact_encode(
+    data: Any, max_length: int = MAX_FIELD_LENGTH, max_response_size: int = MAX_RESPONSE_SIZE
+) -> tuple[Any, int]:
+    """Truncate large values in a single pass, keeping the response within a byte budget.
+
+    Every value is encoded once: a list's truncation level is chosen from a budget-capped
+    estimate of its first item before any item is encoded, key classification against
+    LARGE_FIELDS is cached, and nothing is logged per field. Sizes are the UTF-8 byte
+    lengths of the output as compact JSON, so the budget tracks what is actually sent
+    rather than a character estimate.
 
-    else:
-        # For other types (int, float, bool, None), return as is
-        return obj, len(str(obj))
+    Args:
+        data: The object to process
+        max_length: Maximum length for string values
+        max_response_size: Maximum total response size in bytes
+
+    Returns:
+        Tuple of (processed object, byte length of the processed object as compact JSON)
+    """
+    return _compact_encode(data, max_length, max_response_size, False, 0, 0)
 
 
 def process_compact_data(data: Any) -> Any:
@@ -1240,11 +2947,114 @@ def process_compact_data(data: Any) -> Any:
     Returns:
         Processed data with large values truncated
     """
-    processed_data, size = truncate_large_strings(data, truncation_level=0)
-    logger.debug(f"Processed response data: processed size {size} chars")
+    processed_data, size = compact_encode(data)
+    logger.debug(f"Processed response data: processed size {size} bytes")
     return processed_data
 
 
+class JSONCodec:
+    """Serialization facade over the fastest installed JSON backend.
+
+    ``auto`` picks orjson, then msgspec, then the standard library. Every backend writes
+    non-ASCII text unescaped (the ``ensure_ascii=False`` behaviour the dumps rely on for CJK
+    content) and turns values it cannot encode into strings, like ``json.dumps(default=str)``.
+    orjson is configured to pass datetimes and dataclasses to that fallback so its output
+    matches the standard library's values; msgspec always encodes datetimes as ISO 8601.
+    Compact output of the fast backends omits the blank after separators. A value a fast
+    backend rejects (for example an integer wider than 64 bits) is encoded with the standard
+    library instead.
+    """
+
+    def __init__(self, backend: str = "auto"):
+        """Initialize the codec.
+
+        Args:
+            backend: One of JSON_BACKENDS
+
+        Raises:
+            ValueError: If the backend is unknown or not installed
+        """
+        if backend == "auto":
+            backend = "orjson" if orjson is not None else "msgspec" if msgspec is not None else "json"
+        if backend not in JSON_BACKENDS:
+            raise ValueError(f"Unknown JSON backend '{backend}'. Choose one of {', '.join(JSON_BACKENDS)}.")
+        if (backend == "orjson" and orjson is None) or (backend == "msgspec" and msgspec is None):
+            raise ValueError(f"JSON backend '{backend}' is not installed")
+        self.backend = backend
+        if backend == "msgspec":
+            self._encoder = msgspec.json.Encoder(enc_hook=str)
+            self._decoder = msgspec.json.Decoder()
+
+    def dumps_bytes(self, obj: Any, indent: bool = False) -> bytes:
+        """Encode an object as UTF-8 JSON.
+
+        Args:
+            obj: The object to encode
+            indent: Pretty-print with two-space indentation
+
+        Returns:
+            UTF-8 encoded JSON
+        """
+        try:
+            if self.backend == "orjson":
+                option = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS
+                if indent:
+                    option |= orjson.OPT_INDENT_2
+                return orjson.dumps(obj, default=str, option=option)
+            if self.backend == "msgspec":
+                encoded = self._encoder.encode(obj)
+                return msgspec.json.format(encoded, indent=2) if indent else encoded
+        except Exception as e:
+            logger.debug(f"{self.backend} could not encode value, using the json module: {e}")
+        return json.dumps(obj, default=str, ensure_ascii=False, indent=2 if indent else None).encode("utf-8")
+
+    def dumps(self, obj: Any, indent: bool = False) -> str:
+        """Encode an object as a JSON string.
+
+        Args:
+            obj: The object to encode
+            indent: Pretty-print with two-space indentation
+
+        Returns:
+            JSON string
+        """
+        if self.backend == "json":
+            return json.dumps(obj, default=str, ensure_ascii=False, indent=2 if indent else None)
+        return self.dumps_bytes(obj, indent).decode("utf-8")
+
+    def loads(self, data: str | bytes) -> Any:
+        """Decode a JSON document.
+
+        Args:
+            data: JSON text or UTF-8 bytes
+
+        Returns:
+            The decoded value
+        """
+        if self.backend == "orjson":
+            return orjson.loads(data)
+        if self.backend == "msgspec":
+            return self._decoder.decode(data)
+        return json.loads(data)
+
+
+json_codec = JSONCodec()
+
+
+def configure_json_backend(backend: str) -> JSONCodec:
+    """Replace the process-wide JSON codec.
+
+    Args:
+        backend: One of JSON_BACKENDS
+
+    Returns:
+        The new codec
+    """
+    global json_codec
+    json_codec = JSONCodec(backend)
+    return json_codec
+
+
 def serialize_full_json_string(data: Any) -> str:
     """Serialize data to a full JSON string without truncation.
 
@@ -1255,59 +3065,202 @@ def serialize_full_json_string(data: Any) -> str:
         JSON string representation of the data
     """
     try:
-        # Use default=str to handle datetime and other non-serializable objects
-        # Use ensure_ascii=False to keep Chinese and other Unicode characters readable
-        return json.dumps(data, default=str, ensure_ascii=False)
+        # The codec turns datetimes and other non-serializable objects into strings and
+        # keeps Chinese and other Unicode characters readable
+        return json_codec.dumps(data)
     except Exception as e:
         logger.error(f"Error serializing to full JSON string: {str(e)}")
         return json.dumps({"error": f"Failed to serialize response: {str(e)}"}, ensure_ascii=False)
 
 
-def save_full_data_to_file(data: Any, base_filename_prefix: str, state: "MCPState") -> dict[str, Any]:
-    """Save full data to a JSON file in the configured dump directory.
+def _open_dump_sink(raw: Any, compression: str) -> Any:
+    """Wrap a binary file in the compressor for the configured dump compression.
 
     Args:
-        data: The full data to save
-        base_filename_prefix: Prefix for the filename (e.g., "trace_123")
-        state: MCPState with dump_dir configuration
+        raw: Binary file object opened for writing
+        compression: One of DUMP_COMPRESSIONS
 
     Returns:
-        Dictionary with status information about the file save operation
+        Writable binary stream; closing it finishes the compressed stream but leaves ``raw`` open
     """
-    if not state.dump_dir:
-        logger.warning("Cannot save full data: dump_dir not configured")
-        return {"status": "error", "message": "Dump directory not configured. Use --dump-dir CLI argument.", "file_path": None}
+    if compression == "gzip":
+        return gzip.GzipFile(fileobj=raw, mode="wb", compresslevel=6)
+    if compression == "zstd":
+        return zstandard.ZstdCompressor(level=3).stream_writer(raw, closefd=False)
+    return raw
+
+
+def _json_key(key: Any) -> str:
+    """Convert a dict key to the string the json module would write for it."""
+    if isinstance(key, str):
+        return key
+    if key is True:
+        return "true"
+    if key is False:
+        return "false"
+    if key is None:
+        return "null"
+    if isinstance(key, int | float):
+        return json.dumps(key)
+    return str(key)
+
+
+_encode_json_string = json.encoder.encode_basestring  # ensure_ascii=False escaping, shared by every backend
+_JSON_CONTAINERS = (dict, list, tuple, Iterator)
+
+
+def _encode_json_scalar(value: Any) -> bytes:
+    """Encode a value that is not a dict, list, tuple or iterator as JSON."""
+    cls = value.__class__
+    if cls is str:
+        # Every backend escapes strings alike; skipping the codec keeps the per-value cost low
+        return _encode_json_string(value).encode("utf-8")
+    if value is None:
+        return b"null"
+    if cls is bool:
+        return b"true" if value else b"false"
+    if cls is int:
+        return str(value).encode()
+    return json_codec.dumps_bytes(value)
+
+
+def _stream_json_value(value: Any, out: bytearray, flush: Callable[[], None], depth: int) -> None:
+    """Append one value of a pretty-printed JSON document to a buffer.
+
+    Dicts, lists, tuples and iterators are framed here at every depth, so the codec only
+    ever encodes single scalars and no container is held in memory as encoded text. The
+    buffer is handed to ``flush`` whenever it grows past DUMP_WRITE_BUFFER bytes.
+    """
+    pad = b"\n" + b"  " * depth
+    item_pad = pad + b"  "
+    if isinstance(value, dict):
+        if not value:
+            out += b"{}"
+            return
+        sep = b"{" + item_pad
+        for key, item in value.items():
+            out += sep
+            out += _encode_json_string(_json_key(key)).encode("utf-8")
+            out += b": "
+            if isinstance(item, _JSON_CONTAINERS):
+                _stream_json_value(item, out, flush, depth + 1)
+            else:
+                out += _encode_json_scalar(item)
+            if len(out) >= DUMP_WRITE_BUFFER:
+                flush()
+            sep = b"," + item_pad
+        out += pad + b"}"
+    elif isinstance(value, _JSON_CONTAINERS):
+        # Lists, tuples and lazily produced items (e.g. samples read back from JSONL) are arrays
+        sep = b"[" + item_pad
+        for item in value:
+            out += sep
+            if isinstance(item, _JSON_CONTAINERS):
+                _stream_json_value(item, out, flush, depth + 1)
+            else:
+                out += _encode_json_scalar(item)
+            if len(out) >= DUMP_WRITE_BUFFER:
+                flush()
+            sep = b"," + item_pad
+        out += b"[]" if sep[:1] == b"[" else pad + b"]"
+    else:
+        out += _encode_json_scalar(value)
 
-    # Sanitize the filename prefix
-    safe_prefix = "".join(c for c in base_filename_prefix if c.isalnum() or c in "_-.")
-    if not safe_prefix:
+
+def _write_json_stream(data: Any, sink: Any) -> int:
+    """Encode data as pretty-printed JSON into a binary stream piece by piece.
+
+    Args:
+        data: The data to encode
+        sink: Writable binary stream
+
+    Returns:
+        Number of uncompressed UTF-8 bytes written
+    """
+    written = 0
+    out = bytearray()
+
+    def flush() -> None:
+        nonlocal written
+        sink.write(out)
+        written += len(out)
+        out.clear()
+
+    _stream_json_value(data, out, flush, 0)
+    flush()
+    return written
+
+
+def save_full_data_to_file(data: Any, base_filename_prefix: str, state: "MCPState") -> dict[str, Any]:
+    """Save full data to a JSON file in the configured dump directory.
+
+    The JSON is encoded piece by piece with the configured codec and streamed through the
+    configured compressor, so the dump never exists in memory as a single string. This function blocks; async callers run it
+    in a worker thread through process_data_with_mode.
+
+    Args:
+        data: The full data to save; an iterator is written as an array without being materialized
+        base_filename_prefix: Prefix for the filename (e.g., "trace_123")
+        state: MCPState with dump_dir and dump_compression configuration
+
+    Returns:
+        Dictionary with status information about the file save operation, including the
+        compression used and the compressed and uncompressed byte counts
+    """
+    if not state.dump_dir:
+        logger.warning("Cannot save full data: dump_dir not configured")
+        return {"status": "error", "message": "Dump directory not configured. Use --dump-dir CLI argument.", "file_path": None}
+
+    compression = state.dump_compression
+    if compression == "zstd" and zstandard is None:
+        logger.error("Cannot save full data: zstd compression requires the 'zstandard' package")
+        return {"status": "error", "message": "zstd compression requires the 'zstandard' package.", "file_path": None}
+
+    # Sanitize the filename prefix
+    safe_prefix = "".join(c for c in base_filename_prefix if c.isalnum() or c in "_-.")
+    if not safe_prefix:
         safe_prefix = "langfuse_data"
 
     # Generate a unique filename with timestamp
     timestamp = datetime.now(UTC).strftime("%Y%m%d_%H%M%S_%f")
-    filename = f"{safe_prefix}_{timestamp}.json"
+    filename = f"{safe_prefix}_{timestamp}{DUMP_FILE_EXTENSIONS[compression]}"
     filepath = os.path.join(state.dump_dir, filename)
+    partial_path = f"{filepath}.partial"
 
     try:
         # Ensure the directory exists (extra safety check)
         os.makedirs(state.dump_dir, exist_ok=True)
 
-        # Serialize the data with pretty-printing for better readability
-        # Use ensure_ascii=False to keep Chinese and other Unicode characters readable
-        json_str = json.dumps(data, default=str, indent=2, ensure_ascii=False)
-
-        # Write to file
-        with open(filepath, "w", encoding="utf-8") as f:
-            f.write(json_str)
-
-        logger.info(f"Full data saved to {filepath}")
-        return {"status": "success", "message": "Full data saved successfully.", "file_path": filepath}
+        # Write under a temporary name so a failed dump never leaves a truncated file behind
+        with open(partial_path, "wb") as raw:
+            sink = _open_dump_sink(raw, compression)
+            try:
+                uncompressed_bytes = _write_json_stream(data, sink)
+            finally:
+                if sink is not raw:
+                    sink.close()
+            bytes_written = raw.tell()
+        os.replace(partial_path, filepath)
+
+        logger.info(f"Full data saved to {filepath} ({uncompressed_bytes} bytes, {bytes_written} on disk)")
+        return {
+            "status": "success",
+            "message": "Full data saved successfully.",
+            "file_path": filepath,
+            "compression": compression,
+            "bytes_written": bytes_written,
+            "uncompressed_bytes": uncompressed_bytes,
+        }
     except Exception as e:
         logger.error(f"Error saving full data to file: {str(e)}")
+        try:
+            os.remove(partial_path)
+        except OSError:
+            pass
         return {"status": "error", "message": f"Failed to save full data: {str(e)}", "file_path": None}
 
 
-def process_data_with_mode(
+async def process_data_with_mode(
     data: Any,
     output_mode: OUTPUT_MODE_LITERAL | OutputMode,
     base_filename_prefix: str,
@@ -1336,8 +3289,8 @@ def process_data_with_mode(
         # Process a compact version of the data
         compact_data = process_compact_data(data)
 
-        # Save the full data to a file
-        save_info = save_full_data_to_file(data, base_filename_prefix, state)
+        # Stream the full data to a file without blocking the event loop
+        save_info = await asyncio.to_thread(save_full_data_to_file, data, base_filename_prefix, state)
 
         file_meta = {
             "file_path": save_info.get("file_path"),
@@ -1353,6 +3306,165 @@ def process_data_with_mode(
     return process_compact_data(data), None
 
 
+@dataclass
+class TrainingJob:
+    """A background training-data extraction run by JobManager."""
+
+    id: str
+    params: dict[str, Any]
+    status: str = "queued"  # queued, running, completed, failed or cancelled
+    created_at: datetime = field(default_factory=lambda: datetime.now(UTC))
+    started_at: datetime | None = None
+    finished_at: datetime | None = None
+    progress: dict[str, Any] = field(default_factory=dict)
+    result: dict[str, Any] | None = None
+    error: str | None = None
+    task: asyncio.Task | None = field(default=None, repr=False)
+
+    def to_dict(self) -> dict[str, Any]:
+        """Return the job as a JSON-serializable status record."""
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "params": self.params,
+            "created_at": self.created_at.isoformat(),
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+            "progress": dict(self.progress),
+            "result": self.result,
+            "error": self.error,
+        }
+
+
+class JobManager:
+    """Run long extractions as background tasks of the server process.
+
+    At most `max_concurrent` jobs run at once; later jobs wait in the `queued` state. A job's
+    status record is written to `<dump_dir>/jobs/<job_id>.json` whenever it finishes, next to
+    the files the extraction produced, so results can be found after the server restarts.
+    Finished jobs beyond `max_finished` are forgotten oldest first.
+    """
+
+    def __init__(self, max_concurrent: int = MAX_TRAINING_JOBS, max_finished: int = 100):
+        """Initialize the manager.
+
+        Args:
+            max_concurrent: Jobs allowed to run at the same time
+            max_finished: Finished jobs kept in memory for status queries
+        """
+        self.max_concurrent = max(1, max_concurrent)
+        self.max_finished = max_finished
+        self._slots = asyncio.Semaphore(self.max_concurrent)
+        self._jobs: dict[str, TrainingJob] = {}
+
+    def start(
+        self,
+        run: Callable[[TrainingJob], Awaitable[dict[str, Any]]],
+        params: dict[str, Any],
+        dump_dir: str | None = None,
+    ) -> TrainingJob:
+        """Create a job and schedule it on the running event loop.
+
+        Args:
+            run: Coroutine function performing the work; receives the job and returns its result summary
+            params: Parameters reported with the job's status
+            dump_dir: Directory the job's status record is written to when it finishes
+
+        Returns:
+            The queued job
+        """
+        job = TrainingJob(id=uuid.uuid4().hex[:12], params=params)
+        self._jobs[job.id] = job
+        job.task = asyncio.create_task(self._run(job, run, dump_dir))
+        self._prune()
+        logger.info(f"Queued training job {job.id} ({self.running}/{self.max_concurrent} running)")
+        return job
+
+    async def _run(self, job: TrainingJob, run: Callable[[TrainingJob], Awaitable[dict[str, Any]]], dump_dir: str | None) -> None:
+        """Run a job once a slot is free and record how it ended."""
+        try:
+            async with self._slots:
+                job.status = "running"
+                job.started_at = datetime.now(UTC)
+                job.result = await run(job)
+                job.status = "completed"
+        except asyncio.CancelledError:
+            job.status = "cancelled"
+        except Exception as e:
+            logger.error(f"Training job {job.id} failed: {str(e)}")
+            logger.exception(e)
+            job.status = "failed"
+            job.error = str(e)
+        finally:
+            job.finished_at = datetime.now(UTC)
+            logger.info(f"Training job {job.id} {job.status}")
+            if dump_dir:
+                try:
+                    await asyncio.to_thread(self._write_status, job, dump_dir)
+                except OSError as e:
+                    logger.warning(f"Failed to write status of training job {job.id}: {e}")
+
+    @staticmethod
+    def _write_status(job: TrainingJob, dump_dir: str) -> None:
+        """Write the job's status record into the dump directory."""
+        directory = os.path.join(dump_dir, "jobs")
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, f"{job.id}.json"), "wb") as f:
+            f.write(json_codec.dumps_bytes(job.to_dict(), indent=True))
+
+    def _prune(self) -> None:
+        """Forget the oldest finished jobs beyond `max_finished`."""
+        finished = [job for job in self._jobs.values() if job.finished_at is not None]
+        for job in sorted(finished, key=lambda job: job.finished_at)[: max(0, len(finished) - self.max_finished)]:
+            del self._jobs[job.id]
+
+    @property
+    def running(self) -> int:
+        """Number of jobs currently running."""
+        return sum(1 for job in self._jobs.values() if job.status == "running")
+
+    def get(self, job_id: str) -> TrainingJob:
+        """Return a job by ID.
+
+        Args:
+            job_id: ID returned when the job was started
+
+        Returns:
+            The job
+        """
+        job = self._jobs.get(job_id)
+        if job is None:
+            raise ValueError(f"Unknown training job: {job_id}")
+        return job
+
+    def list_jobs(self) -> list[TrainingJob]:
+        """Return all known jobs, newest first."""
+        return sorted(self._jobs.values(), key=lambda job: job.created_at, reverse=True)
+
+    async def cancel(self, job_id: str) -> TrainingJob:
+        """Cancel a queued or running job and wait until it has stopped.
+
+        Args:
+            job_id: ID returned when the job was started
+
+        Returns:
+            The job, in its final state
+        """
+        job = self.get(job_id)
+        if job.task is not None and not job.task.done():
+            job.task.cancel()
+            await asyncio.gather(job.task, return_exceptions=True)
+        return job
+
+    async def shutdown(self) -> None:
+        """Cancel every unfinished job."""
+        tasks = [job.task for job in self._jobs.values() if job.task is not None and not job.task.done()]
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+
 @dataclass
 class MCPState:
     """State object passed from lifespan context to tools.
@@ -1375,15 +3487,77 @@ class MCPState:
     exceptions_by_filepath: LRUCache = field(
         default_factory=lambda: LRUCache(maxsize=100), metadata={"description": "Mapping of file paths to exception details"}
     )
+    function_to_observations_map: LRUCache = field(
+        default_factory=lambda: LRUCache(maxsize=100), metadata={"description": "Mapping of function names to observation IDs"}
+    )
     dump_dir: str = field(
         default=None, metadata={"description": "Directory to save full JSON dumps when 'output_mode' is 'full_json_file'"}
     )
+    dump_compression: str = field(
+        default="none", metadata={"description": "Compression of full_json_file dumps: 'none', 'gzip' or 'zstd'"}
+    )
     timeout_config: TimeoutConfig = field(
         default_factory=TimeoutConfig, metadata={"description": "HTTP timeout configuration for API requests"}
     )
     retry_manager: "RetryManager" = field(
         default_factory=lambda: RetryManager(RetryConfig()), metadata={"description": "Retry manager for handling failed requests"}
     )
+    api_client: "LangfuseAPIClient | LangfuseSDKAdapter | None" = field(
+        default=None, metadata={"description": "Async data-access client; wraps langfuse_client in a thread adapter when unset"}
+    )
+    rate_limiter: RateLimiter = field(
+        default_factory=RateLimiter, metadata={"description": "Process-wide limiter shared by all Langfuse API requests"}
+    )
+
+    concurrency: AdaptiveConcurrency | None = field(
+        default=None, metadata={"description": "AIMD controller for the limiter's concurrency cap; created when unset"}
+    )
+    request_tracker: RequestTracker | None = field(
+        default=None, metadata={"description": "Process-wide tracker of upstream request latency feeding the controller"}
+    )
+    observation_store: ObservationStore | None = field(
+        default=None, metadata={"description": "Optional on-disk store serving settled observation time ranges locally"}
+    )
+    bucket_cache: ObservationBucketCache | None = field(
+        default=None, metadata={"description": "Time-bucketed view over observation_cache; created when unset"}
+    )
+    filter_pushdown: bool | None = field(
+        default=None, metadata={"description": "Whether the server applies the observations filter parameter; None until probed"}
+    )
+    exception_index: ExceptionIndex | None = field(
+        default=None, metadata={"description": "Per-bucket inverted index over the exception maps; created when unset"}
+    )
+    jobs: JobManager | None = field(
+        default=None, metadata={"description": "Background training-data extraction jobs; created when unset"}
+    )
+    session_cache: LRUCache = field(
+        default_factory=lambda: LRUCache(maxsize=100), metadata={"description": "Traces of idle sessions served by get_session_details"}
+    )
+    session_idle_seconds: float = field(
+        default=SESSION_IDLE_SECONDS, metadata={"description": "Seconds without new traces after which a session is cached; 0 disables"}
+    )
+    format_executor: Executor | None = field(
+        default=None, metadata={"description": "Process pool formatting training samples; formatting uses a worker thread when unset"}
+    )
+
+    def __post_init__(self):
+        """Wire the adaptive concurrency controller and request tracker to the shared limiter."""
+        if self.concurrency is None:
+            self.concurrency = AdaptiveConcurrency(self.rate_limiter, max_limit=self.rate_limiter.concurrency_ceiling)
+        if self.request_tracker is None:
+            self.request_tracker = RequestTracker(controller=self.concurrency)
+        if self.bucket_cache is None:
+            settle_delay = self.observation_store.settle_delay if self.observation_store is not None else STORE_SETTLE_DELAY
+            self.bucket_cache = ObservationBucketCache(self.observation_cache, settle_delay=settle_delay)
+        if self.jobs is None:
+            self.jobs = JobManager()
+        if self.exception_index is None:
+            self.exception_index = ExceptionIndex(
+                by_file=self.file_to_observations_map,
+                by_function=self.function_to_observations_map,
+                by_type=self.exception_type_map,
+                details_by_file=self.exceptions_by_filepath,
+            )
 
 
 class ExceptionCount(BaseModel):
@@ -1448,29 +3622,21 @@ def clear_caches(state: MCPState) -> None:
     state.file_to_observations_map.clear()
     state.exception_type_map.clear()
     state.exceptions_by_filepath.clear()
-
-    # Also clear the LRU cache
-    _get_cached_observation.cache_clear()
+    state.function_to_observations_map.clear()
+    state.session_cache.clear()
 
     logger.debug("All caches cleared")
 
 
-@lru_cache(maxsize=1000)
-def _get_cached_observation(langfuse_client: Langfuse, observation_id: str) -> Any:
-    """Cache observation details to avoid duplicate API calls."""
-    try:
-        observation = _get_observation(langfuse_client, observation_id)
-        return _sdk_object_to_python(observation)
-    except Exception as e:
-        logger.warning(f"Error fetching observation {observation_id}: {str(e)}")
-        return None
-
-
 async def _efficient_fetch_observations(
     state: MCPState, from_timestamp: datetime, to_timestamp: datetime, filepath: str = None
 ) -> dict[str, Any]:
     """Efficiently fetch observations with exception filtering.
 
+    Observations come from the time-bucketed cache, so repeated or overlapping windows only
+    fetch the buckets that are not cached yet, and a filepath filter is answered from the
+    exception index.
+
     Args:
         state: MCP state with Langfuse client and caches
         from_timestamp: Start time
@@ -1478,94 +3644,228 @@ async def _efficient_fetch_observations(
         filepath: Optional filter by filepath
 
     Returns:
-        Dictionary of observation_id -> observation
-    """
-    langfuse_client = state.langfuse_client
-
-    # Use a cache key that includes the time range
-    cache_key = f"{from_timestamp.isoformat()}-{to_timestamp.isoformat()}"
-
-    # Check if we've already processed this time range
-    if hasattr(state, "observation_cache") and cache_key in state.observation_cache:
-        logger.info("Using cached observations")
-        return state.observation_cache[cache_key]
-
-    # Fetch observations from Langfuse
-    observation_items, _ = _list_observations(
-        langfuse_client,
-        limit=500,
-        page=1,
-        from_start_time=from_timestamp,
-        to_start_time=to_timestamp,
-        obs_type="SPAN",
-        name=None,
-        user_id=None,
-        trace_id=None,
-        parent_observation_id=None,
-        metadata=None,
-    )
+        Dictionary of observation_id -> span record
+    """
+    scan = await _scan_exception_window(state, from_timestamp, to_timestamp)
+    wanted = None
+    if filepath is not None:
+        wanted = state.exception_index.observation_ids(
+            "file", filepath, EXCEPTION_SCOPE, scan.buckets, from_timestamp, to_timestamp
+        )
+    return {
+        record.id: record
+        for record in ObservationBucketCache.stitch(scan.buckets, from_timestamp, to_timestamp)
+        if record.id and (wanted is None or record.id in wanted)
+    }
 
-    # Process observations and build indices
-    observations: dict[str, Any] = {}
-    for obs in observation_items:
-        events = []
-        if hasattr(obs, "events"):
-            events = getattr(obs, "events") or []
-        elif isinstance(obs, dict):
-            events = obs.get("events", [])
-
-        if not events:
-            continue
 
-        for event in events:
-            attributes = getattr(event, "attributes", None)
-            if attributes is None and isinstance(event, dict):
-                attributes = event.get("attributes")
-            if not attributes or not attributes.get("exception.type"):
-                continue
+@dataclass
+class ScanCoverage:
+    """How much of a window a streaming exception scan covered."""
+
+    window_start: datetime
+    window_end: datetime
+    pages_scanned: int = 0
+    pages_from_store: int = 0
+    buckets_from_cache: int = 0
+    buckets_fetched: int = 0
+    failed_ranges: list[tuple[datetime, datetime]] = field(default_factory=list)
+    errors: list[str] = field(default_factory=list)
+    # Bucket index -> exception span records of every bucket scanned successfully, for index lookups
+    buckets: dict[int, list[SpanRecord]] = field(default_factory=dict, repr=False)
+
+    @property
+    def coverage(self) -> float:
+        """Fraction of the window that was scanned without errors."""
+        window_seconds = (self.window_end - self.window_start).total_seconds()
+        if window_seconds <= 0:
+            return 1.0
+        failed_seconds = sum(
+            max(0.0, (min(end, self.window_end) - max(start, self.window_start)).total_seconds())
+            for start, end in self.failed_ranges
+        )
+        return max(0.0, 1 - failed_seconds / window_seconds)
+
+    def to_dict(self) -> dict[str, Any]:
+        """Return the coverage report for response metadata."""
+        return {
+            "pages_scanned": self.pages_scanned,
+            "pages_from_store": self.pages_from_store,
+            "buckets_from_cache": self.buckets_from_cache,
+            "buckets_fetched": self.buckets_fetched,
+            "coverage": round(self.coverage, 4),
+            "failed_ranges": [{"from": start.isoformat(), "to": end.isoformat()} for start, end in self.failed_ranges],
+        }
 
-            # Store observation
-            obs_id = getattr(obs, "id", None) or obs.get("id") if isinstance(obs, dict) else None
-            if not obs_id:
+
+async def _scan_exception_window(
+    state: MCPState,
+    from_timestamp: datetime,
+    to_timestamp: datetime,
+    fold: Callable[[SpanRecord], None] | None = None,
+) -> ScanCoverage:
+    """Stream every SPAN with exception events in a window into `fold`.
+
+    Cached hourly buckets are folded first. Missing buckets are fetched as aligned runs with all
+    pages in flight concurrently (through the observation store), and each page is folded as it
+    arrives. Each span is reduced to a SpanRecord while its page is processed and spans without
+    exception events are dropped; a run's records are kept only until the run is cached. A run with a failed page is reported in
+    `failed_ranges` and not cached. Observations are not delivered in time order. Fetched
+    buckets are added to the exception index, and every bucket scanned successfully is returned
+    in `ScanCoverage.buckets` for index lookups.
+
+    Args:
+        state: MCP state with the data-access client and caches
+        from_timestamp: Window start
+        to_timestamp: Window end
+        fold: Optional callback receiving the record of each span with exception events inside the window
+
+    Returns:
+        Coverage report of the scan
+
+    Raises:
+        Exception: If nothing of the window could be scanned
+    """
+    now = datetime.now(UTC)
+    from_ts, to_ts = from_timestamp.timestamp(), to_timestamp.timestamp()
+    buckets, runs = state.bucket_cache.lookup(EXCEPTION_SCOPE, from_timestamp, to_timestamp, now=now)
+    coverage = ScanCoverage(from_timestamp, to_timestamp, buckets_from_cache=len(buckets), buckets=buckets)
+
+    if fold is not None:
+        for observation in ObservationBucketCache.stitch(buckets, from_timestamp, to_timestamp):
+            fold(observation)
+
+    if not runs:
+        return coverage
+
+    run_spans: list[list[SpanRecord]] = [[] for _ in runs]
+    failed_runs: set[int] = set()
+    first_error: Exception | None = None
+    async with ObservationScan(state, RequestTracker(), obs_type="SPAN", windows=runs) as scan:
+        async for result in scan:
+            run_index = scan.parts[result.segment_index].window
+            if result.error is not None:
+                logger.warning(f"Exception scan: page {result.page} of {runs[run_index]} failed: {str(result.error)}")
+                failed_runs.add(run_index)
+                coverage.errors.append(str(result.error))
+                first_error = first_error or result.error
                 continue
-            observations[obs_id] = _sdk_object_to_python(obs)
 
-            # Update file index if we have filepath info
-            metadata_block = getattr(obs, "metadata", None)
-            if metadata_block is None and isinstance(obs, dict):
-                metadata_block = obs.get("metadata")
-            if metadata_block:
-                file = metadata_block.get("code.filepath")
-                if file:
-                    if file not in state.file_to_observations_map:
-                        state.file_to_observations_map[file] = set()
-                    state.file_to_observations_map[file].add(obs_id)
+            coverage.pages_scanned += 1
+            run_start, run_end = (bound.timestamp() for bound in runs[run_index])
+            for item in result.items:
+                record = SpanRecord.from_item(item)
+                # Items on the closing boundary belong to the next bucket, which is not part of this run
+                if record is None or not run_start <= record.start_ts < run_end:
+                    continue
+                run_spans[run_index].append(record)
+                if fold is not None and from_ts <= record.start_ts <= to_ts:
+                    fold(record)
+    coverage.pages_from_store = scan.local_pages
+
+    for run_index, (run_start, run_end) in enumerate(runs):
+        if run_index in failed_runs:
+            coverage.failed_ranges.append((run_start, run_end))
+            continue
+        fetched = state.bucket_cache.store(EXCEPTION_SCOPE, run_start, run_end, run_spans[run_index], now=now)
+        for index, records in fetched.items():
+            state.exception_index.index_bucket(EXCEPTION_SCOPE, index, records)
+        coverage.buckets.update(fetched)
+        coverage.buckets_fetched += len(fetched)
+        run_spans[run_index] = []
 
-            # Update exception type index
-            exc_type = attributes["exception.type"]
-            if exc_type not in state.exception_type_map:
-                state.exception_type_map[exc_type] = set()
-            state.exception_type_map[exc_type].add(obs_id)
+    if first_error is not None and coverage.coverage == 0:
+        raise first_error
+    logger.debug(f"Exception scan of {from_timestamp.isoformat()} - {to_timestamp.isoformat()}: {coverage.to_dict()}")
+    return coverage
 
-    # Cache the processed observations
-    state.observation_cache[cache_key] = observations
 
-    return observations
+async def _fetch_trace_observations(state: MCPState, trace_id: str, tracker: RequestTracker) -> dict[str, Any]:
+    """Fetch every observation of a trace with paginated bulk requests.
 
+    Args:
+        state: MCP state with the data-access client
+        trace_id: Trace whose observations should be fetched
+        tracker: RequestTracker recording request performance
 
-async def _embed_observations_in_traces(state: MCPState, traces: list[Any]) -> None:
+    Returns:
+        Dictionary of observation_id -> normalized observation
+    """
+    observations: dict[str, Any] = {}
+    page = 1
+    while True:
+        items, _ = await _list_observations_with_retry(
+            state,
+            tracker,
+            limit=HYDRATION_PAGE_SIZE,
+            page=page,
+            from_start_time=None,
+            to_start_time=None,
+            obs_type=None,
+            trace_id=trace_id,
+        )
+        for item in items:
+            obs_data = _record(item)
+            if isinstance(obs_data, dict) and obs_data.get("id"):
+                observations[obs_data["id"]] = obs_data
+        if len(items) < HYDRATION_PAGE_SIZE:
+            return observations
+        page += 1
+
+
+async def _embed_observations_in_traces(
+    state: MCPState, traces: list[Any], concurrency: int = HYDRATION_CONCURRENCY
+) -> None:
     """Fetch and embed full observation objects into traces.
 
     This replaces the observation IDs list with a list of the actual observation objects.
+    Observations are fetched per trace in bulk (paginated `observations.get_many(trace_id=...)`),
+    with traces hydrated concurrently under a semaphore. Single-ID gets are only used for IDs
+    the bulk listing did not return, or for every ID of a trace whose bulk listing failed.
 
     Args:
         state: MCP state with Langfuse client
         traces: List of trace objects to process
+        concurrency: Maximum number of concurrent hydration requests
     """
     if not traces:
         return
 
-    # Process each trace
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    tracker = RequestTracker()
+
+    async def fetch_single(obs_id: str, trace_id: str) -> Any:
+        async with semaphore:
+            try:
+                obs = await _get_observation(state, obs_id)
+                logger.debug(f"Fetched observation {obs_id} for trace {trace_id} individually")
+                return _record(obs)
+            except Exception as e:
+                logger.warning(f"Error fetching observation {obs_id}: {str(e)}")
+                return {"id": obs_id, "fetch_error": str(e)}
+
+    async def hydrate(trace: dict[str, Any], observation_refs: list[str]) -> None:
+        trace_id = trace.get("id", "unknown")
+        fetched: dict[str, Any] = {}
+        if trace.get("id"):
+            try:
+                async with semaphore:
+                    fetched = await _fetch_trace_observations(state, trace["id"], tracker)
+            except Exception as e:
+                logger.warning(f"Bulk observation fetch failed for trace {trace_id}, falling back to single gets: {str(e)}")
+
+        missing = [obs_id for obs_id in observation_refs if obs_id not in fetched]
+        if missing:
+            singles = await asyncio.gather(*(fetch_single(obs_id, trace_id) for obs_id in missing))
+            fetched.update(zip(missing, singles))
+
+        trace["observations"] = [fetched[obs_id] for obs_id in observation_refs]
+        logger.debug(
+            f"Embedded {len(observation_refs)} observations in trace {trace_id} "
+            f"({len(observation_refs) - len(missing)} bulk, {len(missing)} individually)"
+        )
+
+    pending = []
     for trace in traces:
         if not isinstance(trace, dict) or "observations" not in trace:
             continue
@@ -1581,23 +3881,238 @@ async def _embed_observations_in_traces(state: MCPState, traces: list[Any]) -> N
         # If we already have hydrated observation objects, normalize them and continue
         first_ref = observation_refs[0]
         if not isinstance(first_ref, str):
-            trace["observations"] = [_sdk_object_to_python(obs) for obs in observation_refs]
+            trace["observations"] = [_record(obs) for obs in observation_refs]
             continue
 
-        # Fetch each observation when only IDs are provided
-        full_observations = []
-        for obs_id in observation_refs:
-            try:
-                obs = _get_observation(state.langfuse_client, obs_id)
-                obs_data = _sdk_object_to_python(obs)
-                full_observations.append(obs_data)
-                logger.debug(f"Fetched observation {obs_id} for trace {trace.get('id', 'unknown')}")
-            except Exception as e:
-                logger.warning(f"Error fetching observation {obs_id}: {str(e)}")
-                full_observations.append({"id": obs_id, "fetch_error": str(e)})
+        pending.append(hydrate(trace, observation_refs))
+
+    if pending:
+        await asyncio.gather(*pending)
+        logger.debug(f"Hydrated observations for {len(pending)} traces in {tracker.metrics.total_requests} bulk requests")
+
+
+class _SessionGrouper:
+    """Group a user's traces into sessions as newest-first pages arrive.
+
+    Traces are added in listing order, so sessions are first seen in order of their most recent
+    trace. With a limit, traces of sessions beyond the first `limit` are skipped and recorded in
+    `skipped_sessions`; the kept sessions only need their older traces to be complete.
+    """
+
+    def __init__(self, user_id: str, limit: int | None = None):
+        """Initialize the grouper.
+
+        Args:
+            user_id: User the sessions belong to
+            limit: Maximum number of sessions to keep, or None to keep all
+        """
+        self.user_id = user_id
+        self.limit = limit
+        self.sessions: dict[str, dict[str, Any]] = {}
+        self.skipped_sessions: set[str] = set()
+        self.trace_count = 0
+        self.oldest_timestamp: float | None = None
+        self._trace_ids: set[str] = set()
+        self._bounds: dict[str, tuple[float, float]] = {}
+
+    @property
+    def full(self) -> bool:
+        """Whether `limit` sessions have been seen."""
+        return self.limit is not None and len(self.sessions) >= self.limit
+
+    def add(self, traces: Iterable[dict[str, Any]]) -> None:
+        """Add a page of traces, skipping duplicates and traces without a session."""
+        for trace in traces:
+            epoch = _to_epoch(trace.get("timestamp"))
+            if epoch is not None and (self.oldest_timestamp is None or epoch < self.oldest_timestamp):
+                self.oldest_timestamp = epoch
+            trace_id = trace.get("id")
+            session_id = trace.get("session_id")
+            if not session_id or trace_id in self._trace_ids:
+                continue
+            session = self.sessions.get(session_id)
+            if session is None:
+                if self.full:
+                    self.skipped_sessions.add(session_id)
+                    continue
+                session = self.sessions[session_id] = {
+                    "id": session_id,
+                    "traces": [],
+                    "first_timestamp": None,
+                    "last_timestamp": None,
+                    "user_id": self.user_id,
+                }
+            self._trace_ids.add(trace_id)
+            session["traces"].append(trace)
+            self.trace_count += 1
+            if epoch is None:
+                continue
+            first, last = self._bounds.get(session_id, (epoch, epoch))
+            if epoch <= first:
+                first, session["first_timestamp"] = epoch, trace.get("timestamp")
+            if epoch >= last:
+                last, session["last_timestamp"] = epoch, trace.get("timestamp")
+            self._bounds[session_id] = (first, last)
+
+    def result(self) -> list[dict[str, Any]]:
+        """Return the sessions with trace counts, most recently active first."""
+        sessions = list(self.sessions.values())
+        for session in sessions:
+            session["trace_count"] = len(session["traces"])
+        sessions.sort(key=lambda session: self._bounds.get(session["id"], (0.0, 0.0))[1], reverse=True)
+        return sessions
+
+
+async def _group_user_sessions(
+    state: MCPState, user_id: str, from_timestamp: datetime, include_observations: bool, limit: int | None
+) -> tuple[_SessionGrouper, dict[str, Any]]:
+    """Page through a user's traces and group them into sessions.
+
+    All pages of the window are fetched concurrently through a PagePrefetcher and grouped in
+    listing order. With a limit, the walk stops as soon as `limit` sessions have been seen; the
+    older traces of those sessions are then listed per session, bounded by the oldest trace the
+    walk reached, instead of fetching older pages of the user.
+
+    Args:
+        state: MCP state with the data-access client
+        user_id: User whose traces are listed
+        from_timestamp: Start of the window
+        include_observations: Whether traces are listed with their observations
+        limit: Maximum number of most recent sessions, or None for all sessions in the window
+
+    Returns:
+        Tuple of (grouper, walk statistics)
+    """
+    grouper = _SessionGrouper(user_id, limit)
+    tracker = state.request_tracker
+    stats: dict[str, Any] = {"pages_fetched": 0, "session_pages_fetched": 0, "walk_complete": True}
+
+    async def fetch_user_page(_segment: int, page: int) -> tuple[list[Any], dict[str, Any]]:
+        return await _list_traces_with_retry(
+            state,
+            tracker,
+            limit=SESSION_TRACES_PAGE_SIZE,
+            page=page,
+            include_observations=include_observations,
+            from_timestamp=from_timestamp,
+            user_id=user_id,
+        )
+
+    async with PagePrefetcher(
+        fetch_user_page, segment_count=1, page_size=SESSION_TRACES_PAGE_SIZE, concurrency=lambda: state.concurrency.limit
+    ) as pages:
+        async for result in pages:
+            if result.error is not None:
+                raise result.error
+            stats["pages_fetched"] += 1
+            if result.page == 1 and result.pagination.get("total") is not None:
+                stats["total_traces"] = result.pagination["total"]
+            grouper.add(_record(trace) for trace in result.items)
+            tracker.log_progress(result.page, grouper.trace_count)
+            if grouper.full and len(result.items) == SESSION_TRACES_PAGE_SIZE:
+                stats["walk_complete"] = False
+                break
+
+    if stats["walk_complete"] or grouper.oldest_timestamp is None:
+        return grouper, stats
+
+    # Traces at the boundary timestamp are listed again and dropped as duplicates.
+    to_timestamp = datetime.fromtimestamp(grouper.oldest_timestamp, UTC)
+    session_ids = list(grouper.sessions)
+
+    async def fetch_session_page(segment: int, page: int) -> tuple[list[Any], dict[str, Any]]:
+        return await _list_traces_with_retry(
+            state,
+            tracker,
+            limit=SESSION_TRACES_PAGE_SIZE,
+            page=page,
+            include_observations=include_observations,
+            from_timestamp=from_timestamp,
+            to_timestamp=to_timestamp,
+            user_id=user_id,
+            session_id=session_ids[segment],
+        )
+
+    async with PagePrefetcher(
+        fetch_session_page, segment_count=len(session_ids), page_size=SESSION_TRACES_PAGE_SIZE, concurrency=lambda: state.concurrency.limit
+    ) as pages:
+        async for result in pages:
+            if result.error is not None:
+                raise result.error
+            stats["session_pages_fetched"] += 1
+            grouper.add(_record(trace) for trace in result.items)
+    return grouper, stats
+
+
+async def _fetch_session_traces(
+    state: MCPState, session_id: str, include_observations: bool, field_groups: str | None
+) -> tuple[list[dict[str, Any]], dict[str, Any]]:
+    """Fetch every trace of a session, oldest first.
+
+    The sessions endpoint bounds the trace listing: it reports whether the session exists and
+    when it started, so the listing starts at the session instead of at the epoch. All pages of
+    the listing are then fetched concurrently through a PagePrefetcher. When the session lookup
+    fails the listing falls back to starting at the epoch.
+
+    Args:
+        state: MCP state with the data-access client
+        session_id: Session to fetch
+        include_observations: Whether traces are listed with their observations
+        field_groups: `fields` selector of the trace listing, or None for the default groups
 
-        trace["observations"] = full_observations
-        logger.debug(f"Embedded {len(full_observations)} observations in trace {trace.get('id', 'unknown')}")
+    Returns:
+        Tuple of (traces ordered by timestamp, fetch statistics)
+    """
+    stats: dict[str, Any] = {"pages_fetched": 0, "session_lookup": True}
+    from_timestamp = datetime.fromtimestamp(0, tz=UTC)
+    try:
+        session = _record(await _get_session(state, session_id))
+    except Exception as e:
+        logger.warning(f"Session lookup for {session_id} failed, listing its traces from the epoch: {str(e)}")
+        stats["session_lookup"] = False
+    else:
+        if not session or not session.get("id"):
+            return [], stats
+        starts = [_to_epoch(session.get("created_at"))]
+        starts += [_to_epoch(trace.get("timestamp")) for trace in session.get("traces") or [] if isinstance(trace, dict)]
+        starts = [start for start in starts if start is not None]
+        if starts:
+            from_timestamp = datetime.fromtimestamp(min(starts), UTC)
+
+    async def fetch_page(_segment: int, page: int) -> tuple[list[Any], dict[str, Any]]:
+        return await _list_traces_with_retry(
+            state,
+            state.request_tracker,
+            limit=SESSION_TRACES_PAGE_SIZE,
+            page=page,
+            include_observations=include_observations,
+            from_timestamp=from_timestamp,
+            session_id=session_id,
+            field_groups=field_groups,
+        )
+
+    traces: dict[str, dict[str, Any]] = {}
+    async with PagePrefetcher(
+        fetch_page, segment_count=1, page_size=SESSION_TRACES_PAGE_SIZE, concurrency=lambda: state.concurrency.limit
+    ) as pages:
+        async for result in pages:
+            if result.error is not None:
+                raise result.error
+            stats["pages_fetched"] += 1
+            for item in result.items:
+                trace = _record(item)
+                traces.setdefault(trace.get("id"), trace)
+
+    ordered = sorted(traces.values(), key=lambda trace: _to_epoch(trace.get("timestamp")) or 0.0)
+    return ordered, stats
+
+
+def _session_is_idle(traces: list[dict[str, Any]], idle_seconds: float, now: float | None = None) -> bool:
+    """Whether the newest trace of a session is older than `idle_seconds` (never when idle_seconds is 0)."""
+    if idle_seconds <= 0 or not traces:
+        return False
+    last = _to_epoch(traces[-1].get("timestamp"))
+    return last is not None and (now if now is not None else time.time()) - last > idle_seconds
 
 
 async def fetch_traces(
@@ -1619,6 +4134,7 @@ async def fetch_traces(
             "Pairs well with output_mode='full_json_file' for complete dumps."
         ),
     ),
+    fields: str | None = Field(None, description=FIELDS_DESCRIPTION),
     output_mode: OUTPUT_MODE_LITERAL = Field(
         OutputMode.COMPACT,
         description=(
@@ -1648,6 +4164,8 @@ async def fetch_traces(
         include_observations: If True, fetch and include the full observation objects instead of just IDs.
             Use this when you need access to system prompts, model parameters, or other details stored
             within observations. Significantly increases response time but provides complete data.
+        fields: Optional comma-separated dotted paths to return, e.g. 'id,name,metadata.langgraph_node'.
+            Pushed down to the API `fields` selector, so unneeded groups such as input/output are not fetched.
         output_mode: Controls the output format and detail level
 
     Returns:
@@ -1686,9 +4204,14 @@ async def fetch_traces(
             else:
                 tags_list = [tags]
 
+        # Observations are only embedded when the projection keeps them
+        field_tree = _parse_field_paths(fields)
+        if field_tree is not None and "observations" not in field_tree:
+            include_observations = False
+
         # Use the resource-style API when available (Langfuse v3) with fallback to v2 helpers
-        trace_items, pagination = _list_traces(
-            state.langfuse_client,
+        trace_items, pagination = await _list_traces(
+            state,
             limit=limit,
             page=page,
             include_observations=include_observations,
@@ -1698,20 +4221,23 @@ async def fetch_traces(
             user_id=user_id,
             session_id=session_id,
             metadata=metadata,
+            field_groups=_trace_field_groups(field_tree, metadata) if field_tree else None,
         )
 
         # Convert response to a serializable format
-        raw_traces = [_sdk_object_to_python(trace) for trace in trace_items]
+        raw_traces = [_record(trace) for trace in trace_items]
 
         # If include_observations is True, fetch and embed the full observation objects
         if include_observations and raw_traces:
             logger.info(f"Fetching full observation details for {sum(len(t.get('observations', [])) for t in raw_traces)} observations")
             await _embed_observations_in_traces(state, raw_traces)
 
+        raw_traces = _project_fields(raw_traces, field_tree)
+
         # Process based on output mode
         mode = _ensure_output_mode(output_mode)
         base_filename_prefix = "traces"
-        processed_data, file_meta = process_data_with_mode(raw_traces, mode, base_filename_prefix, state)
+        processed_data, file_meta = await process_data_with_mode(raw_traces, mode, base_filename_prefix, state)
 
         logger.info(f"Found {len(raw_traces)} traces, returning with output_mode={mode}, include_observations={include_observations}")
 
@@ -1724,6 +4250,8 @@ async def fetch_traces(
             "file_path": None,
             "file_info": None,
         }
+        if field_tree:
+            metadata_block["fields"] = fields
         if pagination.get("next_page") is not None:
             metadata_block["next_page"] = pagination["next_page"]
         if pagination.get("total") is not None:
@@ -1791,10 +4319,10 @@ async def fetch_trace(
 
     try:
         # Use the resource-style API when available
-        trace = _get_trace(state.langfuse_client, trace_id, include_observations)
+        trace = await _get_trace(state, trace_id, include_observations)
 
         # Convert response to a serializable format
-        raw_trace = _sdk_object_to_python(trace)
+        raw_trace = _record(trace)
 
         if not isinstance(raw_trace, dict):
             logger.debug("Trace response normalized into dictionary structure")
@@ -1810,7 +4338,7 @@ async def fetch_trace(
         # Process based on output mode
         mode = _ensure_output_mode(output_mode)
         base_filename_prefix = f"trace_{trace_id}"
-        processed_data, file_meta = process_data_with_mode(raw_trace, mode, base_filename_prefix, state)
+        processed_data, file_meta = await process_data_with_mode(raw_trace, mode, base_filename_prefix, state)
 
         logger.info(f"Retrieved trace {trace_id}, returning with output_mode={mode}, include_observations={include_observations}")
 
@@ -1844,6 +4372,7 @@ async def fetch_observations(
     parent_observation_id: str | None = Field(None, description="Optional parent observation ID filter (exact match)"),
     page: int = Field(1, description="Page number for pagination (starts at 1)"),
     limit: int = Field(50, description="Maximum number of observations to return per page"),
+    fields: str | None = Field(None, description=FIELDS_DESCRIPTION),
     output_mode: OUTPUT_MODE_LITERAL = Field(
         OutputMode.COMPACT,
         description=(
@@ -1866,6 +4395,7 @@ async def fetch_observations(
         parent_observation_id: Optional parent observation ID filter (exact match)
         page: Page number for pagination (starts at 1)
         limit: Maximum number of observations to return per page
+        fields: Optional comma-separated dotted paths to return, e.g. 'id,name,metadata.langgraph_node,usage'
         output_mode: Controls the output format and detail level
 
     Returns:
@@ -1883,8 +4413,8 @@ async def fetch_observations(
     metadata = None  # Metadata filtering not currently exposed for this tool
 
     try:
-        observation_items, pagination = _list_observations(
-            state.langfuse_client,
+        observation_items, pagination = await _list_observations(
+            state,
             limit=limit,
             page=page,
             from_start_time=from_start_time,
@@ -1897,13 +4427,17 @@ async def fetch_observations(
             metadata=metadata,
         )
 
-        # Convert response to a serializable format
-        raw_observations = [_sdk_object_to_python(obs) for obs in observation_items]
+        # Convert response to a serializable format; a projection builds new dicts of the kept paths only
+        field_tree = _parse_field_paths(fields)
+        if field_tree is None:
+            raw_observations = [_record(obs) for obs in observation_items]
+        else:
+            raw_observations = _project_fields(list(observation_items), field_tree)
 
         # Process based on output mode
         mode = _ensure_output_mode(output_mode)
         base_filename_prefix = f"observations_{type or 'all'}"
-        processed_data, file_meta = process_data_with_mode(raw_observations, mode, base_filename_prefix, state)
+        processed_data, file_meta = await process_data_with_mode(raw_observations, mode, base_filename_prefix, state)
 
         logger.info(f"Found {len(raw_observations)} observations, returning with output_mode={mode}")
 
@@ -1916,6 +4450,8 @@ async def fetch_observations(
             "file_path": None,
             "file_info": None,
         }
+        if field_tree:
+            metadata_block["fields"] = fields
         if pagination.get("next_page") is not None:
             metadata_block["next_page"] = pagination["next_page"]
         if pagination.get("total") is not None:
@@ -1933,6 +4469,7 @@ async def fetch_observations(
 async def fetch_observation(
     ctx: Context,
     observation_id: str = Field(..., description="The ID of the observation to fetch (unique identifier string)"),
+    fields: str | None = Field(None, description=FIELDS_DESCRIPTION),
     output_mode: OUTPUT_MODE_LITERAL = Field(
         OutputMode.COMPACT,
         description=(
@@ -1948,6 +4485,7 @@ async def fetch_observation(
     Args:
         ctx: Context object containing lifespan context with Langfuse client
         observation_id: The ID of the observation to fetch (unique identifier string)
+        fields: Optional comma-separated dotted paths to return, e.g. 'id,name,metadata.langgraph_node,usage'
         output_mode: Controls the output format and detail level
 
     Returns:
@@ -1960,15 +4498,16 @@ async def fetch_observation(
 
     try:
         # Use the resource-style API when available
-        observation = _get_observation(state.langfuse_client, observation_id)
+        observation = await _get_observation(state, observation_id)
 
-        # Convert response to a serializable format
-        raw_observation = _sdk_object_to_python(observation)
+        # Convert response to a serializable format, keeping only the requested paths
+        field_tree = _parse_field_paths(fields)
+        raw_observation = _record(observation) if field_tree is None else _project_fields(observation, field_tree)
 
         # Process based on output mode
         base_filename_prefix = f"observation_{observation_id}"
         mode = _ensure_output_mode(output_mode)
-        processed_data, file_meta = process_data_with_mode(raw_observation, mode, base_filename_prefix, state)
+        processed_data, file_meta = await process_data_with_mode(raw_observation, mode, base_filename_prefix, state)
 
         logger.info(f"Retrieved observation {observation_id}, returning with output_mode={mode}")
 
@@ -1976,6 +4515,8 @@ async def fetch_observation(
             return processed_data
 
         metadata_block = {"file_path": None, "file_info": None}
+        if field_tree:
+            metadata_block["fields"] = fields
         if file_meta:
             metadata_block.update(file_meta)
 
@@ -2024,20 +4565,20 @@ async def fetch_sessions(
     from_timestamp = datetime.now(UTC) - timedelta(minutes=age)
 
     try:
-        session_items, pagination = _list_sessions(
-            state.langfuse_client,
+        session_items, pagination = await _list_sessions(
+            state,
             limit=limit,
             page=page,
             from_timestamp=from_timestamp,
         )
 
         # Convert response to a serializable format
-        raw_sessions = [_sdk_object_to_python(session) for session in session_items]
+        raw_sessions = [_record(session) for session in session_items]
 
         # Process based on output mode
         base_filename_prefix = "sessions"
         mode = _ensure_output_mode(output_mode)
-        sessions_payload, file_meta = process_data_with_mode(raw_sessions, mode, base_filename_prefix, state)
+        sessions_payload, file_meta = await process_data_with_mode(raw_sessions, mode, base_filename_prefix, state)
 
         logger.info(f"Found {len(raw_sessions)} sessions, returning with output_mode={mode}")
 
@@ -2071,6 +4612,7 @@ async def get_session_details(
             "Pairs well with output_mode='full_json_file' for complete dumps."
         ),
     ),
+    fields: str | None = Field(None, description=FIELDS_DESCRIPTION),
     output_mode: OUTPUT_MODE_LITERAL = Field(
         OutputMode.COMPACT,
         description=(
@@ -2083,12 +4625,18 @@ async def get_session_details(
 ) -> ResponseDict | str:
     """Get detailed information about a specific session.
 
+    The session is looked up through the sessions endpoint and all pages of its traces are
+    fetched concurrently. Sessions without new traces for longer than the configured idle time
+    are cached as immutable, so repeated lookups are served from memory.
+
     Args:
         ctx: Context object containing lifespan context with Langfuse client
         session_id: The ID of the session to retrieve (unique identifier string)
         include_observations: If True, fetch and include the full observation objects instead of just IDs.
             Use this when you need access to system prompts, model parameters, or other details stored
             within observations. Significantly increases response time but provides complete data.
+        fields: Optional comma-separated dotted paths to return for each trace of the session.
+            Pushed down to the API `fields` selector like in fetch_traces.
         output_mode: Controls the output format and detail level
 
     Returns:
@@ -2105,27 +4653,29 @@ async def get_session_details(
     state = cast(MCPState, ctx.request_context.lifespan_context)
 
     try:
-        # Fetch traces with this session ID
-        trace_items, pagination = _list_traces(
-            state.langfuse_client,
-            limit=50,
-            page=1,
-            include_observations=include_observations,
-            tags=None,
-            from_timestamp=datetime.fromtimestamp(0, tz=UTC),
-            name=None,
-            user_id=None,
-            session_id=session_id,
-            metadata=None,
-        )
+        # Session-level fields (timestamps, user) are read from the traces, so the projection is applied after them
+        field_tree = _parse_field_paths(fields)
+        if field_tree is not None and "observations" not in field_tree:
+            include_observations = False
+        field_groups = None
+        if field_tree is not None:
+            field_groups = _trace_field_groups({**field_tree, "timestamp": None, "user_id": None}, None)
 
-        # If no traces were found, return an empty dict
         mode = _ensure_output_mode(output_mode)
 
-        if not trace_items:
+        # Idle sessions no longer change; their traces are cached per fetch variant
+        cache_key = (session_id, include_observations, field_groups)
+        raw_traces = state.session_cache.get(cache_key)
+        cached = raw_traces is not None
+        fetch_stats: dict[str, Any] = {"pages_fetched": 0}
+        if not cached:
+            raw_traces, fetch_stats = await _fetch_session_traces(state, session_id, include_observations, field_groups)
+
+        # If no traces were found, return an empty dict
+        if not raw_traces:
             logger.info(f"No session found with ID: {session_id}")
             empty_session = {"id": session_id, "traces": [], "trace_count": 0, "found": False}
-            processed_session, file_meta = process_data_with_mode(empty_session, mode, f"session_{session_id}", state)
+            processed_session, file_meta = await process_data_with_mode(empty_session, mode, f"session_{session_id}", state)
             if mode == OutputMode.FULL_JSON_STRING:
                 return processed_session
 
@@ -2134,20 +4684,22 @@ async def get_session_details(
                 metadata_block.update(file_meta)
             return {"data": processed_session, "metadata": metadata_block}
 
-        # Convert traces to a serializable format
-        raw_traces = [_sdk_object_to_python(trace) for trace in trace_items]
-
-        # If include_observations is True, fetch and embed the full observation objects
-        if include_observations and raw_traces:
-            total_observations = sum(len(t.get("observations", [])) for t in raw_traces)
-            if total_observations > 0:
-                logger.info(f"Fetching full observation details for {total_observations} observations across {len(raw_traces)} traces")
-                await _embed_observations_in_traces(state, raw_traces)
+        if not cached:
+            # If include_observations is True, fetch and embed the full observation objects
+            if include_observations:
+                total_observations = sum(len(t.get("observations", [])) for t in raw_traces)
+                if total_observations > 0:
+                    logger.info(
+                        f"Fetching full observation details for {total_observations} observations across {len(raw_traces)} traces"
+                    )
+                    await _embed_observations_in_traces(state, raw_traces)
+            if _session_is_idle(raw_traces, state.session_idle_seconds):
+                state.session_cache[cache_key] = raw_traces
 
         # Create a session object with all traces that have this session ID
         session = {
             "id": session_id,
-            "traces": raw_traces,
+            "traces": _project_fields(raw_traces, field_tree),
             "trace_count": len(raw_traces),
             "first_timestamp": raw_traces[0].get("timestamp") if raw_traces else None,
             "last_timestamp": raw_traces[-1].get("timestamp") if raw_traces else None,
@@ -2156,16 +4708,25 @@ async def get_session_details(
         }
 
         # Process the final session object based on output mode
-        result, file_meta = process_data_with_mode(session, mode, f"session_{session_id}", state)
+        result, file_meta = await process_data_with_mode(session, mode, f"session_{session_id}", state)
 
         logger.info(
-            f"Found session {session_id} with {len(raw_traces)} traces, returning with output_mode={mode}, "
+            f"Found session {session_id} with {len(raw_traces)} traces (cached={cached}, pages={fetch_stats['pages_fetched']}), "
+            f"returning with output_mode={mode}, "
             f"include_observations={include_observations}"
         )
         if mode == OutputMode.FULL_JSON_STRING:
             return result
 
-        metadata_block = {"item_count": 1, "file_path": None, "file_info": None}
+        metadata_block = {
+            "item_count": 1,
+            "pages_fetched": fetch_stats["pages_fetched"],
+            "cached": cached,
+            "file_path": None,
+            "file_info": None,
+        }
+        if field_tree:
+            metadata_block["fields"] = fields
         if file_meta:
             metadata_block.update(file_meta)
 
@@ -2189,6 +4750,14 @@ async def get_user_sessions(
             "Pairs well with output_mode='full_json_file' for complete dumps."
         ),
     ),
+    limit: int | None = Field(
+        None,
+        description=(
+            "Return only the N most recently active sessions. Older traces of the user are not fetched "
+            "once those sessions are complete. None returns every session in the window."
+        ),
+        ge=1,
+    ),
     output_mode: OUTPUT_MODE_LITERAL = Field(
         OutputMode.COMPACT,
         description=(
@@ -2201,6 +4770,10 @@ async def get_user_sessions(
 ) -> ResponseDict | str:
     """Get sessions for a user within a time range.
 
+    Every page of the user's traces in the window is fetched concurrently and grouped into
+    sessions as it arrives. With a limit, the walk stops once that many sessions have been seen
+    and only the older traces of those sessions are fetched.
+
     Args:
         ctx: Context object containing lifespan context with Langfuse client
         user_id: The ID of the user to retrieve sessions for (unique identifier string)
@@ -2208,6 +4781,7 @@ async def get_user_sessions(
         include_observations: If True, fetch and include the full observation objects instead of just IDs.
             Use this when you need access to system prompts, model parameters, or other details stored
             within observations. Significantly increases response time but provides complete data.
+        limit: Return only the N most recently active sessions, or None for every session in the window
         output_mode: Controls the output format and detail level
 
     Returns:
@@ -2231,69 +4805,22 @@ async def get_user_sessions(
     try:
         mode = _ensure_output_mode(output_mode)
 
-        # Fetch traces for this user
-        trace_items, pagination = _list_traces(
-            state.langfuse_client,
-            limit=100,
-            page=1,
-            include_observations=include_observations,
-            tags=None,
-            from_timestamp=from_timestamp,
-            name=None,
-            user_id=user_id,
-            session_id=None,
-            metadata=None,
-        )
-
-        # Convert traces to a serializable format
-        raw_traces = [_sdk_object_to_python(trace) for trace in trace_items]
+        grouper, walk = await _group_user_sessions(state, user_id, from_timestamp, include_observations, limit)
+        sessions = grouper.result()
 
         # If include_observations is True, fetch and embed the full observation objects
-        if include_observations and raw_traces:
+        if include_observations and sessions:
+            raw_traces = [trace for session in sessions for trace in session["traces"]]
             total_observations = sum(len(t.get("observations", [])) for t in raw_traces)
             if total_observations > 0:
                 logger.info(f"Fetching full observation details for {total_observations} observations across {len(raw_traces)} traces")
                 await _embed_observations_in_traces(state, raw_traces)
 
-        # Group traces by session_id
-        sessions_dict: dict[str, dict[str, Any]] = {}
-        for trace in raw_traces:
-            session_id = trace.get("session_id")
-            if not session_id:
-                continue
-
-            if session_id not in sessions_dict:
-                sessions_dict[session_id] = {
-                    "id": session_id,
-                    "traces": [],
-                    "first_timestamp": None,
-                    "last_timestamp": None,
-                    "user_id": user_id,
-                }
-
-            # Add trace to this session
-            sessions_dict[session_id]["traces"].append(trace)
-
-            # Update timestamps
-            trace_timestamp = trace.get("timestamp")
-            if trace_timestamp:
-                if not sessions_dict[session_id]["first_timestamp"] or trace_timestamp < sessions_dict[session_id]["first_timestamp"]:
-                    sessions_dict[session_id]["first_timestamp"] = trace_timestamp
-                if not sessions_dict[session_id]["last_timestamp"] or trace_timestamp > sessions_dict[session_id]["last_timestamp"]:
-                    sessions_dict[session_id]["last_timestamp"] = trace_timestamp
-
-        # Convert to list and add trace counts
-        sessions = list(sessions_dict.values())
-        for session in sessions:
-            session["trace_count"] = len(session["traces"])
-
-        # Sort sessions by most recent last_timestamp
-        sessions.sort(key=lambda x: x["last_timestamp"] if x["last_timestamp"] else "", reverse=True)
-
-        processed_sessions, file_meta = process_data_with_mode(sessions, mode, f"user_{user_id}_sessions", state)
+        processed_sessions, file_meta = await process_data_with_mode(sessions, mode, f"user_{user_id}_sessions", state)
 
         logger.info(
-            f"Found {len(sessions)} sessions for user {user_id}, returning with output_mode={mode}, "
+            f"Found {len(sessions)} sessions ({grouper.trace_count} traces) for user {user_id} in "
+            f"{walk['pages_fetched']} user pages and {walk['session_pages_fetched']} session pages, returning with output_mode={mode}, "
             f"include_observations={include_observations}"
         )
 
@@ -2302,13 +4829,14 @@ async def get_user_sessions(
 
         metadata_block = {
             "item_count": len(sessions),
+            "trace_count": grouper.trace_count,
+            "pages_fetched": walk["pages_fetched"] + walk["session_pages_fetched"],
+            "has_more": bool(grouper.skipped_sessions) or not walk["walk_complete"],
             "file_path": None,
             "file_info": None,
         }
-        if pagination.get("next_page") is not None:
-            metadata_block["next_page"] = pagination["next_page"]
-        if pagination.get("total") is not None:
-            metadata_block["total"] = pagination["total"]
+        if walk.get("total_traces") is not None:
+            metadata_block["total"] = walk["total_traces"]
         if file_meta:
             metadata_block.update(file_meta)
 
@@ -2333,6 +4861,9 @@ async def find_exceptions(
 ) -> ResponseDict:
     """Get exception counts grouped by file path, function, or type.
 
+    Every page of the window is scanned; the metadata reports pages scanned and the fraction of
+    the window covered.
+
     Args:
         ctx: Context object containing lifespan context with Langfuse client
         age: Number of minutes to look back (positive integer, max 7 days/10080 minutes)
@@ -2351,56 +4882,15 @@ async def find_exceptions(
     to_timestamp = datetime.now(UTC)
 
     try:
-        # Fetch all SPAN observations since they may contain exceptions
-        observation_items, _ = _list_observations(
-            state.langfuse_client,
-            limit=100,
-            page=1,
-            from_start_time=from_timestamp,
-            to_start_time=to_timestamp,
-            obs_type="SPAN",
-            name=None,
-            user_id=None,
-            trace_id=None,
-            parent_observation_id=None,
-            metadata=None,
-        )
-
-        # Process observations to find and group exceptions
-        exception_groups = Counter()
-
-        for observation in (_sdk_object_to_python(obs) for obs in observation_items):
-            events = observation.get("events", []) if isinstance(observation, dict) else []
-            if not events:
-                continue
-
-            for event in events:
-                event_dict = event if isinstance(event, dict) else _sdk_object_to_python(event)
-
-                # Check if this is an exception event
-                if not event_dict.get("attributes", {}).get("exception.type"):
-                    continue
-
-                # Get the grouping key based on group_by parameter
-                if group_by == "file":
-                    meta = observation.get("metadata", {}) if isinstance(observation, dict) else {}
-                    group_key = meta.get("code.filepath", "unknown_file")
-                elif group_by == "function":
-                    meta = observation.get("metadata", {}) if isinstance(observation, dict) else {}
-                    group_key = meta.get("code.function", "unknown_function")
-                elif group_by == "type":
-                    group_key = event_dict.get("attributes", {}).get("exception.type", "unknown_exception")
-                else:
-                    group_key = "unknown"
-
-                # Increment the counter for this group
-                exception_groups[group_key] += 1
+        # Scan the whole window, then count from the per-bucket exception index
+        scan = await _scan_exception_window(state, from_timestamp, to_timestamp)
+        exception_groups = state.exception_index.count(group_by, EXCEPTION_SCOPE, scan.buckets, from_timestamp, to_timestamp)
 
         # Convert counter to list of ExceptionCount objects
         results = [ExceptionCount(group=group, count=count) for group, count in exception_groups.most_common(50)]
 
         data = [item.model_dump() for item in results]
-        metadata_block = {"item_count": len(data)}
+        metadata_block = {"item_count": len(data), "total_exceptions": sum(exception_groups.values()), **scan.to_dict()}
 
         logger.info(f"Found {len(data)} exception groups")
         return {"data": data, "metadata": metadata_block}
@@ -2428,6 +4918,9 @@ async def find_exceptions_in_file(
 ) -> ResponseDict | str:
     """Get detailed exception info for a specific file.
 
+    Every page of the window is scanned and the newest exceptions are returned; the metadata
+    reports the total number found, pages scanned and the fraction of the window covered.
+
     Args:
         ctx: Context object containing lifespan context with Langfuse client
         filepath: Path to the file to search for exceptions (full path including extension)
@@ -2449,64 +4942,19 @@ async def find_exceptions_in_file(
     to_timestamp = datetime.now(UTC)
 
     try:
-        # Fetch all SPAN observations since they may contain exceptions
-        observation_items, _ = _list_observations(
-            state.langfuse_client,
-            limit=100,
-            page=1,
-            from_start_time=from_timestamp,
-            to_start_time=to_timestamp,
-            obs_type="SPAN",
-            name=None,
-            user_id=None,
-            trace_id=None,
-            parent_observation_id=None,
-            metadata=None,
-        )
+        # Scan the whole window, then read the file's exceptions from the per-bucket exception index
+        scan = await _scan_exception_window(state, from_timestamp, to_timestamp)
+        matches = state.exception_index.file_exceptions(filepath, EXCEPTION_SCOPE, scan.buckets, from_timestamp, to_timestamp)
+        total_exceptions = len(matches)
 
-        # Process observations to find exceptions in the specified file
-        exceptions = []
-
-        for observation in (_sdk_object_to_python(obs) for obs in observation_items):
-            metadata = observation.get("metadata", {}) if isinstance(observation, dict) else {}
-            if metadata.get("code.filepath") != filepath:
-                continue
-
-            events = observation.get("events", []) if isinstance(observation, dict) else []
-            if not events:
-                continue
-
-            for event in events:
-                event_dict = event if isinstance(event, dict) else _sdk_object_to_python(event)
-
-                # Check if this is an exception event
-                if not event_dict.get("attributes", {}).get("exception.type"):
-                    continue
-
-                exception_info = {
-                    "observation_id": observation.get("id", "unknown") if isinstance(observation, dict) else "unknown",
-                    "trace_id": observation.get("trace_id", "unknown") if isinstance(observation, dict) else "unknown",
-                    "timestamp": observation.get("start_time", "unknown") if isinstance(observation, dict) else "unknown",
-                    "exception_type": event_dict.get("attributes", {}).get("exception.type", "unknown"),
-                    "exception_message": event_dict.get("attributes", {}).get("exception.message", ""),
-                    "exception_stacktrace": event_dict.get("attributes", {}).get("exception.stacktrace", ""),
-                    "function": metadata.get("code.function", "unknown"),
-                    "line_number": metadata.get("code.lineno", "unknown"),
-                }
-
-                exceptions.append(exception_info)
-
-        # Sort exceptions by timestamp (newest first)
-        exceptions.sort(key=lambda x: x["timestamp"] if isinstance(x["timestamp"], str) else "", reverse=True)
-
-        # Only take the top 10 exceptions
-        top_exceptions = exceptions[:10]
+        # Only return the newest exceptions, newest first
+        top_exceptions = [info for _, info in heapq.nlargest(MAX_FILE_EXCEPTIONS, matches, key=lambda entry: entry[0])]
 
         mode = _ensure_output_mode(output_mode)
         base_filename_prefix = f"exceptions_{os.path.basename(filepath)}"
-        processed_exceptions, file_meta = process_data_with_mode(top_exceptions, mode, base_filename_prefix, state)
+        processed_exceptions, file_meta = await process_data_with_mode(top_exceptions, mode, base_filename_prefix, state)
 
-        logger.info(f"Found {len(exceptions)} exceptions in file {filepath}, returning with output_mode={mode}")
+        logger.info(f"Found {total_exceptions} exceptions in file {filepath}, returning with output_mode={mode}")
 
         if mode == OutputMode.FULL_JSON_STRING:
             return processed_exceptions
@@ -2514,6 +4962,8 @@ async def find_exceptions_in_file(
         metadata_block = {
             "file_path": filepath,
             "item_count": len(top_exceptions),
+            "total_exceptions": total_exceptions,
+            **scan.to_dict(),
             "file_info": None,
         }
         if file_meta:
@@ -2558,12 +5008,12 @@ async def get_exception_details(
 
     try:
         # First get the trace details
-        trace = _get_trace(state.langfuse_client, trace_id, include_observations=False)
-        trace_data = _sdk_object_to_python(trace)
+        trace = await _get_trace(state, trace_id, include_observations=False)
+        trace_data = _record(trace)
         mode = _ensure_output_mode(output_mode)
         if not trace_data:
             logger.warning(f"Trace not found: {trace_id}")
-            empty_payload, file_meta = process_data_with_mode([], mode, f"exceptions_trace_{trace_id}", state)
+            empty_payload, file_meta = await process_data_with_mode([], mode, f"exceptions_trace_{trace_id}", state)
             if mode == OutputMode.FULL_JSON_STRING:
                 return empty_payload
             metadata_block = {"item_count": 0, "file_path": None, "file_info": None}
@@ -2572,8 +5022,8 @@ async def get_exception_details(
             return {"data": empty_payload, "metadata": metadata_block}
 
         # Get all observations for this trace
-        observation_items, _ = _list_observations(
-            state.langfuse_client,
+        observation_items, _ = await _list_observations(
+            state,
             limit=100,
             page=1,
             from_start_time=datetime.fromtimestamp(0, tz=UTC),
@@ -2588,7 +5038,7 @@ async def get_exception_details(
 
         if not observation_items:
             logger.warning(f"No observations found for trace: {trace_id}")
-            empty_payload, file_meta = process_data_with_mode([], mode, f"exceptions_trace_{trace_id}", state)
+            empty_payload, file_meta = await process_data_with_mode([], mode, f"exceptions_trace_{trace_id}", state)
             if mode == OutputMode.FULL_JSON_STRING:
                 return empty_payload
             metadata_block = {"item_count": 0, "file_path": None, "file_info": None}
@@ -2597,7 +5047,7 @@ async def get_exception_details(
             return {"data": empty_payload, "metadata": metadata_block}
 
         # Filter observations if span_id is provided
-        normalized_observations = [_sdk_object_to_python(obs) for obs in observation_items]
+        normalized_observations = [_record(obs) for obs in observation_items]
         if span_id:
             filtered_observations = [obs for obs in normalized_observations if obs.get("id") == span_id]
         else:
@@ -2644,7 +5094,7 @@ async def get_exception_details(
         base_filename_prefix = f"exceptions_trace_{trace_id}"
         if span_id:
             base_filename_prefix += f"_span_{span_id}"
-        processed_exceptions, file_meta = process_data_with_mode(exceptions, mode, base_filename_prefix, state)
+        processed_exceptions, file_meta = await process_data_with_mode(exceptions, mode, base_filename_prefix, state)
 
         logger.info(f"Found {len(exceptions)} exceptions in trace {trace_id}, returning with output_mode={mode}")
 
@@ -2674,76 +5124,1118 @@ async def get_error_count(
 ) -> ResponseDict:
     """Get number of traces with exceptions in last N minutes.
 
-    Args:
-        ctx: Context object containing lifespan context with Langfuse client
-        age: Number of minutes to look back (positive integer, max 7 days/10080 minutes)
+    Every page of the window is scanned; the metadata reports pages scanned and the fraction of
+    the window covered.
+
+    Args:
+        ctx: Context object containing lifespan context with Langfuse client
+        age: Number of minutes to look back (positive integer, max 7 days/10080 minutes)
+
+    Returns:
+        Dictionary with error statistics including trace count, observation count, and exception count
+    """
+    state = cast(MCPState, ctx.request_context.lifespan_context)
+
+    age = validate_age(age)
+
+    # Calculate from_timestamp based on age
+    from_timestamp = datetime.now(UTC) - timedelta(minutes=age)
+    to_timestamp = datetime.now(UTC)
+
+    try:
+        # Count traces and observations with exceptions
+        trace_ids_with_exceptions = set()
+        observations_with_exceptions = 0
+        total_exceptions = 0
+
+        def fold(record: SpanRecord) -> None:
+            nonlocal observations_with_exceptions, total_exceptions
+            observations_with_exceptions += 1
+            total_exceptions += len(record.exceptions)
+            if record.trace_id:
+                trace_ids_with_exceptions.add(record.trace_id)
+
+        # Stream every SPAN with exception events in the window into the running counts
+        scan = await _scan_exception_window(state, from_timestamp, to_timestamp, fold)
+
+        result = {
+            "age_minutes": age,
+            "from_timestamp": from_timestamp.isoformat(),
+            "to_timestamp": to_timestamp.isoformat(),
+            "trace_count": len(trace_ids_with_exceptions),
+            "observation_count": observations_with_exceptions,
+            "exception_count": total_exceptions,
+        }
+
+        logger.info(
+            f"Found {total_exceptions} exceptions in {observations_with_exceptions} observations across "
+            f"{len(trace_ids_with_exceptions)} traces"
+        )
+        return {"data": result, "metadata": {**scan.to_dict(), "file_path": None, "file_info": None}}
+    except Exception as e:
+        logger.error(f"Error getting error count for the last {age} minutes: {str(e)}")
+        logger.exception(e)
+        raise
+
+
+def _normalize_sample(value: Any, top_level: bool = True) -> Any:
+    """Return the content of a formatted training sample in canonical form for hashing.
+
+    The per-sample `metadata` block (IDs, timestamps, usage) is dropped, dict keys are sorted
+    and runs of whitespace in strings collapse to one space, so samples that differ only in
+    bookkeeping or formatting hash the same.
+    """
+    if isinstance(value, dict):
+        return {
+            key: _normalize_sample(value[key], False) for key in sorted(value) if not (top_level and key == "metadata")
+        }
+    if isinstance(value, list):
+        return [_normalize_sample(item, False) for item in value]
+    if isinstance(value, str):
+        return " ".join(value.split())
+    return value
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over 128-bit digests, persisted as a small header plus the bit array."""
+
+    _HEADER = struct.Struct("<QQ")
+
+    def __init__(self, capacity: int, false_positive_rate: float, bits: bytearray | None = None, hashes: int | None = None):
+        """Initialize the filter.
+
+        Args:
+            capacity: Number of items the filter is sized for
+            false_positive_rate: Target false-positive rate at capacity
+            bits: Existing bit array (when loading)
+            hashes: Existing number of hash functions (when loading)
+        """
+        if bits is None:
+            size = max(64, math.ceil(-capacity * math.log(false_positive_rate) / math.log(2) ** 2))
+            bits = bytearray((size + 7) // 8)
+            hashes = max(1, round(size / capacity * math.log(2)))
+        self.bits = bits
+        self.size = len(bits) * 8
+        self.hashes = hashes
+
+    def _positions(self, digest: bytes) -> list[int]:
+        # Double hashing over the two halves of the digest (Kirsch-Mitzenmacher)
+        first = int.from_bytes(digest[:8], "little")
+        second = int.from_bytes(digest[8:16], "little") | 1
+        return [(first + i * second) % self.size for i in range(self.hashes)]
+
+    def add(self, digest: bytes) -> bool:
+        """Add a digest.
+
+        Args:
+            digest: 16-byte digest
+
+        Returns:
+            True when the digest was (probably) present already
+        """
+        present = True
+        for position in self._positions(digest):
+            byte, mask = position >> 3, 1 << (position & 7)
+            if not self.bits[byte] & mask:
+                present = False
+                self.bits[byte] |= mask
+        return present
+
+    def contains(self, digest: bytes) -> bool:
+        """Return True when a digest was (probably) added before."""
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(digest))
+
+    def union(self, other: "BloomFilter") -> None:
+        """Add every digest of another filter of the same size and hash count.
+
+        Args:
+            other: Filter whose bits are merged into this one
+
+        Raises:
+            ValueError: If the filters are shaped differently
+        """
+        if (other.size, other.hashes) != (self.size, self.hashes):
+            raise ValueError(f"Cannot merge a {other.size}-bit filter into a {self.size}-bit filter")
+        merged = int.from_bytes(self.bits, "little") | int.from_bytes(other.bits, "little")
+        self.bits[:] = merged.to_bytes(len(self.bits), "little")
+
+    @classmethod
+    def load(cls, path: str) -> "BloomFilter":
+        """Read a filter written by `save`."""
+        with open(path, "rb") as f:
+            size, hashes = cls._HEADER.unpack(f.read(cls._HEADER.size))
+            bits = bytearray(f.read())
+        if len(bits) * 8 != size:
+            raise ValueError(f"Corrupt Bloom filter file: {path}")
+        return cls(0, 0, bits=bits, hashes=hashes)
+
+    def save(self, path: str) -> None:
+        """Write the filter atomically."""
+        with open(path + ".partial", "wb") as f:
+            f.write(self._HEADER.pack(self.size, self.hashes))
+            f.write(self.bits)
+        os.replace(path + ".partial", path)
+
+
+_FILE_LOCKS: dict[str, threading.Lock] = {}
+_FILE_LOCKS_GUARD = threading.Lock()
+
+
+@contextmanager
+def _file_lock(path: str) -> Iterator[None]:
+    """Hold an exclusive lock on a file shared by concurrent runs.
+
+    Threads of this process are serialized with a per-path lock; other processes through
+    `flock` on a `.lock` sidecar where fcntl is available.
+    """
+    path = os.path.abspath(path)
+    with _FILE_LOCKS_GUARD:
+        lock = _FILE_LOCKS.setdefault(path, threading.Lock())
+    with lock, open(path + ".lock", "ab") as sidecar:
+        if fcntl is not None:
+            fcntl.flock(sidecar, fcntl.LOCK_EX)  # Released when the sidecar is closed
+        yield
+
+
+class SampleDeduplicator:
+    """Drop formatted training samples whose normalized content was seen before.
+
+    Samples are normalized (see `_normalize_sample`) and hashed with 128-bit BLAKE2b. In
+    'exact' mode new digests are held in a memory set of at most `memory_limit` entries that
+    spills into a SQLite table, so memory stays bounded and no unique sample is ever dropped.
+    In 'bloom' mode a Bloom filter sized for `capacity` samples answers in fixed memory, at the
+    cost of dropping about `false_positive_rate` of the unique samples. With a directory the
+    seen set is persisted there, so later runs also skip samples exported before. Overlapping
+    runs share it: exact mode writes to one SQLite database in WAL mode, and bloom mode merges
+    its filter into the file on disk when it closes instead of overwriting it.
+
+    Digests of kept samples stay pending until `commit` is called for them once their page is
+    on disk and checkpointed; only committed digests reach the seen set. Pending digests still
+    drop repeats within the run, but a cancelled run does not remember samples it never
+    exported, so resuming it exports them. All methods block and are meant to be called through
+    `asyncio.to_thread`; they may run in different threads.
+    """
+
+    def __init__(
+        self,
+        mode: str,
+        directory: str | None = None,
+        name: str = "samples",
+        memory_limit: int = DEDUPE_MEMORY_LIMIT,
+        capacity: int = DEDUPE_BLOOM_CAPACITY,
+        false_positive_rate: float = DEDUPE_BLOOM_ERROR_RATE,
+    ):
+        """Open (or create) the seen set.
+
+        Args:
+            mode: 'exact' or 'bloom'
+            directory: Directory persisting the seen set; a temporary spill file is used when None
+            name: File name stem of the seen set, e.g. the output format
+            memory_limit: Digests kept in memory before spilling to disk ('exact')
+            capacity: Samples the Bloom filter is sized for ('bloom')
+            false_positive_rate: Target false-positive rate of the Bloom filter ('bloom')
+        """
+        if mode not in ("exact", "bloom"):
+            raise ValueError(f"Unsupported dedupe mode: {mode}")
+        self.mode = mode
+        self.memory_limit = memory_limit
+        self.duplicates = 0
+        self.added = 0
+        self._temp_dir = None
+        if directory is None:
+            self._temp_dir = tempfile.mkdtemp(prefix="langfuse_mcp_dedupe_")
+        else:
+            os.makedirs(directory, exist_ok=True)
+        base = os.path.join(directory or self._temp_dir, name)
+        self.path = base + (".sqlite3" if mode == "exact" else ".bloom")
+        self.persisted = directory is not None
+
+        self._memory: set[bytes] = set()
+        self._pending: set[bytes] = set()
+        self._lock = threading.Lock()
+        self._conn: sqlite3.Connection | None = None
+        self._spilled = False
+        self._bloom: BloomFilter | None = None
+        if mode == "exact":
+            self._conn = sqlite3.connect(self.path, timeout=DEDUPE_SQLITE_TIMEOUT, check_same_thread=False)
+            with self._conn:
+                self._conn.execute("PRAGMA journal_mode=WAL")
+                self._conn.execute("CREATE TABLE IF NOT EXISTS seen (digest BLOB PRIMARY KEY) WITHOUT ROWID")
+            self._spilled = self._conn.execute("SELECT 1 FROM seen LIMIT 1").fetchone() is not None
+        else:
+            with _file_lock(self.path):
+                exists = os.path.exists(self.path)
+                self._bloom = BloomFilter.load(self.path) if exists else BloomFilter(capacity, false_positive_rate)
+
+    @staticmethod
+    def digest(sample: Any) -> bytes:
+        """Return the 16-byte digest of a formatted sample's normalized content.
+
+        The content is encoded with fixed standard-library settings rather than `json_codec`, so
+        digests persisted by earlier runs stay valid whichever JSON backend is installed or selected.
+        """
+        encoded = json.dumps(_normalize_sample(sample), sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str)
+        return hashlib.blake2b(encoded.encode("utf-8"), digest_size=16).digest()
+
+    def _spilled_among(self, digests: list[bytes]) -> set[bytes]:
+        found: set[bytes] = set()
+        for offset in range(0, len(digests), 500):
+            chunk = digests[offset : offset + 500]
+            rows = self._conn.execute(f"SELECT digest FROM seen WHERE digest IN ({','.join('?' * len(chunk))})", chunk)
+            found.update(row[0] for row in rows)
+        return found
+
+    def _spill(self) -> None:
+        with self._conn:
+            self._conn.executemany("INSERT OR IGNORE INTO seen (digest) VALUES (?)", ((digest,) for digest in self._memory))
+        self._memory.clear()
+        self._spilled = True
+
+    def filter(self, samples: list[Any]) -> tuple[list[bool], list[bytes]]:
+        """Report which samples of one page are new and hold their digests as pending.
+
+        Args:
+            samples: Formatted samples; None entries (formatting failures) are always kept
+
+        Returns:
+            Tuple of (one flag per sample, True for samples to keep; digests to `commit` once the page is saved)
+        """
+        digests = [self.digest(sample) if sample is not None else None for sample in samples]
+        keep = []
+        new_digests = []
+        with self._lock:
+            if self._bloom is not None:
+                seen = {digest for digest in digests if digest is not None and self._bloom.contains(digest)}
+            else:
+                seen = self._spilled_among([d for d in digests if d is not None]) if self._spilled else set()
+                seen.update(digest for digest in digests if digest in self._memory)
+            for digest in digests:
+                new = digest is None or (digest not in seen and digest not in self._pending)
+                if digest is not None and new:
+                    self._pending.add(digest)
+                    new_digests.append(digest)
+                keep.append(new)
+        self.added += len(new_digests)
+        self.duplicates += len(keep) - sum(keep)
+        return keep, new_digests
+
+    def commit(self, digests: list[bytes]) -> None:
+        """Move pending digests into the seen set, after their samples were saved.
+
+        Args:
+            digests: Digests returned by `filter`
+        """
+        with self._lock:
+            self._pending.difference_update(digests)
+            if self._bloom is not None:
+                for digest in digests:
+                    self._bloom.add(digest)
+            else:
+                self._memory.update(digests)
+                if len(self._memory) >= self.memory_limit:
+                    self._spill()
+
+    def close(self) -> None:
+        """Persist the committed digests, drop pending ones and release the resources."""
+        with self._lock:
+            self._pending.clear()
+            if self._conn is not None:
+                if self._memory:
+                    self._spill()
+                self._conn.close()
+                self._conn = None
+            elif self._bloom is not None:
+                # Another run may have saved since this one loaded; keep its digests too
+                with _file_lock(self.path):
+                    if os.path.exists(self.path):
+                        try:
+                            self._bloom.union(BloomFilter.load(self.path))
+                        except ValueError as e:
+                            logger.warning(f"Overwriting dedupe filter {self.path} instead of merging: {e}")
+                    self._bloom.save(self.path)
+        if self._temp_dir is not None:
+            shutil.rmtree(self._temp_dir, ignore_errors=True)
+
+    def stats(self) -> dict[str, Any]:
+        """Return the dedupe mode, counts and where the seen set is kept."""
+        return {
+            "mode": self.mode,
+            "duplicates_dropped": self.duplicates,
+            "new_samples": self.added,
+            "persisted_to": self.path if self.persisted else None,
+        }
+
+
+_DIGIT_RUNS = re.compile(r"\d+")
+
+
+def _sample_prompt_text(sample: dict[str, Any]) -> str:
+    """Return the prompt side of a formatted training sample (everything but the assistant reply)."""
+    if isinstance(sample.get("prompt"), str):
+        return sample["prompt"]
+    parts = [sample["system"]] if isinstance(sample.get("system"), str) else []
+    messages = sample.get("messages") or []
+    # The last assistant message is the completion; earlier turns belong to the prompt
+    if messages and messages[-1].get("role") == "assistant":
+        messages = messages[:-1]
+    for message in messages:
+        content = message.get("content")
+        parts.append(content if isinstance(content, str) else json.dumps(content, ensure_ascii=False))
+    return "\n".join(parts)
+
+
+class NearDuplicateFilter:
+    """Drop training samples whose prompt is a near-duplicate of an earlier kept prompt.
+
+    Prompts are lower-cased, digit runs (timestamps, counters, numeric IDs) are masked and
+    whitespace is collapsed before the text is cut into byte k-shingles. MinHash signatures are
+    computed for a whole page at once with NumPy: shingles are hashed with a vectorized
+    polynomial rolling hash, permuted by `num_perm` multiply-shift hash functions and reduced
+    per sample with `np.minimum.reduceat`, in column chunks of at most `chunk_size` shingles so
+    memory stays bounded. LSH banding picks candidates among the kept prompts, and a candidate
+    only counts when the estimated Jaccard similarity (the fraction of equal signature values)
+    reaches `threshold`. Kept signatures are stored in a growing uint32 matrix, about 0.5 KB per
+    sample, so 100k+ samples fit easily in memory. Methods block; call them through `asyncio.to_thread`.
+    """
+
+    def __init__(
+        self,
+        threshold: float,
+        num_perm: int = NEAR_DEDUPE_PERMUTATIONS,
+        shingle_size: int = NEAR_DEDUPE_SHINGLE_SIZE,
+        chunk_size: int = 1 << 13,
+        seed: int = 1,
+    ):
+        """Initialize the filter.
+
+        Args:
+            threshold: Jaccard similarity of prompt shingles at or above which a sample is dropped
+            num_perm: Number of MinHash permutations (signature length)
+            shingle_size: Shingle length in bytes
+            chunk_size: Shingles hashed per vectorized step
+            seed: Seed of the permutation coefficients
+        """
+        if numpy is None:
+            raise ValueError("Near-duplicate filtering requires numpy (pip install 'langfuse-mcp-better[near-dedupe]')")
+        if not 0 < threshold <= 1:
+            raise ValueError(f"near_dedupe_threshold must be in (0, 1], got {threshold}")
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        self.chunk_size = chunk_size
+        self.bands, self.rows = self._banding(threshold, num_perm)
+
+        rng = numpy.random.default_rng(seed)
+        self._mul = rng.integers(1, 1 << 63, size=(num_perm, 1), dtype=numpy.uint64) | numpy.uint64(1)
+        self._add = rng.integers(0, 1 << 63, size=(num_perm, 1), dtype=numpy.uint64)
+        self._band_weights = rng.integers(1, 1 << 63, size=self.rows, dtype=numpy.uint64) | numpy.uint64(1)
+        self._powers = numpy.array([257**i for i in reversed(range(shingle_size))], dtype=numpy.uint64)
+
+        self._signatures = numpy.empty((1024, num_perm), dtype=numpy.uint32)
+        self._kept = 0
+        self._buckets: list[dict[int, list[int]]] = [{} for _ in range(self.bands)]
+        self.duplicates = 0
+        self.candidate_checks = 0
+
+    @staticmethod
+    def _banding(threshold: float, num_perm: int) -> tuple[int, int]:
+        """Choose (bands, rows) whose LSH threshold (1/b)^(1/r) is closest below `threshold`.
+
+        Erring low keeps recall high; the exact signature comparison removes false candidates.
+        """
+        best = (num_perm, 1)
+        for rows in range(1, num_perm + 1):
+            if num_perm % rows:
+                continue
+            bands = num_perm // rows
+            if (1 / bands) ** (1 / rows) <= threshold:
+                best = (bands, rows)
+        return best
+
+    def _shingles(self, texts: list[str]) -> tuple[Any, Any]:
+        """Return the distinct 32-bit shingle hashes of a batch of prompts, grouped by prompt.
+
+        All prompts are hashed in one pass over their concatenated bytes; windows that cross
+        from one prompt into the next are discarded.
+
+        Returns:
+            Tuple of (shingle hashes, index of the prompt each hash belongs to), sorted by prompt
+        """
+        encoded = []
+        for text in texts:
+            normalized = " ".join(_DIGIT_RUNS.sub("0", text.lower()).split()).encode("utf-8")
+            if normalized and len(normalized) < self.shingle_size:
+                normalized = normalized.ljust(self.shingle_size, b"\0")
+            encoded.append(normalized)
+        lengths = numpy.array([len(data) for data in encoded], dtype=numpy.int64)
+        windows = len(encoded) and int(lengths.sum()) - self.shingle_size + 1
+        if windows <= 0:
+            return numpy.empty(0, dtype=numpy.uint64), numpy.empty(0, dtype=numpy.int64)
+
+        data = numpy.frombuffer(b"".join(encoded), dtype=numpy.uint8).astype(numpy.uint64)
+        hashes = data[:windows].copy()
+        for offset in range(1, self.shingle_size):
+            hashes *= numpy.uint64(257)
+            hashes += data[offset : offset + windows]
+        hashes &= numpy.uint64(0xFFFFFFFF)
+
+        owners = numpy.repeat(numpy.arange(len(encoded), dtype=numpy.uint64), lengths)[:windows]
+        ends = numpy.cumsum(lengths)[owners.astype(numpy.int64)]
+        inside = numpy.arange(windows) + self.shingle_size <= ends
+        keys = (owners[inside] << numpy.uint64(32)) | hashes[inside]
+        keys.sort()
+        keys = keys[numpy.r_[True, keys[1:] != keys[:-1]]]
+        return keys & numpy.uint64(0xFFFFFFFF), (keys >> numpy.uint64(32)).astype(numpy.int64)
+
+    def signatures(self, texts: list[str]) -> tuple[Any, Any]:
+        """Compute MinHash signatures for a batch of prompts.
+
+        Args:
+            texts: Prompt texts
+
+        Returns:
+            Tuple of (signature matrix of shape (len(texts), num_perm), boolean mask of prompts with shingles)
+        """
+        flat, owners = self._shingles(texts)
+        signatures = numpy.full((len(texts), self.num_perm), numpy.iinfo(numpy.uint32).max, dtype=numpy.uint32)
+        valid = numpy.zeros(len(texts), dtype=bool)
+        valid[owners] = True
+        for start in range(0, len(flat), self.chunk_size):
+            chunk = flat[start : start + self.chunk_size]
+            chunk_owners = owners[start : start + self.chunk_size]
+            # Multiply-shift permutations, (a * x + b) >> 32 with uint64 wrap-around, computed in place
+            permuted = self._mul * chunk[None, :]
+            permuted += self._add
+            permuted >>= numpy.uint64(32)
+            boundaries = numpy.flatnonzero(numpy.r_[True, chunk_owners[1:] != chunk_owners[:-1]])
+            minima = numpy.minimum.reduceat(permuted, boundaries, axis=1).T.astype(numpy.uint32)
+            rows = chunk_owners[boundaries]
+            signatures[rows] = numpy.minimum(signatures[rows], minima)
+        return signatures, valid
+
+    def _band_keys(self, signatures: Any) -> Any:
+        """Hash each band of each signature to one 64-bit bucket key."""
+        banded = signatures[:, : self.bands * self.rows].astype(numpy.uint64).reshape(len(signatures), self.bands, self.rows)
+        return (banded * self._band_weights).sum(axis=2, dtype=numpy.uint64)
+
+    def filter(self, texts: list[str]) -> list[bool]:
+        """Check a page of prompts against the kept ones (and each other) and keep the new ones.
+
+        Args:
+            texts: Prompt texts of the page, in output order
+
+        Returns:
+            One flag per prompt, True for samples to keep
+        """
+        signatures, valid = self.signatures(texts)
+        keys = self._band_keys(signatures).tolist()
+        keep = []
+        for index in range(len(texts)):
+            if not valid[index]:
+                keep.append(True)
+                continue
+            signature = signatures[index]
+            candidates = set()
+            for band, key in enumerate(keys[index]):
+                candidates.update(self._buckets[band].get(key, ()))
+            duplicate = False
+            if candidates:
+                self.candidate_checks += len(candidates)
+                similarity = (self._signatures[list(candidates)] == signature).mean(axis=1)
+                duplicate = bool((similarity >= self.threshold).any())
+            if duplicate:
+                self.duplicates += 1
+                keep.append(False)
+                continue
+            if self._kept == len(self._signatures):
+                self._signatures = numpy.concatenate([self._signatures, numpy.empty_like(self._signatures)])
+            self._signatures[self._kept] = signature
+            for band, key in enumerate(keys[index]):
+                self._buckets[band].setdefault(key, []).append(self._kept)
+            self._kept += 1
+            keep.append(True)
+        return keep
+
+    def stats(self) -> dict[str, Any]:
+        """Return the threshold, LSH parameters and counts."""
+        return {
+            "threshold": self.threshold,
+            "num_perm": self.num_perm,
+            "bands": self.bands,
+            "rows": self.rows,
+            "duplicates_dropped": self.duplicates,
+            "kept": self._kept,
+            "candidate_checks": self.candidate_checks,
+        }
+
+
+class ShardedJSONLWriter:
+    """Write JSONL samples into numbered shard files described by a manifest.
+
+    A shard is written as `<prefix>-NNNNN.jsonl.partial` and renamed once it holds `max_samples`
+    samples or another sample would take it past `max_bytes`. `manifest.json` is rewritten
+    atomically after every completed shard, with the sample count, byte size and SHA-256 of
+    each shard, so an interrupted run still leaves a valid manifest of usable shards. Methods
+    block; they are called next to the incremental save.
+    """
+
+    MANIFEST = "manifest.json"
+
+    def __init__(
+        self,
+        directory: str,
+        prefix: str = "shard",
+        max_samples: int | None = None,
+        max_bytes: int | None = None,
+        metadata: dict[str, Any] | None = None,
+    ):
+        """Initialize the writer.
+
+        Args:
+            directory: Directory of the shards and the manifest; created if missing
+            prefix: File name prefix of the shards
+            max_samples: Samples per shard (unlimited when None)
+            max_bytes: Maximum bytes per shard; a single larger sample gets a shard of its own
+            metadata: Extra fields stored in the manifest (e.g. the output format)
+        """
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.prefix = prefix
+        self.max_samples = max_samples
+        self.max_bytes = max_bytes
+        self.metadata = metadata or {}
+        self.shards: list[dict[str, Any]] = []
+        self.complete = False
+        self.closed = False
+        self._index = 0
+        self._file = None
+        self._hash = None
+        self._samples = 0
+        self._bytes = 0
+
+    @property
+    def manifest_path(self) -> str:
+        """Path of the manifest."""
+        return os.path.join(self.directory, self.MANIFEST)
+
+    def _path(self, index: int, partial: bool) -> str:
+        name = f"{self.prefix}-{index:05d}.jsonl"
+        return os.path.join(self.directory, name + ".partial" if partial else name)
+
+    def write(self, lines: list[bytes]) -> None:
+        """Append encoded samples, rolling to a new shard when a limit is reached.
+
+        Args:
+            lines: JSON-encoded samples, each ending with a newline
+        """
+        for line in lines:
+            if self._file is not None and self.max_bytes and self._bytes + len(line) > self.max_bytes:
+                self._roll()
+            if self._file is None:
+                self._file = open(self._path(self._index, True), "wb")
+                self._hash = hashlib.sha256()
+                self._samples = self._bytes = 0
+            self._file.write(line)
+            self._hash.update(line)
+            self._samples += 1
+            self._bytes += len(line)
+            if self.max_samples and self._samples >= self.max_samples:
+                self._roll()
+        if self._file is not None:
+            self._file.flush()
+
+    def _roll(self) -> None:
+        """Complete the current shard and record it in the manifest."""
+        self._file.close()
+        self._file = None
+        os.replace(self._path(self._index, True), self._path(self._index, False))
+        self.shards.append(
+            {
+                "file": os.path.basename(self._path(self._index, False)),
+                "samples": self._samples,
+                "bytes": self._bytes,
+                "sha256": self._hash.hexdigest(),
+            }
+        )
+        self._index += 1
+        self._samples = self._bytes = 0
+        self._write_manifest()
+
+    def position(self) -> dict[str, int]:
+        """Return the write position (current shard and its byte size) for checkpoints."""
+        return {"shard": self._index, "offset": self._bytes}
+
+    def close(self, complete: bool, finalize: bool = True) -> None:
+        """Close the writer and write the final manifest.
+
+        Args:
+            complete: Whether the extraction finished; stored in the manifest
+            finalize: Complete the current shard; False leaves it as `.partial` for a resumed run
+        """
+        if self._file is not None:
+            if finalize and self._samples:
+                self._roll()
+            else:
+                self._file.close()
+                self._file = None
+        self.complete = complete
+        self.closed = True
+        self._write_manifest()
+
+    def _write_manifest(self) -> None:
+        manifest = {
+            "version": 1,
+            "format": "jsonl",
+            **self.metadata,
+            "complete": self.complete,
+            "max_samples_per_shard": self.max_samples,
+            "max_bytes_per_shard": self.max_bytes,
+            "total_samples": sum(shard["samples"] for shard in self.shards),
+            "total_bytes": sum(shard["bytes"] for shard in self.shards),
+            "shards": self.shards,
+            "updated_at": datetime.now(UTC).isoformat(),
+        }
+        partial = self.manifest_path + ".partial"
+        with open(partial, "wb") as f:
+            f.write(json_codec.dumps_bytes(manifest, indent=True))
+        os.replace(partial, self.manifest_path)
+
+    def summary(self) -> dict[str, Any]:
+        """Return the manifest path and totals for tool metadata."""
+        return {
+            "manifest": self.manifest_path,
+            "directory": self.directory,
+            "shard_count": len(self.shards),
+            "total_samples": sum(shard["samples"] for shard in self.shards),
+            "total_bytes": sum(shard["bytes"] for shard in self.shards),
+            "complete": self.complete,
+        }
+
+    def paths(self) -> list[str]:
+        """Return the shard files written so far, completed shards first, in sample order."""
+        paths = [os.path.join(self.directory, shard["file"]) for shard in self.shards]
+        if self._file is not None:
+            paths.append(self._path(self._index, True))
+        return paths
+
+    @classmethod
+    def reopen(cls, directory: str, position: dict[str, int], **kwargs: Any) -> "ShardedJSONLWriter":
+        """Reopen the shards of an interrupted run at a checkpointed position.
+
+        Shards after the position are deleted and the shard at the position is truncated to its
+        recorded size, so everything written after the checkpoint is discarded. Shards are read
+        one at a time to rebuild their manifest entries; `paths` lists the kept samples' files.
+
+        Args:
+            directory: Shard directory of the interrupted run
+            position: Position returned by `position` when the checkpoint was recorded
+            **kwargs: Constructor arguments (prefix, limits, metadata)
+
+        Returns:
+            Writer positioned for appending
+        """
+        writer = cls(directory, **kwargs)
+        current, offset = position.get("shard", 0), position.get("offset", 0)
+        for name in os.listdir(directory):
+            stem = name.removesuffix(".partial")
+            if stem.startswith(f"{writer.prefix}-") and stem.endswith(".jsonl"):
+                index = int(stem[len(writer.prefix) + 1 : -len(".jsonl")])
+                if index > current:
+                    os.remove(os.path.join(directory, name))
+
+        for index in range(current):
+            with open(writer._path(index, False), "rb") as f:
+                data = f.read()
+            writer.shards.append(
+                {
+                    "file": os.path.basename(writer._path(index, False)),
+                    "samples": sum(1 for line in data.splitlines() if line.strip()),
+                    "bytes": len(data),
+                    "sha256": hashlib.sha256(data).hexdigest(),
+                }
+            )
+
+        writer._index = current
+        partial = writer._path(current, True)
+        if os.path.exists(writer._path(current, False)):
+            os.replace(writer._path(current, False), partial)
+        if os.path.exists(partial):
+            os.truncate(partial, min(offset, os.path.getsize(partial)))
+            with open(partial, "rb") as f:
+                data = f.read()
+            writer._file = open(partial, "ab")
+            writer._hash = hashlib.sha256(data)
+            writer._samples = sum(1 for line in data.splitlines() if line.strip())
+            writer._bytes = len(data)
+        writer._write_manifest()
+        return writer
+
+
+async def _report_progress(ctx: Context, progress: float, total: float | None, message: str, **details: Any) -> None:
+    """Send a progress notification for a tool call and update the background job it runs in.
+
+    Clients only receive notifications for calls that carried a progress token; a failed
+    notification never fails the tool call.
+
+    Args:
+        ctx: Context of the tool call, or the context of a background job
+        progress: Current progress value
+        total: Value progress reaches when the call is done, if known
+        message: Human-readable progress message
+        **details: Structured progress fields stored on the background job
+    """
+    job = getattr(ctx, "job", None)
+    if job is not None:
+        job.progress.update(details, message=message)
+    report = getattr(ctx, "report_progress", None)
+    if report is None:
+        return
+    try:
+        try:
+            await report(progress, total, message)
+        except TypeError:
+            # mcp releases before progress messages only take (progress, total)
+            await report(progress, total)
+    except Exception as e:
+        logger.debug(f"Progress notification failed: {e}")
+
+
+class _JobContext:
+    """Context handed to a tool function running as a background job instead of an MCP request."""
+
+    def __init__(self, state: MCPState, job: TrainingJob):
+        self.request_context = SimpleNamespace(lifespan_context=state)
+        self.job = job
+
+
+@dataclass
+class ResumeState:
+    """Progress of an interrupted training-data extraction, as recorded by its checkpoint."""
+
+    remaining: list[tuple[datetime, datetime]]  # Time ranges that were not read yet, newest first
+    offset: int = 0  # Byte size of the data file at the last recorded page
+    samples: int = 0  # Observations collected up to the last recorded page
+    seen_ids: set[str] = field(default_factory=set)
+    complete: bool = False
+
+
+class ExtractionCheckpoint:
+    """Append-only JSONL sidecar recording the progress of a training-data extraction.
+
+    The first line holds the extraction parameters, the data file and the requested time windows.
+    Every processed page appends one record with the time ranges still to read, the byte size of
+    the data file after the page was written and the IDs of the observations it contributed. A
+    torn last line left by a crash is ignored and cut off on load, and the data file is truncated
+    back to the last recorded offset, so a resumed run continues without duplicate samples. All
+    methods block; records are a few hundred bytes and are written next to the incremental save.
+    """
+
+    def __init__(self, path: str, header: dict[str, Any]):
+        """Initialize the checkpoint.
+
+        Args:
+            path: Path of the checkpoint sidecar
+            header: Parsed header record
+        """
+        self.path = path
+        self.header = header
+
+    @property
+    def data_path(self) -> str:
+        """Path of the JSONL data file the checkpoint belongs to."""
+        return self.header["data_file"]
+
+    @staticmethod
+    def _encode_ranges(ranges: list[tuple[datetime, datetime]]) -> list[list[str]]:
+        return [[start.isoformat(), end.isoformat()] for start, end in ranges]
+
+    @staticmethod
+    def _decode_ranges(ranges: list[list[str]]) -> list[tuple[datetime, datetime]]:
+        return [(datetime.fromisoformat(start), datetime.fromisoformat(end)) for start, end in ranges]
+
+    @classmethod
+    def create(cls, data_path: str, params: dict[str, Any], windows: list[tuple[datetime, datetime]]) -> "ExtractionCheckpoint":
+        """Start a checkpoint for a new extraction, replacing any previous sidecar.
+
+        Args:
+            data_path: JSONL file the samples are appended to
+            params: Extraction parameters a resumed run must reuse
+            windows: Time windows of the extraction, newest first
+
+        Returns:
+            The new checkpoint
+        """
+        data_path = os.path.abspath(data_path)
+        header = {
+            "version": CHECKPOINT_VERSION,
+            "data_file": data_path,
+            "params": params,
+            "windows": cls._encode_ranges(windows),
+            "created_at": datetime.now(UTC).isoformat(),
+        }
+        checkpoint = cls(data_path + CHECKPOINT_SUFFIX, header)
+        with open(checkpoint.path, "wb") as f:
+            f.write(json_codec.dumps_bytes(header) + b"\n")
+        return checkpoint
+
+    @classmethod
+    def load(cls, path: str) -> tuple["ExtractionCheckpoint", ResumeState]:
+        """Load a checkpoint and the progress it recorded.
+
+        Args:
+            path: Checkpoint sidecar, or the JSONL data file, shard directory or shard manifest it belongs to
+
+        Returns:
+            Tuple of (checkpoint, resume state)
+        """
+        if os.path.basename(path) == ShardedJSONLWriter.MANIFEST:
+            path = os.path.dirname(path)
+        if not path.endswith(CHECKPOINT_SUFFIX):
+            path = path.rstrip(os.sep) + CHECKPOINT_SUFFIX
+        if not os.path.exists(path):
+            raise ValueError(f"No extraction checkpoint found at {path}")
+
+        header = None
+        resume = None
+        valid_bytes = 0
+        with open(path, "rb") as f:
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    record = json_codec.loads(line)
+                except Exception:
+                    break
+                valid_bytes += len(line)
+                if header is None:
+                    header = record
+                    resume = ResumeState(remaining=cls._decode_ranges(record["windows"]))
+                    continue
+                resume.remaining = cls._decode_ranges(record["remaining"])
+                resume.offset = record["offset"]
+                resume.samples = record["samples"]
+                resume.seen_ids.update(record["ids"])
+                resume.complete = record.get("complete", False)
+
+        if header is None or header.get("version") != CHECKPOINT_VERSION:
+            raise ValueError(f"Unreadable extraction checkpoint: {path}")
+        if valid_bytes < os.path.getsize(path):
+            logger.warning(f"Discarding torn record at the end of checkpoint {path}")
+            os.truncate(path, valid_bytes)
+        return cls(path, header), resume
+
+    def record(
+        self,
+        remaining: list[tuple[datetime, datetime]],
+        offset: int,
+        ids: list[str],
+        samples: int,
+        complete: bool = False,
+    ) -> None:
+        """Append the progress after one page.
+
+        Args:
+            remaining: Time ranges still to read, newest first
+            offset: Byte size of the data file after the page was written
+            ids: IDs of the observations the page added
+            samples: Observations collected so far
+            complete: True when the extraction finished and nothing is left to read
+        """
+        record = {"remaining": self._encode_ranges(remaining), "offset": offset, "ids": ids, "samples": samples}
+        if complete:
+            record["complete"] = True
+        with open(self.path, "ab") as f:
+            f.write(json_codec.dumps_bytes(record) + b"\n")
+
+
+class _ScanProgress:
+    """Track which time ranges of an ObservationScan were read, for checkpoints.
+
+    Pages arrive in (part, page) order and the observations of a part newest first, so everything
+    of a part that is older than the oldest observation read so far is still unread. A part is
+    finished once a later part starts or a short page ends it; a part whose page failed stays in
+    the remaining ranges so that a resumed run retries it.
+    """
+
+    def __init__(self, parts: list[WindowPart], page_size: int):
+        """Initialize the tracker.
+
+        Args:
+            parts: Parts of the scan
+            page_size: Page size of the scan; a shorter page ends its part
+        """
+        self._parts = parts
+        self._page_size = page_size
+        self._cursors: list[float | None] = [None] * len(parts)
+        self._done = [False] * len(parts)
+        self._failed: set[int] = set()
+        self._current = 0
+
+    def page(self, part_index: int, items: list[dict[str, Any]], failed: bool = False) -> None:
+        """Record a page delivered by the scan.
 
-    Returns:
-        Dictionary with error statistics including trace count, observation count, and exception count
+        Args:
+            part_index: Part the page belongs to
+            items: Observations of the page
+            failed: True when the page could not be fetched
+        """
+        for index in range(self._current, part_index):
+            if index not in self._failed:
+                self._done[index] = True
+        self._current = part_index
+        if failed:
+            self._failed.add(part_index)
+            return
+        for item in items:
+            started = _to_epoch(item.get("start_time"))
+            cursor = self._cursors[part_index]
+            if started is not None and (cursor is None or started < cursor):
+                self._cursors[part_index] = started
+        if len(items) < self._page_size:
+            self._done[part_index] = True
+
+    def finish(self) -> None:
+        """Mark every part that did not fail as read, after the scan was exhausted."""
+        for index in range(len(self._parts)):
+            if index not in self._failed:
+                self._done[index] = True
+
+    def remaining(self) -> list[tuple[datetime, datetime]]:
+        """Time ranges that were not read yet, newest first."""
+        ranges = []
+        for index, part in enumerate(self._parts):
+            if self._done[index]:
+                continue
+            end = part.end
+            cursor = self._cursors[index]
+            if cursor is not None:
+                # Keep the oldest timestamp read so far; observations sharing it are skipped by ID
+                end = min(end, datetime.fromtimestamp(cursor + 0.001, UTC))
+            if end > part.start:
+                ranges.append((part.start, end))
+        return ranges
+
+
+class _SampleWriter:
+    """Write stage of the training-data pipeline.
+
+    Formatted pages wait in a bounded queue and one task appends them to the incremental JSONL
+    file or the shards, each followed by its checkpoint record and dedupe commit in the same worker
+    thread call. Encoding and disk I/O overlap with
+    fetching and formatting later pages, and a slow disk holds the producer back instead of
+    letting pages pile up in memory. A failed write disables checkpointing, since the file no
+    longer matches the recorded progress.
     """
-    state = cast(MCPState, ctx.request_context.lifespan_context)
-
-    age = validate_age(age)
 
-    # Calculate from_timestamp based on age
-    from_timestamp = datetime.now(UTC) - timedelta(minutes=age)
-    to_timestamp = datetime.now(UTC)
+    def __init__(
+        self,
+        path: str,
+        shard_writer: "ShardedJSONLWriter | None",
+        checkpoint: "ExtractionCheckpoint | None",
+        deduplicator: "SampleDeduplicator | None" = None,
+        queue_size: int = TRAINING_WRITE_QUEUE_PAGES,
+    ):
+        """Initialize the stage and start its task.
 
-    try:
-        # Fetch all SPAN observations since they may contain exceptions
-        observation_items, _ = _list_observations(
-            state.langfuse_client,
-            limit=100,
-            page=1,
-            from_start_time=from_timestamp,
-            to_start_time=to_timestamp,
-            obs_type="SPAN",
-            name=None,
-            user_id=None,
-            trace_id=None,
-            parent_observation_id=None,
-            metadata=None,
-        )
+        Args:
+            path: Incremental JSONL file (or shard directory when shard_writer is set)
+            shard_writer: Writer of sharded output, or None to append to `path`
+            checkpoint: Checkpoint recording every written page, or None
+            deduplicator: Content dedupe whose pending digests are committed once their page is checkpointed
+            queue_size: Pages that may wait to be written before `put` blocks
+        """
+        self.path = path
+        self.shard_writer = shard_writer
+        self.checkpoint = checkpoint
+        self.deduplicator = deduplicator
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self._task = asyncio.create_task(self._run())
+
+    async def put(
+        self,
+        samples: list[dict[str, Any]],
+        ids: list[str],
+        collected: int,
+        remaining: list[tuple[datetime, datetime]],
+        complete: bool,
+        digests: list[bytes] | None = None,
+    ) -> None:
+        """Queue a page of samples, waiting while the queue is full.
 
-        # Count traces and observations with exceptions
-        trace_ids_with_exceptions = set()
-        observations_with_exceptions = 0
-        total_exceptions = 0
+        Args:
+            samples: Formatted samples of the page
+            ids: Observation IDs the page consumed
+            collected: Observations collected up to and including the page
+            remaining: Time ranges still unread after the page
+            complete: Whether the extraction is complete after the page
+            digests: Pending dedupe digests of the page's samples
+        """
+        await self._queue.put((samples, ids, collected, remaining, complete, digests))
 
-        for observation in (_sdk_object_to_python(obs) for obs in observation_items):
-            events = observation.get("events", []) if isinstance(observation, dict) else []
-            if not events:
-                continue
+    def position(self) -> int | dict[str, int]:
+        """Return the current write position as recorded by checkpoints."""
+        return self.shard_writer.position() if self.shard_writer is not None else os.path.getsize(self.path)
 
-            exception_count = sum(1 for event in events if _sdk_object_to_python(event).get("attributes", {}).get("exception.type"))
-            if exception_count == 0:
-                continue
+    def record(self, remaining: list[tuple[datetime, datetime]], collected: int, complete: bool) -> None:
+        """Record the current write position without a page, e.g. as the final checkpoint record.
 
-            observations_with_exceptions += 1
-            total_exceptions += exception_count
+        Blocks; call it through `asyncio.to_thread` once the stage is drained.
 
-            trace_id = observation.get("trace_id") if isinstance(observation, dict) else None
-            if trace_id:
-                trace_ids_with_exceptions.add(trace_id)
+        Args:
+            remaining: Time ranges still unread
+            collected: Observations collected so far
+            complete: Whether the extraction is complete
+        """
+        self.checkpoint.record(remaining, self.position(), [], collected, complete=complete)
+
+    def _write(self, samples: list[dict[str, Any]]) -> int | dict[str, int]:
+        lines = [json_codec.dumps_bytes(sample) + b"\n" for sample in samples]
+        if self.shard_writer is not None:
+            self.shard_writer.write(lines)
+            return self.shard_writer.position()
+        with open(self.path, "ab") as f:
+            f.writelines(lines)
+            return f.tell()
+
+    def _save(
+        self,
+        samples: list[dict[str, Any]],
+        ids: list[str],
+        collected: int,
+        remaining: list[tuple[datetime, datetime]],
+        complete: bool,
+        digests: list[bytes] | None,
+    ) -> None:
+        offset = self._write(samples)
+        logger.debug(f"Incrementally saved {len(samples)} samples to {self.path}")
+        if self.checkpoint is not None:
+            self.checkpoint.record(remaining, offset, ids, collected, complete=complete)
+            # Only samples a resume will not export again count as seen
+            if self.deduplicator is not None and digests:
+                self.deduplicator.commit(digests)
+
+    async def _run(self) -> None:
+        while (page := await self._queue.get()) is not None:
+            try:
+                await asyncio.to_thread(self._save, *page)
+            except Exception as e:
+                # Without the page on disk the checkpoint could no longer resume exactly
+                logger.warning(f"Failed to incrementally save batch, checkpointing disabled: {e}")
+                self.checkpoint = None
 
-        result = {
-            "age_minutes": age,
-            "from_timestamp": from_timestamp.isoformat(),
-            "to_timestamp": to_timestamp.isoformat(),
-            "trace_count": len(trace_ids_with_exceptions),
-            "observation_count": observations_with_exceptions,
-            "exception_count": total_exceptions,
-        }
+    async def drain(self) -> None:
+        """Write every queued page and stop the task."""
+        if not self._task.done():
+            await self._queue.put(None)
+            await self._task
 
-        logger.info(
-            f"Found {total_exceptions} exceptions in {observations_with_exceptions} observations across "
-            f"{len(trace_ids_with_exceptions)} traces"
-        )
-        return {"data": result, "metadata": {"file_path": None, "file_info": None}}
-    except Exception as e:
-        logger.error(f"Error getting error count for the last {age} minutes: {str(e)}")
-        logger.exception(e)
-        raise
+    async def aclose(self) -> None:
+        """Stop the task after the page being written, dropping queued pages (after a failure or cancellation)."""
+        while not self._queue.empty():
+            self._queue.get_nowait()
+        if not self._task.done():
+            self._queue.put_nowait(None)
+            await self._task
 
 
 async def fetch_llm_training_data(
@@ -2808,8 +6300,52 @@ async def fetch_llm_training_data(
         True,
         description=(
             "Save data incrementally as it's fetched to avoid data loss on timeout/crash. "
-            "Default: True. Data is appended to a temporary file and consolidated at the end. "
-            "Set to False to only save at the end (faster but riskier)."
+            "Default: True. Samples stream into a JSONL file in the dump directory and the response carries "
+            "a preview of the first samples plus the file path, so memory stays flat for any limit. "
+            "Set to False to hold every sample in memory and return them inline."
+        ),
+    ),
+    fetch_concurrency: int | None = Field(
+        None,
+        description=(
+            "Number of observation pages to keep in flight across pages and time segments. "
+            "Results are merged in time order, so output is identical to sequential fetching. "
+            "Default: follow the server's adaptive concurrency limit. Use 1 for strictly sequential requests."
+        ),
+    ),
+    dedupe: Literal["off", "exact", "bloom"] = Field(
+        "off",
+        description=(
+            "Drop samples whose content repeats an earlier sample (ignoring the per-sample metadata block and whitespace). "
+            "'exact': hash set that spills to disk, never drops unique samples. "
+            "'bloom': fixed-memory Bloom filter that may drop about 0.1% of unique samples. "
+            "With a dump directory the seen set is persisted, so later runs also skip samples exported before. Default: 'off'"
+        ),
+    ),
+    near_dedupe_threshold: float | None = Field(
+        None,
+        description=(
+            "Drop samples whose prompt is a near-duplicate of an earlier sample's prompt, e.g. prompts differing only "
+            "in timestamps or IDs. Value is the Jaccard similarity of prompt shingles (0-1, e.g. 0.8) estimated with "
+            "MinHash/LSH. Requires numpy. Default: None (disabled)"
+        ),
+    ),
+    shard_max_samples: int | None = Field(
+        None,
+        description=(
+            "Write samples as JSONL shards of at most this many samples, plus a manifest.json with counts, byte sizes "
+            "and SHA-256 checksums, instead of one incremental file and one full_json_file dump. Requires a dump directory"
+        ),
+    ),
+    shard_max_bytes: int | None = Field(
+        None, description="Roll to a new JSONL shard before a shard would exceed this many bytes. Requires a dump directory"
+    ),
+    resume_from: str | None = Field(
+        None,
+        description=(
+            "Resume an interrupted extraction from its incremental save file (or its '.checkpoint' sidecar). "
+            "Filters, limit and output format are taken from the checkpoint; only unread time ranges are fetched "
+            "and samples already in the file are not written again."
         ),
     ),
 ) -> ResponseDict | str:
@@ -2823,6 +6359,7 @@ async def fetch_llm_training_data(
     and time range limitations internally:
     - Pagination: Automatically paginates through API to collect all requested data
     - Time Segmentation: For queries > 7 days, automatically splits into 7-day segments
+    - Prefetching: Keeps `fetch_concurrency` pages in flight across pages and segments, merging in time order
     - You can request any number of samples (e.g., 1000, 10000) and any time range (e.g., 30 days, 60 days)
 
     Args:
@@ -2835,10 +6372,21 @@ async def fetch_llm_training_data(
         output_format: Output format ('openai', 'anthropic', 'generic', 'dpo')
         include_metadata: Include metadata (default: False). Only set True for analysis, NOT for training
         output_mode: Controls output format and detail level
+        allow_partial_results: Return partial results instead of raising when some pages fail
+        incremental_save: Append formatted samples to a JSONL file as pages arrive
+        fetch_concurrency: Number of pages to keep in flight across pages and time segments
+            (default: None, follow the adaptive concurrency limit)
+        dedupe: Content deduplication of samples ('off', 'exact' or 'bloom'), persisted across runs in the dump directory
+        near_dedupe_threshold: Prompt similarity (0-1) above which near-duplicate samples are dropped (default: None, disabled)
+        shard_max_samples: Samples per JSONL shard; enables sharded output with a manifest
+        shard_max_bytes: Maximum bytes per JSONL shard; enables sharded output with a manifest
+        resume_from: Incremental save file, shard directory or checkpoint of an interrupted extraction to continue
 
     Returns:
         Training data in the specified format, suitable for fine-tuning or RL training.
         Metadata includes pages_fetched, time_segments_processed, and total_raw_observations for transparency.
+        When samples are streamed to an incremental file or shards, `data` is a preview of the first
+        samples and metadata `preview` points at the file or manifest holding all of them.
         
         Structure varies by output_format:
         - 'openai': [{"messages": [{"role": "system", "content": "..."}, ...], "metadata": {...}}, ...]
@@ -2859,15 +6407,44 @@ async def fetch_llm_training_data(
         
         # Combine filters: agent + model (partial match, last 14 days)
         fetch_llm_training_data(age=20160, agent_name="supervisor", ls_model_name="Qwen3_235B", limit=1000)
+
+        # Continue an extraction that was interrupted, using the incremental file it reported
+        fetch_llm_training_data(age=43200, resume_from="/tmp/dumps/agent_supervisor_openai_incremental_20250101_120000.jsonl")
     """
     state = cast(MCPState, ctx.request_context.lifespan_context)
 
+    # A resumed extraction reuses the parameters and the unread time ranges of its checkpoint
+    checkpoint = None
+    resume_state = None
+    if resume_from:
+        checkpoint, resume_state = await asyncio.to_thread(ExtractionCheckpoint.load, resume_from)
+        params = checkpoint.header["params"]
+        for name, value in (("langgraph_node", langgraph_node), ("agent_name", agent_name), ("ls_model_name", ls_model_name)):
+            if value is not None and value != params.get(name):
+                raise ValueError(f"resume_from checkpoint was created with {name}={params.get(name)!r}, not {value!r}")
+        langgraph_node, agent_name, ls_model_name = params["langgraph_node"], params["agent_name"], params["ls_model_name"]
+        output_format, include_metadata, limit = params["output_format"], params["include_metadata"], params["limit"]
+        dedupe = params.get("dedupe", dedupe)
+        near_dedupe_threshold = params.get("near_dedupe_threshold", near_dedupe_threshold)
+        shard_max_samples, shard_max_bytes = params.get("shard_max_samples"), params.get("shard_max_bytes")
+        incremental_save = True
+
     # Validate that at least one filter parameter is provided
     if not any([langgraph_node, agent_name, ls_model_name]):
         raise ValueError(
             "At least one filter parameter must be provided: langgraph_node, agent_name, or ls_model_name"
         )
 
+    # Near-duplicate filtering needs numpy; fail before any file is created
+    near_filter = NearDuplicateFilter(near_dedupe_threshold) if near_dedupe_threshold is not None else None
+
+    # Sharded output streams every sample into the shards, which replace the single incremental file
+    sharded = bool(shard_max_samples or shard_max_bytes)
+    if sharded and checkpoint is None and not state.dump_dir:
+        raise ValueError("Sharded output (shard_max_samples / shard_max_bytes) requires the server's --dump-dir")
+    if sharded:
+        incremental_save = True
+
     # Split time range into segments if needed (LangFuse API works best with <= 7 day windows)
     MAX_TIME_WINDOW = 7 * 24 * 60  # 7 days in minutes
     now = datetime.now(UTC)
@@ -2881,23 +6458,43 @@ async def fetch_llm_training_data(
         current_start = max(current_end - timedelta(minutes=MAX_TIME_WINDOW), start_time)
         time_segments.append((current_start, current_end))
         current_end = current_start
+    if resume_state is not None:
+        time_segments = [] if resume_state.complete else resume_state.remaining
 
     logger.info(
         f"Starting to fetch training data with limit={limit}, age={age} minutes ({age/1440:.1f} days), "
         f"filters: langgraph_node={langgraph_node}, agent_name={agent_name}, ls_model_name={ls_model_name}, "
-        f"time_segments={len(time_segments)}"
+        f"time_segments={len(time_segments)}, fetch_concurrency={fetch_concurrency}"
     )
 
     # LangFuse API has a maximum limit of 100 per request
     API_BATCH_SIZE = 100
     
     # Initialize partial result handler and request tracker
-    partial_handler = PartialResultHandler(allow_partial=allow_partial_results)
     tracker = RequestTracker()
     
     # Setup incremental save file if enabled
     incremental_file_path = None
-    if incremental_save and state.dump_dir:
+    prior_count = 0  # Samples kept in the file by an interrupted run
+    prior_collected = 0
+    seen_ids: set[str] = set()
+    shard_writer = None
+    shard_options = {
+        "max_samples": shard_max_samples,
+        "max_bytes": shard_max_bytes,
+        "metadata": {"output_format": output_format, "include_metadata": include_metadata},
+    }
+    if checkpoint is not None:
+        # Drop anything written after the last recorded page, then read back what was kept
+        incremental_file_path = checkpoint.data_path
+        if sharded:
+            position = resume_state.offset if isinstance(resume_state.offset, dict) else {"shard": 0, "offset": 0}
+            shard_writer = await asyncio.to_thread(ShardedJSONLWriter.reopen, incremental_file_path, position, **shard_options)
+        else:
+            await asyncio.to_thread(_truncate_resumed_file, incremental_file_path, resume_state.offset)
+        prior_collected = resume_state.samples
+        seen_ids = resume_state.seen_ids
+    elif incremental_save and state.dump_dir:
         timestamp = datetime.now(UTC).strftime("%Y%m%d_%H%M%S")
         safe_filters = []
         if langgraph_node:
@@ -2907,76 +6504,138 @@ async def fetch_llm_training_data(
         if ls_model_name:
             safe_filters.append(f"model_{ls_model_name.replace('/', '_')}")
         filter_str = "_".join(safe_filters) if safe_filters else "training_data"
-        incremental_file_path = os.path.join(
-            state.dump_dir,
-            f"{filter_str}_{output_format}_incremental_{timestamp}.jsonl"
-        )
+        if sharded:
+            incremental_file_path = os.path.join(state.dump_dir, f"{filter_str}_{output_format}_shards_{timestamp}")
+            shard_writer = await asyncio.to_thread(ShardedJSONLWriter, incremental_file_path, **shard_options)
+        else:
+            incremental_file_path = os.path.join(
+                state.dump_dir,
+                f"{filter_str}_{output_format}_incremental_{timestamp}.jsonl"
+            )
+            await asyncio.to_thread(Path(incremental_file_path).write_bytes, b"")
         logger.info(f"Incremental save enabled: {incremental_file_path}")
-    
+        checkpoint = await asyncio.to_thread(
+            ExtractionCheckpoint.create,
+            incremental_file_path,
+            {
+                "langgraph_node": langgraph_node,
+                "agent_name": agent_name,
+                "ls_model_name": ls_model_name,
+                "output_format": output_format,
+                "include_metadata": include_metadata,
+                "limit": limit,
+                "dedupe": dedupe,
+                "near_dedupe_threshold": near_dedupe_threshold,
+                "shard_max_samples": shard_max_samples,
+                "shard_max_bytes": shard_max_bytes,
+            },
+            time_segments,
+        )
+
+    # Samples stream fetch -> filter -> format -> write through bounded stages. With a file to write
+    # to, only a preview of the samples is kept in memory; otherwise the samples are the result.
+    streamed = incremental_save and incremental_file_path is not None
+    partial_handler = PartialResultHandler(allow_partial=allow_partial_results, keep_items=not streamed)
+    collected = prior_collected  # Observations consumed towards `limit`, including failed formats
+    sample_count = 0  # Samples exported by this run
+    preview: list[dict[str, Any]] = []
+    kept_samples: list[dict[str, Any]] = []
+    duplicates_skipped = 0
+    if near_filter is not None:
+        logger.info(f"Near-duplicate filtering enabled: threshold={near_dedupe_threshold}, bands={near_filter.bands}x{near_filter.rows}")
+    if checkpoint is not None and resume_state is not None:
+        # Prompts kept by the interrupted run seed the near-duplicate index, so resumed pages are compared against them too
+        kept_paths = shard_writer.paths() if shard_writer is not None else [incremental_file_path]
+        prior_count, preview = await asyncio.to_thread(_scan_resumed_samples, kept_paths, near_filter, TRAINING_PREVIEW_SAMPLES)
+        logger.info(
+            f"Resuming extraction from {checkpoint.path}: {prior_count} samples kept, "
+            f"{len(time_segments)} time ranges left to read"
+        )
+    deduplicator = None
+    if dedupe != "off":
+        dedupe_dir = os.path.join(state.dump_dir, "dedupe") if state.dump_dir else None
+        deduplicator = await asyncio.to_thread(SampleDeduplicator, dedupe, dedupe_dir, output_format)
+        logger.info(f"Content dedupe enabled ({dedupe}), seen set: {deduplicator.path}")
+    await _report_progress(
+        ctx,
+        min(prior_collected, limit),
+        limit,
+        f"Starting extraction of {len(time_segments)} time ranges",
+        pages=0,
+        segment=0,
+        segments=len(time_segments),
+        samples=prior_collected,
+        limit=limit,
+        incremental_file=incremental_file_path,
+        checkpoint_file=checkpoint.path if checkpoint is not None else None,
+    )
+    writer = None
+    pending_digests: list[bytes] = []  # Dedupe digests of samples returned in memory, committed once the run completes
     try:
-        all_filtered_observations = []
+        if streamed:
+            writer = _SampleWriter(incremental_file_path, shard_writer, checkpoint, deduplicator)
+
+        # Exact-match metadata predicates are evaluated by the server when it supports the
+        # observations filter parameter; every predicate is still checked below, so a server
+        # that ignores part of the filter can never add wrong samples.
+        filter_conditions = _metadata_filter_conditions({"langgraph_node": langgraph_node, "agent_name": agent_name})
+        if filter_conditions and (
+            not time_segments or not await _probe_filter_pushdown(state, filter_conditions, "GENERATION", time_segments[0])
+        ):
+            filter_conditions = []
+        server_filters = [condition["key"] for condition in filter_conditions]
+
         total_raw_observations = 0
         total_pages_fetched = 0
 
-        # Process each time segment
-        for segment_idx, (segment_start, segment_end) in enumerate(time_segments):
-            # Check for cancellation at the start of each segment
-            await asyncio.sleep(0)  # Yield control to allow cancellation
-            
-            if len(all_filtered_observations) >= limit:
-                logger.info(f"Reached limit of {limit} samples, stopping at segment {segment_idx + 1}/{len(time_segments)}")
-                break
+        # Pages are prefetched concurrently across pages and time segments but delivered in
+        # (segment, page) order, so the merged result is identical to a sequential walk. With an
+        # observation store, settled ranges fetched before are read locally.
+        current_segment = None
+        reached_limit = prior_collected >= limit
+        async with ObservationScan(
+            state,
+            tracker,
+            obs_type="GENERATION",  # Only LLM generations
+            windows=time_segments,
+            page_size=API_BATCH_SIZE,  # Always use max batch size for efficiency
+            concurrency=fetch_concurrency,
+            filter_conditions=filter_conditions or None,
+        ) as pages:
+            progress = _ScanProgress(pages.parts, API_BATCH_SIZE)
+            async for page_result in pages:
+                segment_idx, current_page = page_result.segment_index, page_result.page
+
+                if segment_idx != current_segment:
+                    current_segment = segment_idx
+                    segment = pages.parts[segment_idx]
+                    logger.info(
+                        f"Processing time segment {segment_idx + 1}/{len(pages.parts)}: "
+                        f"{segment.start.isoformat()} to {segment.end.isoformat()}"
+                        f"{' (from observation store)' if segment.local else ''}"
+                    )
 
-            logger.info(
-                f"Processing time segment {segment_idx + 1}/{len(time_segments)}: "
-                f"{segment_start.isoformat()} to {segment_end.isoformat()}"
-            )
+                if page_result.error is not None:
+                    # Record failure and decide whether to continue; the rest of this segment is skipped
+                    progress.page(segment_idx, [], failed=True)
+                    partial_handler.record_failure(page_result.error)
+                    logger.error(f"Failed to fetch page {current_page} in segment {segment_idx + 1}: {str(page_result.error)}")
 
-            # Paginate through this time segment
-            current_page = 1
-            segment_pages = 0
-            while len(all_filtered_observations) < limit:
-                # Check for cancellation at the start of each page
-                await asyncio.sleep(0)  # Yield control to allow cancellation
-                
-                try:
-                    # Fetch a batch of observations with retry logic
-                    observation_items, pagination = _list_observations_with_retry(
-                        state.retry_manager,
-                        tracker,
-                        state.langfuse_client,
-                        limit=API_BATCH_SIZE,  # Always use max batch size for efficiency
-                        page=current_page,
-                        from_start_time=segment_start,
-                        to_start_time=segment_end,
-                        obs_type="GENERATION",  # Only LLM generations
-                        name=None,
-                        user_id=None,
-                        trace_id=None,
-                        parent_observation_id=None,
-                        metadata=None,
-                    )
-                except Exception as e:
-                    # Record failure and decide whether to continue
-                    partial_handler.record_failure(e)
-                    logger.error(
-                        f"Failed to fetch page {current_page} in segment {segment_idx + 1}: {str(e)}"
-                    )
-                    
                     if not partial_handler.should_continue():
                         # Re-raise if partial results not allowed
-                        raise
-                    
-                    # Break out of pagination loop for this segment
-                    break
+                        raise page_result.error
+                    continue
 
+                observation_items = page_result.items
                 if not observation_items:
+                    progress.page(segment_idx, [])
                     logger.info(f"No more observations in segment {segment_idx + 1}, page {current_page}")
-                    break
+                    continue
 
                 # Convert to Python objects
-                raw_observations = [_sdk_object_to_python(obs) for obs in observation_items]
+                raw_observations = [_record(obs) for obs in observation_items]
                 total_raw_observations += len(raw_observations)
+                progress.page(segment_idx, raw_observations)
 
                 # Filter by langgraph_node, agent_name, and ls_model_name
                 batch_filtered = []
@@ -3003,66 +6662,104 @@ async def fetch_llm_training_data(
                             continue
 
                     batch_filtered.append(obs)
-                
-                # Incremental save: format and save batch immediately
-                if incremental_save and incremental_file_path and batch_filtered:
-                    try:
-                        with open(incremental_file_path, "a", encoding="utf-8") as f:
-                            for obs in batch_filtered:
-                                formatted_sample = _format_training_sample(obs, output_format, include_metadata)
-                                if formatted_sample:
-                                    f.write(json.dumps(formatted_sample, ensure_ascii=False) + "\n")
-                        logger.debug(f"Incrementally saved {len(batch_filtered)} samples to {incremental_file_path}")
-                    except Exception as save_error:
-                        logger.warning(f"Failed to incrementally save batch: {save_error}")
-                
-                all_filtered_observations.extend(batch_filtered)
-                segment_pages += 1
+
+                # Observations already saved before a resume (or seen on a page boundary) are skipped
+                if seen_ids:
+                    unique = [obs for obs in batch_filtered if obs.get("id") not in seen_ids]
+                    duplicates_skipped += len(batch_filtered) - len(unique)
+                    batch_filtered = unique
+                if checkpoint is not None:
+                    seen_ids.update(obs["id"] for obs in batch_filtered if obs.get("id"))
+
+                # Each observation is formatted exactly once; dedupe, the incremental save and the result reuse the samples
+                batch_samples = await _format_samples(state, batch_filtered, output_format, include_metadata)
+                digests: list[bytes] = []
+                if deduplicator is not None and batch_filtered:
+                    keep, digests = await asyncio.to_thread(deduplicator.filter, batch_samples)
+                    batch_filtered = [obs for obs, kept in zip(batch_filtered, keep) if kept]
+                    batch_samples = [sample for sample, kept in zip(batch_samples, keep) if kept]
+                if near_filter is not None and batch_filtered:
+                    prompts = [_sample_prompt_text(sample) if sample else "" for sample in batch_samples]
+                    keep = await asyncio.to_thread(near_filter.filter, prompts)
+                    batch_filtered = [obs for obs, kept in zip(batch_filtered, keep) if kept]
+                    batch_samples = [sample for sample, kept in zip(batch_samples, keep) if kept]
+
+                # The whole page is saved, but the result only holds the samples within `limit`; they come first
+                # in the file. Samples whose formatting failed are skipped.
+                within_limit = [sample for sample in batch_samples[: max(0, limit - collected)] if sample]
+                sample_count += len(within_limit)
+                collected += len(batch_filtered)
                 total_pages_fetched += 1
-                
+                reached_limit = collected >= limit
+
+                if writer is not None:
+                    preview.extend(within_limit[: max(0, TRAINING_PREVIEW_SAMPLES - len(preview))])
+                    # Queue the page for the write stage; its checkpoint is recorded once it is on disk
+                    remaining = progress.remaining()
+                    await writer.put(
+                        [sample for sample in batch_samples if sample],
+                        [obs["id"] for obs in batch_filtered if obs.get("id")],
+                        collected,
+                        remaining,
+                        reached_limit or not remaining,
+                        digests,
+                    )
+                else:
+                    kept_samples.extend(within_limit)
+                    pending_digests.extend(digests)
+
                 # Record successful page
                 partial_handler.add_page_result(batch_filtered)
-                
+
                 # Log progress
                 logger.info(
-                    f"Segment {segment_idx + 1}/{len(time_segments)}, Page {current_page}: "
+                    f"Segment {segment_idx + 1}/{len(pages.parts)}, Page {current_page}: "
                     f"fetched {len(raw_observations)} observations, filtered to {len(batch_filtered)}, "
-                    f"total filtered: {len(all_filtered_observations)}"
+                    f"total filtered: {collected - prior_collected}, pages in flight: {pages.in_flight}"
                 )
-                
+
                 # Log progress every 10 pages
-                tracker.log_progress(total_pages_fetched, len(all_filtered_observations))
+                tracker.log_progress(total_pages_fetched, collected - prior_collected)
+                await _report_progress(
+                    ctx,
+                    min(collected, limit),
+                    limit,
+                    f"Segment {segment_idx + 1}/{len(pages.parts)}, page {current_page}: {collected} samples",
+                    pages=total_pages_fetched,
+                    segment=segment_idx + 1,
+                    segments=len(pages.parts),
+                    samples=collected,
+                    limit=limit,
+                    raw_observations=total_raw_observations,
+                )
 
-                # If we've collected enough, stop
-                if len(all_filtered_observations) >= limit:
-                    logger.info(f"Reached requested limit of {limit} samples")
-                    break
-                
-                # Check if we got fewer observations than requested
-                # This is more reliable than trusting pagination.next_page when using time ranges
-                if len(raw_observations) < API_BATCH_SIZE:
+                # If we've collected enough, stop; leaving the block cancels outstanding pages
+                if reached_limit:
                     logger.info(
-                        f"Reached end of segment {segment_idx + 1} "
-                        f"(got {len(raw_observations)} < {API_BATCH_SIZE} observations)"
+                        f"Reached requested limit of {limit} samples in segment {segment_idx + 1}/{len(pages.parts)}, "
+                        f"cancelling {pages.in_flight} outstanding page requests"
                     )
                     break
-                
-                # Continue to next page
-                current_page += 1
-
-            logger.info(
-                f"Completed segment {segment_idx + 1}/{len(time_segments)}: "
-                f"fetched {segment_pages} pages, total filtered: {len(all_filtered_observations)}"
-            )
+            else:
+                progress.finish()
+
+        remaining = progress.remaining()
+        if writer is not None:
+            # Let the write stage finish the queued pages before the final checkpoint record
+            await writer.drain()
+            checkpoint = writer.checkpoint
+        if checkpoint is not None:
+            await asyncio.to_thread(writer.record, remaining, collected, reached_limit or not remaining)
+        if shard_writer is not None:
+            await asyncio.to_thread(shard_writer.close, reached_limit or not remaining)
+        if deduplicator is not None and pending_digests:
+            await asyncio.to_thread(deduplicator.commit, pending_digests)
 
         # Get partial result metadata
         _, partial_metadata = partial_handler.get_result()
-        
-        # Trim to exact limit if we got more
-        filtered_observations = all_filtered_observations[:limit]
 
         logger.info(
-            f"Filtered {len(filtered_observations)} observations from {total_raw_observations} total "
+            f"Filtered {collected - prior_collected} observations from {total_raw_observations} total "
             f"across {total_pages_fetched} pages and {len(time_segments)} time segments "
             f"(langgraph_node={langgraph_node}, agent_name={agent_name}, ls_model_name={ls_model_name})"
         )
@@ -3075,14 +6772,11 @@ async def fetch_llm_training_data(
                 f"Last error: {partial_metadata.error_message}"
             )
 
-        # Format observations into training data
-        training_data = []
-        for obs in filtered_observations:
-            formatted_sample = _format_training_sample(obs, output_format, include_metadata)
-            if formatted_sample:  # Skip if formatting failed
-                training_data.append(formatted_sample)
+        # The result is the samples kept from a resumed run followed by this run's
+        item_count = min(prior_count, limit) + sample_count
 
-        logger.info(f"Formatted {len(training_data)} training samples in '{output_format}' format")
+        logger.info(f"Formatted {item_count} training samples in '{output_format}' format")
+        await _report_progress(ctx, limit, limit, f"Formatted {item_count} training samples", samples=item_count, limit=limit)
 
         # Process based on output mode
         mode = _ensure_output_mode(output_mode)
@@ -3094,16 +6788,39 @@ async def fetch_llm_training_data(
         if ls_model_name:
             base_filename_prefix += f"_model_{ls_model_name.replace('/', '_')}"
 
-        processed_data, file_meta = process_data_with_mode(training_data, mode, base_filename_prefix, state)
+        file_meta = None
+        if writer is None:
+            # Nothing was written to disk, so the samples themselves are the result
+            processed_data, file_meta = await process_data_with_mode(kept_samples, mode, base_filename_prefix, state)
+        else:
+            # The samples are on disk; the response carries a preview and the files are read back only on request
+            data_paths = shard_writer.paths() if shard_writer is not None else [incremental_file_path]
+            if mode == OutputMode.FULL_JSON_STRING:
+                processed_data = await asyncio.to_thread(_encode_jsonl_array, data_paths, item_count)
+            else:
+                processed_data = process_compact_data(preview)
+            if mode == OutputMode.FULL_JSON_FILE and shard_writer is not None:
+                # The shards already hold every sample; point at the manifest instead of writing one more dump
+                file_meta = {
+                    "file_path": shard_writer.manifest_path,
+                    "file_info": shard_writer.summary(),
+                    "message": "Samples saved as JSONL shards; see the manifest.",
+                }
+            elif mode == OutputMode.FULL_JSON_FILE:
+                samples = itertools.islice(_iter_jsonl_samples(data_paths), item_count)
+                save_info = await asyncio.to_thread(save_full_data_to_file, samples, base_filename_prefix, state)
+                file_meta = {"file_path": save_info.get("file_path"), "file_info": save_info}
+                if save_info.get("status") == "success" and save_info.get("file_path"):
+                    file_meta["message"] = "Full response saved to file."
 
-        logger.info(f"Extracted {len(training_data)} training samples, returning with output_mode={mode}")
+        logger.info(f"Extracted {item_count} training samples, returning with output_mode={mode}")
 
         # Return data in the standard response format
         if mode == OutputMode.FULL_JSON_STRING:
             return processed_data
 
         metadata_block = {
-            "item_count": len(training_data),
+            "item_count": item_count,
             "output_format": output_format,
             "filters": {
                 "langgraph_node": langgraph_node,
@@ -3113,16 +6830,53 @@ async def fetch_llm_training_data(
             "time_range_days": round(age / 1440, 1),
             "time_segments_processed": len(time_segments),
             "pages_fetched": total_pages_fetched,
+            "pages_from_store": pages.local_pages,
+            "filter_pushdown": {
+                "server": server_filters,
+                "client_only": [
+                    name
+                    for name, value in (("langgraph_node", langgraph_node), ("agent_name", agent_name), ("ls_model_name", ls_model_name))
+                    if value is not None and name not in server_filters
+                ],
+                "observations_downloaded": total_raw_observations,
+                "dropped_client_side": total_raw_observations - (collected - prior_collected),
+            },
+            "fetch_concurrency": fetch_concurrency if fetch_concurrency is not None else "adaptive",
             "total_raw_observations": total_raw_observations,
             "avg_response_time": round(tracker.metrics.avg_response_time, 2),
             "success_rate": f"{tracker.metrics.successful_requests}/{tracker.metrics.total_requests}",
             "partial_results": partial_metadata.is_partial,
+            "rate_limiter": state.rate_limiter.stats(),
+            "adaptive_concurrency": state.concurrency.stats(),
             "file_path": None,
             "file_info": None,
         }
+
+        if deduplicator is not None:
+            metadata_block["dedupe"] = deduplicator.stats()
+        if near_filter is not None:
+            metadata_block["near_dedupe"] = near_filter.stats()
+        if shard_writer is not None:
+            metadata_block["shards"] = shard_writer.summary()
+        if writer is not None:
+            metadata_block["preview"] = {
+                "samples": len(preview),
+                "total_samples": item_count,
+                "source": shard_writer.manifest_path if shard_writer is not None else incremental_file_path,
+            }
+
+        if checkpoint is not None:
+            metadata_block["checkpoint"] = {
+                "path": checkpoint.path,
+                "resumed": resume_state is not None,
+                "resumed_samples": prior_count,
+                "duplicates_skipped": duplicates_skipped,
+                "complete": reached_limit or not remaining,
+                "remaining_ranges": len(remaining),
+            }
         
         # Add incremental save file info if used
-        if incremental_save and incremental_file_path and os.path.exists(incremental_file_path):
+        if shard_writer is None and incremental_save and incremental_file_path and os.path.exists(incremental_file_path):
             file_size = os.path.getsize(incremental_file_path)
             metadata_block["incremental_save_file"] = {
                 "path": incremental_file_path,
@@ -3149,14 +6903,14 @@ async def fetch_llm_training_data(
     except asyncio.CancelledError:
         # Handle cancellation gracefully
         logger.warning(
-            f"Task cancelled by user. Collected {len(all_filtered_observations)} samples before cancellation."
+            f"Task cancelled by user. Collected {collected - prior_collected} samples before cancellation."
         )
         
         # If incremental save is enabled, data is already saved
         if incremental_save and incremental_file_path and os.path.exists(incremental_file_path):
             logger.info(
                 f"Partial data saved to incremental file: {incremental_file_path} "
-                f"({len(all_filtered_observations)} samples)"
+                f"({prior_count + sample_count} samples)"
             )
         
         # Re-raise to properly cancel the task
@@ -3165,6 +6919,254 @@ async def fetch_llm_training_data(
         logger.error(f"Error fetching LLM training data: {str(e)}")
         logger.exception(e)
         raise
+    finally:
+        # A failed or cancelled run stops the write stage after its current page; checkpoints cover what is on disk
+        if writer is not None:
+            await writer.aclose()
+        # Persist the committed digests even when the run failed or was cancelled
+        if deduplicator is not None:
+            await asyncio.to_thread(deduplicator.close)
+        # An interrupted run keeps its current shard as .partial for resume_from
+        if shard_writer is not None and not shard_writer.closed:
+            await asyncio.to_thread(shard_writer.close, False, False)
+
+
+async def start_training_data_job(
+    ctx: Context,
+    age: ValidatedAgeUnlimited = Field(
+        ..., description="Minutes ago to start looking (e.g., 1440 for 24 hours, 86400 for 60 days). No time limit."
+    ),
+    langgraph_node: str | None = Field(None, description="LangGraph node name to filter by. Matches metadata.langgraph_node"),
+    agent_name: str | None = Field(None, description="Agent name to filter by. Matches metadata.agent_name"),
+    ls_model_name: str | None = Field(
+        None, description="LangSmith model name to filter by (partial, case-insensitive). Matches metadata.ls_model_name"
+    ),
+    limit: int = Field(1000, description="Maximum number of training samples to extract. Default: 1000"),
+    output_format: Literal["openai", "anthropic", "generic", "dpo"] = Field(
+        "generic", description="Output format for training data: 'openai', 'anthropic', 'generic' or 'dpo'"
+    ),
+    include_metadata: bool = Field(False, description="Include model parameters, token usage and node information per sample"),
+    fetch_concurrency: int | None = Field(
+        None, description="Pages to keep in flight. Default: follow the server's adaptive concurrency limit"
+    ),
+    dedupe: Literal["off", "exact", "bloom"] = Field(
+        "off", description="Drop samples whose content repeats an earlier sample, in this or earlier runs: 'off', 'exact' or 'bloom'"
+    ),
+    near_dedupe_threshold: float | None = Field(
+        None, description="Prompt similarity (0-1, e.g. 0.8) above which near-duplicate samples are dropped. Requires numpy"
+    ),
+    shard_max_samples: int | None = Field(None, description="Samples per JSONL shard; writes shards plus a manifest.json"),
+    shard_max_bytes: int | None = Field(None, description="Maximum bytes per JSONL shard; writes shards plus a manifest.json"),
+    resume_from: str | None = Field(
+        None, description="Incremental save file or '.checkpoint' sidecar of an interrupted extraction to continue"
+    ),
+) -> ResponseDict:
+    """Start fetch_llm_training_data as a background job and return its job ID immediately.
+
+    Use this instead of fetch_llm_training_data for extractions that may outlive the client's
+    tool-call timeout (e.g. 60 days of data). The job runs in the server process, writes its
+    incremental JSONL file, checkpoint and full_json_file dump to the dump directory, and can
+    be followed with get_training_data_job and stopped with cancel_training_data_job. A
+    cancelled or failed job can be continued by passing its incremental file as `resume_from`.
+
+    Args:
+        ctx: Context object containing lifespan context with Langfuse client
+        age: Minutes ago to start looking
+        langgraph_node: LangGraph node name to filter by (exact match)
+        agent_name: Agent name to filter by (exact match)
+        ls_model_name: LangSmith model name to filter by (partial match, case-insensitive)
+        limit: Maximum number of training samples to extract
+        output_format: Output format ('openai', 'anthropic', 'generic', 'dpo')
+        include_metadata: Include metadata per sample
+        fetch_concurrency: Number of pages to keep in flight
+        dedupe: Content deduplication of samples ('off', 'exact' or 'bloom')
+        near_dedupe_threshold: Prompt similarity above which near-duplicate samples are dropped
+        shard_max_samples: Samples per JSONL shard
+        shard_max_bytes: Maximum bytes per JSONL shard
+        resume_from: Incremental save file or checkpoint of an interrupted extraction to continue
+
+    Returns:
+        The queued job's status record (job_id, status, params, progress)
+    """
+    state = cast(MCPState, ctx.request_context.lifespan_context)
+
+    if not state.dump_dir:
+        raise ValueError("Training data jobs write their results to the dump directory; start the server with --dump-dir")
+    if not resume_from and not any([langgraph_node, agent_name, ls_model_name]):
+        raise ValueError(
+            "At least one filter parameter must be provided: langgraph_node, agent_name, or ls_model_name"
+        )
+    if near_dedupe_threshold is not None:
+        NearDuplicateFilter(near_dedupe_threshold)  # Reject a bad threshold or missing numpy before queueing
+
+    params = {
+        "age": age,
+        "langgraph_node": langgraph_node,
+        "agent_name": agent_name,
+        "ls_model_name": ls_model_name,
+        "limit": limit,
+        "output_format": output_format,
+        "include_metadata": include_metadata,
+        "fetch_concurrency": fetch_concurrency,
+        "dedupe": dedupe,
+        "near_dedupe_threshold": near_dedupe_threshold,
+        "shard_max_samples": shard_max_samples,
+        "shard_max_bytes": shard_max_bytes,
+        "resume_from": resume_from,
+    }
+
+    async def run(job: TrainingJob) -> dict[str, Any]:
+        result = await fetch_llm_training_data(
+            _JobContext(state, job),
+            age=age,
+            langgraph_node=langgraph_node,
+            agent_name=agent_name,
+            ls_model_name=ls_model_name,
+            limit=limit,
+            output_format=output_format,
+            include_metadata=include_metadata,
+            output_mode=OutputMode.FULL_JSON_FILE,
+            allow_partial_results=True,
+            incremental_save=True,
+            fetch_concurrency=fetch_concurrency,
+            dedupe=dedupe,
+            near_dedupe_threshold=near_dedupe_threshold,
+            shard_max_samples=shard_max_samples,
+            shard_max_bytes=shard_max_bytes,
+            resume_from=resume_from,
+        )
+        return result["metadata"]
+
+    job = state.jobs.start(run, params, state.dump_dir)
+    return {
+        "data": job.to_dict(),
+        "metadata": {"running_jobs": state.jobs.running, "max_concurrent_jobs": state.jobs.max_concurrent, "dump_dir": state.dump_dir},
+    }
+
+
+async def get_training_data_job(
+    ctx: Context,
+    job_id: str | None = Field(None, description="ID returned by start_training_data_job. Omit to list all known jobs"),
+) -> ResponseDict:
+    """Report the status and progress of background training-data jobs.
+
+    Args:
+        ctx: Context object containing lifespan context with Langfuse client
+        job_id: Job to report; all known jobs, newest first, when omitted
+
+    Returns:
+        The job's status record, or a list of records. `progress` holds pages, segment, segments,
+        samples and the incremental/checkpoint files; `result` holds the extraction metadata
+        (file_path, file_info, item_count, ...) once the job completed.
+    """
+    state = cast(MCPState, ctx.request_context.lifespan_context)
+    metadata = {"running_jobs": state.jobs.running, "max_concurrent_jobs": state.jobs.max_concurrent}
+
+    if job_id:
+        return {"data": state.jobs.get(job_id).to_dict(), "metadata": metadata}
+
+    jobs = [job.to_dict() for job in state.jobs.list_jobs()]
+    return {"data": jobs, "metadata": {**metadata, "item_count": len(jobs)}}
+
+
+async def cancel_training_data_job(
+    ctx: Context,
+    job_id: str = Field(..., description="ID returned by start_training_data_job"),
+) -> ResponseDict:
+    """Cancel a queued or running background training-data job.
+
+    Samples saved before the cancellation stay in the job's incremental file; pass that file
+    as `resume_from` to continue the extraction later.
+
+    Args:
+        ctx: Context object containing lifespan context with Langfuse client
+        job_id: Job to cancel
+
+    Returns:
+        The job's final status record; metadata.resume_from names the file to resume from, if any
+    """
+    state = cast(MCPState, ctx.request_context.lifespan_context)
+    job = await state.jobs.cancel(job_id)
+    return {"data": job.to_dict(), "metadata": {"resume_from": job.progress.get("incremental_file")}}
+
+
+def _truncate_resumed_file(path: str, offset: int) -> None:
+    """Truncate an incremental save file to a checkpointed offset.
+
+    Args:
+        path: JSONL file written by an interrupted extraction
+        offset: Byte size recorded by the last checkpoint record
+    """
+    if not os.path.exists(path):
+        open(path, "wb").close()
+    if os.path.getsize(path) > offset:
+        os.truncate(path, offset)
+
+
+def _iter_jsonl_samples(paths: Iterable[str]) -> Iterator[dict[str, Any]]:
+    """Yield the samples of JSONL files one at a time.
+
+    Args:
+        paths: JSONL files, read in order
+
+    Yields:
+        Decoded samples
+    """
+    for path in paths:
+        with open(path, "rb") as f:
+            for line in f:
+                if line.strip():
+                    yield json_codec.loads(line)
+
+
+def _scan_resumed_samples(
+    paths: list[str], near_filter: "NearDuplicateFilter | None", preview_size: int, batch_size: int = 100
+) -> tuple[int, list[dict[str, Any]]]:
+    """Stream the samples kept by an interrupted extraction without loading them all.
+
+    Args:
+        paths: Files holding the kept samples
+        near_filter: Near-duplicate filter to seed with the kept prompts, if enabled
+        preview_size: Number of leading samples to return
+        batch_size: Prompts passed to the near-duplicate filter at a time
+
+    Returns:
+        Tuple of (number of kept samples, the first preview_size samples)
+    """
+    count = 0
+    preview: list[dict[str, Any]] = []
+    prompts: list[str] = []
+    for sample in _iter_jsonl_samples(paths):
+        count += 1
+        if len(preview) < preview_size:
+            preview.append(sample)
+        if near_filter is not None:
+            prompts.append(_sample_prompt_text(sample))
+            if len(prompts) >= batch_size:
+                near_filter.filter(prompts)
+                prompts = []
+    if near_filter is not None and prompts:
+        near_filter.filter(prompts)
+    return count, preview
+
+
+def _encode_jsonl_array(paths: list[str], limit: int) -> str:
+    """Join the leading samples of JSONL files into one JSON array string without re-encoding them.
+
+    Args:
+        paths: JSONL files, read in order
+        limit: Number of samples to include
+
+    Returns:
+        JSON array of the first `limit` samples
+    """
+    lines = []
+    for path in paths:
+        with open(path, "rb") as f:
+            lines.extend(itertools.islice((line.rstrip(b"\r\n") for line in f if line.strip()), limit - len(lines)))
+        if len(lines) >= limit:
+            break
+    return (b"[" + b",".join(lines) + b"]").decode("utf-8")
 
 
 def _format_training_sample(observation: dict[str, Any], output_format: str, include_metadata: bool) -> dict[str, Any] | None:
@@ -3218,6 +7220,55 @@ def _format_training_sample(observation: dict[str, Any], output_format: str, inc
         return None
 
 
+def _format_training_samples(observations: list[dict[str, Any]], output_format: str, include_metadata: bool) -> list:
+    """Format a chunk of observations; the unit of work shipped to the formatting pool.
+
+    Args:
+        observations: Observations to format
+        output_format: Target format ('openai', 'anthropic', 'generic', 'dpo')
+        include_metadata: Whether to include metadata
+
+    Returns:
+        One formatted sample (or None if formatting failed) per observation, in order
+    """
+    return [_format_training_sample(obs, output_format, include_metadata) for obs in observations]
+
+
+async def _format_samples(
+    state: "MCPState", observations: list[dict[str, Any]], output_format: str, include_metadata: bool
+) -> list:
+    """Format a page of observations off the event loop.
+
+    With a process pool configured (``--format-workers``) every page is split into chunks of
+    FORMAT_CHUNK_SIZE that are formatted in parallel; otherwise the whole page runs in a worker thread.
+
+    Args:
+        state: MCPState holding the optional formatting executor
+        observations: Observations to format
+        output_format: Target format ('openai', 'anthropic', 'generic', 'dpo')
+        include_metadata: Whether to include metadata
+
+    Returns:
+        One formatted sample (or None if formatting failed) per observation, in order
+    """
+    if not observations:
+        return []
+    executor = getattr(state, "format_executor", None)
+    if executor is None:
+        return await asyncio.to_thread(_format_training_samples, observations, output_format, include_metadata)
+
+    loop = asyncio.get_running_loop()
+    chunks = await asyncio.gather(
+        *(
+            loop.run_in_executor(
+                executor, _format_training_samples, observations[i : i + FORMAT_CHUNK_SIZE], output_format, include_metadata
+            )
+            for i in range(0, len(observations), FORMAT_CHUNK_SIZE)
+        )
+    )
+    return [sample for chunk in chunks for sample in chunk]
+
+
 def _format_openai(obs_input: Any, obs_output: Any, metadata: dict, include_metadata: bool) -> dict[str, Any]:
     """Format as OpenAI fine-tuning format."""
     messages = []
@@ -3507,8 +7558,17 @@ def app_factory(
     host: str,
     cache_size: int = 100,
     dump_dir: str = None,
+    dump_compression: str = "none",
     timeout_config: TimeoutConfig = None,
     retry_manager: RetryManager = None,
+    max_connections: int = 20,
+    rate_limiter: RateLimiter = None,
+    concurrency: AdaptiveConcurrency = None,
+    store_dir: str | None = None,
+    store_settle_delay: float = STORE_SETTLE_DELAY,
+    session_idle_seconds: float = SESSION_IDLE_SECONDS,
+    max_jobs: int = MAX_TRAINING_JOBS,
+    format_workers: int = 0,
 ) -> FastMCP:
     """Create a FastMCP server with Langfuse tools.
 
@@ -3519,8 +7579,17 @@ def app_factory(
         cache_size: Size of LRU caches used for caching data
         dump_dir: Directory to save full JSON dumps when 'output_mode' is 'full_json_file'.
             The directory will be created if it doesn't exist.
+        dump_compression: Compression of full_json_file dumps ('none', 'gzip' or 'zstd')
         timeout_config: HTTP timeout configuration for API requests
         retry_manager: Retry manager for handling failed requests
+        max_connections: Size of the pooled HTTP connection pool shared by all tools
+        rate_limiter: Process-wide limiter for Langfuse API requests
+        concurrency: AIMD controller for the limiter's concurrency cap; one is created for all lifespans when unset
+        store_dir: Directory of the on-disk observation store (disabled when None)
+        store_settle_delay: Seconds after which stored time ranges are treated as immutable
+        session_idle_seconds: Seconds without new traces after which a session is cached as immutable (0 disables)
+        max_jobs: Background training-data jobs allowed to run at the same time
+        format_workers: Processes formatting training samples in parallel (a worker thread when 0)
 
     Returns:
         FastMCP server instance
@@ -3533,6 +7602,13 @@ def app_factory(
     if retry_manager is None:
         retry_manager = RetryManager(RetryConfig())
 
+    # Use default rate limiter if not provided
+    if rate_limiter is None:
+        rate_limiter = RateLimiter()
+    # One controller for every lifespan, capped at the configured ceiling rather than the current adapted limit
+    if concurrency is None:
+        concurrency = AdaptiveConcurrency(rate_limiter, max_limit=rate_limiter.concurrency_ceiling)
+
     @asynccontextmanager
     async def lifespan(server: FastMCP) -> AsyncIterator[MCPState]:
         """Initialize and cleanup MCP server state.
@@ -3563,9 +7639,29 @@ def app_factory(
             file_to_observations_map=LRUCache(maxsize=cache_size),
             exception_type_map=LRUCache(maxsize=cache_size),
             exceptions_by_filepath=LRUCache(maxsize=cache_size),
+            function_to_observations_map=LRUCache(maxsize=cache_size),
+            session_cache=LRUCache(maxsize=cache_size),
+            session_idle_seconds=session_idle_seconds,
             dump_dir=dump_dir,
+            dump_compression=dump_compression,
             timeout_config=timeout_config,
             retry_manager=retry_manager,
+            rate_limiter=rate_limiter,
+            concurrency=concurrency,
+            observation_store=ObservationStore(store_dir, settle_delay=store_settle_delay) if store_dir else None,
+            jobs=JobManager(max_jobs),
+            format_executor=(
+                ProcessPoolExecutor(max_workers=format_workers, mp_context=multiprocessing.get_context("spawn"))
+                if format_workers > 0
+                else None
+            ),
+            api_client=LangfuseAPIClient(
+                host=host,
+                public_key=public_key,
+                secret_key=secret_key,
+                timeout_config=timeout_config,
+                max_connections=max_connections,
+            ),
         )
 
         try:
@@ -3573,6 +7669,12 @@ def app_factory(
         finally:
             # Cleanup
             logger.info("Cleaning up Langfuse client")
+            await state.jobs.shutdown()
+            if state.format_executor is not None:
+                state.format_executor.shutdown(wait=False, cancel_futures=True)
+            await state.api_client.aclose()
+            if state.observation_store is not None:
+                state.observation_store.close()
             state.langfuse_client.flush()
             state.langfuse_client.shutdown()
 
@@ -3593,6 +7695,9 @@ def app_factory(
     mcp.tool()(get_error_count)
     mcp.tool()(get_data_schema)
     mcp.tool()(fetch_llm_training_data)
+    mcp.tool()(start_training_data_job)
+    mcp.tool()(get_training_data_job)
+    mcp.tool()(cancel_training_data_job)
 
     return mcp
 
@@ -3623,6 +7728,14 @@ def main():
         except (PermissionError, OSError) as e:
             logger.error(f"Failed to create dump directory {args.dump_dir}: {e}")
             args.dump_dir = None
+    try:
+        codec = configure_json_backend(args.json_backend)
+    except ValueError as e:
+        parser.error(str(e))
+    logger.info(f"JSON backend: {codec.backend}")
+
+    if args.dump_compression == "zstd" and zstandard is None:
+        parser.error("--dump-compression zstd requires the 'zstandard' package (pip install zstandard)")
 
     # Create timeout configuration
     timeout_config = TimeoutConfig.from_args(args)
@@ -3637,11 +7750,20 @@ def main():
         initial_delay=getattr(args, "retry_initial_delay", 1.0),
         max_delay=getattr(args, "retry_max_delay", 10.0),
     )
+    rate_limiter = RateLimiter(rate=args.rate_limit, max_concurrency=args.max_concurrent_requests)
+    concurrency = AdaptiveConcurrency(rate_limiter, min_limit=args.min_concurrent_requests, max_limit=args.max_concurrent_requests)
     retry_manager = RetryManager(retry_config)
     logger.info(
         f"Retry configuration: max_retries={retry_config.max_retries}, "
         f"initial_delay={retry_config.initial_delay}s, max_delay={retry_config.max_delay}s"
     )
+    logger.info(
+        f"Rate limit: {rate_limiter.rate} requests/s, adaptive concurrency "
+        f"{concurrency.min_limit}-{concurrency.max_limit} (starting at {concurrency.limit})"
+    )
+
+    if args.store_dir:
+        logger.info(f"Observation store: {args.store_dir} (settle delay {args.store_settle_minutes} minutes)")
 
     logger.info(f"Starting MCP - host:{args.host} cache:{args.cache_size} keys:{args.public_key[:4]}.../{args.secret_key[:4]}...")
     app = app_factory(
@@ -3650,8 +7772,17 @@ def main():
         host=args.host,
         cache_size=args.cache_size,
         dump_dir=args.dump_dir,
+        dump_compression=args.dump_compression,
         timeout_config=timeout_config,
         retry_manager=retry_manager,
+        max_connections=args.max_connections,
+        rate_limiter=rate_limiter,
+        concurrency=concurrency,
+        store_dir=args.store_dir,
+        store_settle_delay=args.store_settle_minutes * 60,
+        session_idle_seconds=args.session_idle_minutes * 60,
+        max_jobs=args.max_jobs,
+        format_workers=args.format_workers,
     )
 
     app.run(transport="stdio")
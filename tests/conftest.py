@@ -64,7 +64,12 @@ def patch_dependencies(monkeypatch: pytest.MonkeyPatch):
     pydantic_mod = types.ModuleType("pydantic")
 
     class BaseModel:
-        pass
+        def __init__(self, **data) -> None:
+            for key, value in data.items():
+                setattr(self, key, value)
+
+        def model_dump(self) -> dict:
+            return dict(vars(self))
 
     def Field(default=None, **kwargs):
         return default
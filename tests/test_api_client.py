@@ -0,0 +1,373 @@
+"""Unit tests for the async Langfuse REST data-access layer."""
+
+from __future__ import annotations
+
+import asyncio
+
+import httpx
+import pytest
+
+from tests.fakes import FakeContext, FakeLangfuse
+
+
+def _observation_page(items, page=1, total_pages=1):
+    return {"data": items, "meta": {"page": page, "limit": 50, "totalItems": len(items), "totalPages": total_pages}}
+
+
+def _make_client(handler):
+    from langfuse_mcp.__main__ import LangfuseAPIClient
+
+    return LangfuseAPIClient(
+        host="https://langfuse.test/",
+        public_key="pk",
+        secret_key="sk",
+        transport=httpx.MockTransport(handler),
+    )
+
+
+def test_list_observations_translates_params_and_keys():
+    """The REST client should send camelCase params and return snake_case records."""
+    from datetime import datetime, timezone
+
+    seen = {}
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        seen["path"] = request.url.path
+        seen["params"] = dict(request.url.params)
+        item = {
+            "id": "obs_1",
+            "traceId": "trace_1",
+            "startTime": "2024-01-01T00:00:00.000Z",
+            "metadata": {"langgraphNode": "llm_call"},
+            "usage": {"inputCost": 1.5},
+        }
+        return httpx.Response(200, json=_observation_page([item], page=1, total_pages=3))
+
+    async def run():
+        client = _make_client(handler)
+        try:
+            return await client.list_observations(
+                limit=50,
+                page=1,
+                type="GENERATION",
+                trace_id="trace_1",
+                from_start_time=datetime(2024, 1, 1, tzinfo=timezone.utc),
+            )
+        finally:
+            await client.aclose()
+
+    response = asyncio.run(run())
+
+    assert seen["path"] == "/api/public/observations"
+    assert seen["params"] == {
+        "limit": "50",
+        "page": "1",
+        "type": "GENERATION",
+        "traceId": "trace_1",
+        "fromStartTime": "2024-01-01T00:00:00Z",
+    }
+    record = response["data"][0]
+    assert record["trace_id"] == "trace_1"
+    assert record["start_time"] == "2024-01-01T00:00:00.000Z"
+    assert record["metadata"] == {"langgraphNode": "llm_call"}
+    assert record["usage"] == {"input_cost": 1.5}
+    assert response["meta"]["next_page"] == 2
+    assert response["meta"]["total"] == 1
+
+
+def test_rest_client_raises_http_status_errors():
+    """HTTP failures should surface as httpx errors so ErrorClassifier can classify them."""
+    from langfuse_mcp.__main__ import ErrorClassifier, ErrorType
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(429, headers={"Retry-After": "2"})
+
+    async def run():
+        client = _make_client(handler)
+        try:
+            await client.get_trace("trace_1")
+        finally:
+            await client.aclose()
+
+    with pytest.raises(httpx.HTTPStatusError) as exc_info:
+        asyncio.run(run())
+    assert ErrorClassifier.classify(exc_info.value) == ErrorType.RATE_LIMIT
+
+
+def test_tools_overlap_on_rest_client(tmp_path):
+    """Concurrent tool calls should be in flight at the same time instead of serializing."""
+    from langfuse_mcp.__main__ import MCPState, fetch_observation
+
+    async def run():
+        arrived = asyncio.Event()
+        in_flight = 0
+
+        async def handler(request: httpx.Request) -> httpx.Response:
+            nonlocal in_flight
+            in_flight += 1
+            if in_flight == 2:
+                arrived.set()
+            # Each request waits until the other one has started; serial execution would time out.
+            await asyncio.wait_for(arrived.wait(), timeout=2)
+            observation_id = request.url.path.rsplit("/", 1)[-1]
+            return httpx.Response(200, json={"id": observation_id, "traceId": "trace_1"})
+
+        state = MCPState(langfuse_client=FakeLangfuse(), dump_dir=str(tmp_path), api_client=_make_client(handler))
+        ctx = FakeContext(state)
+        try:
+            return await asyncio.gather(
+                fetch_observation(ctx, observation_id="obs_a", output_mode="compact"),
+                fetch_observation(ctx, observation_id="obs_b", output_mode="compact"),
+            )
+        finally:
+            await state.api_client.aclose()
+
+    first, second = asyncio.run(run())
+    assert first["data"] == {"id": "obs_a", "trace_id": "trace_1"}
+    assert second["data"]["id"] == "obs_b"
+
+
+def test_retried_rate_limit_counts_one_pause(tmp_path):
+    """A 429 that the retry manager retries pauses the shared limiter once."""
+    from langfuse_mcp.__main__ import MCPState, RateLimiter, RetryConfig, RetryManager, _list_observations_with_retry
+
+    attempts = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        attempts.append(request.url.path)
+        if len(attempts) == 1:
+            return httpx.Response(429, headers={"Retry-After": "0.05"})
+        return httpx.Response(200, json={"data": [{"id": "obs_a", "traceId": "trace_1"}], "meta": {"page": 1, "totalPages": 1}})
+
+    async def run():
+        state = MCPState(
+            langfuse_client=FakeLangfuse(),
+            dump_dir=str(tmp_path),
+            api_client=_make_client(handler),
+            rate_limiter=RateLimiter(rate=0, max_concurrency=4),
+            retry_manager=RetryManager(RetryConfig(max_retries=2)),
+        )
+        try:
+            items, _ = await _list_observations_with_retry(
+                state, state.request_tracker, limit=10, page=1, from_start_time=None, to_start_time=None, obs_type=None
+            )
+            return items, state.rate_limiter.stats()
+        finally:
+            await state.api_client.aclose()
+
+    items, stats = asyncio.run(run())
+    assert [item["id"] for item in items] == ["obs_a"]
+    assert len(attempts) == 2
+    assert stats["rate_limit_pauses"] == 1
+
+
+def test_retry_after_accepts_http_date():
+    """Retry-After may be an HTTP date as well as a number of seconds."""
+    from datetime import datetime, timedelta, timezone
+    from email.utils import format_datetime
+
+    from langfuse_mcp.__main__ import ErrorClassifier
+
+    request = httpx.Request("GET", "https://langfuse.test/api/public/traces")
+    retry_at = format_datetime(datetime.now(timezone.utc) + timedelta(seconds=30), usegmt=True)
+    error = httpx.HTTPStatusError(
+        "rate limited", request=request, response=httpx.Response(429, headers={"Retry-After": retry_at}, request=request)
+    )
+    assert 25 <= ErrorClassifier.get_retry_after(error) <= 30
+
+    past = format_datetime(datetime.now(timezone.utc) - timedelta(seconds=30), usegmt=True)
+    error = httpx.HTTPStatusError(
+        "rate limited", request=request, response=httpx.Response(429, headers={"Retry-After": past}, request=request)
+    )
+    assert ErrorClassifier.get_retry_after(error) == 0
+
+
+def test_rate_limiter_caps_concurrency_and_reports_queue_depth():
+    """Requests beyond the concurrency cap should queue instead of running."""
+    from langfuse_mcp.__main__ import RateLimiter
+
+    limiter = RateLimiter(rate=0, max_concurrency=2)
+
+    async def run():
+        peak = 0
+        running = 0
+        queue_depths = []
+
+        async def request():
+            nonlocal peak, running
+            async with limiter.slot():
+                running += 1
+                peak = max(peak, running)
+                queue_depths.append(limiter.stats()["queue_depth"])
+                await asyncio.sleep(0.01)
+                running -= 1
+
+        await asyncio.gather(*(request() for _ in range(6)))
+        return peak, queue_depths
+
+    peak, queue_depths = asyncio.run(run())
+    assert peak == 2
+    assert max(queue_depths) >= 3
+    assert limiter.stats()["in_flight"] == 0
+
+
+def test_rate_limit_response_pauses_all_requests(tmp_path):
+    """A 429 should pause the shared limiter so other tools back off as well."""
+    from langfuse_mcp.__main__ import MCPState, RateLimiter, RetryConfig, RetryManager, fetch_observation
+
+    attempts = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        attempts.append(request.url.path)
+        if len(attempts) == 1:
+            return httpx.Response(429, headers={"Retry-After": "0.05"})
+        return httpx.Response(200, json={"id": "obs_a", "traceId": "trace_1"})
+
+    async def run():
+        limiter = RateLimiter(rate=0, max_concurrency=4)
+        state = MCPState(
+            langfuse_client=FakeLangfuse(),
+            dump_dir=str(tmp_path),
+            api_client=_make_client(handler),
+            rate_limiter=limiter,
+            retry_manager=RetryManager(RetryConfig(max_retries=0)),
+        )
+        ctx = FakeContext(state)
+        try:
+            with pytest.raises(httpx.HTTPStatusError):
+                await fetch_observation(ctx, observation_id="obs_a", output_mode="compact")
+            paused = limiter.stats()
+            started = asyncio.get_running_loop().time()
+            result = await fetch_observation(ctx, observation_id="obs_a", output_mode="compact")
+            waited = asyncio.get_running_loop().time() - started
+            return paused, waited, result
+        finally:
+            await state.api_client.aclose()
+
+    paused, waited, result = asyncio.run(run())
+    assert paused["rate_limit_pauses"] == 1
+    assert paused["paused_for"] > 0
+    assert waited >= 0.04
+    assert result["data"]["id"] == "obs_a"
+
+
+def test_adaptive_concurrency_increases_additively_and_halves_on_overload():
+    """Stable latency should raise the limit by one per window; timeouts and 5xx should halve it."""
+    from langfuse_mcp.__main__ import AdaptiveConcurrency, RateLimiter, RequestTracker
+
+    limiter = RateLimiter(rate=0, max_concurrency=16)
+    controller = AdaptiveConcurrency(limiter, initial_limit=4)
+    tracker = RequestTracker(controller=controller)
+
+    for _ in range(4):
+        with tracker.track_request():
+            pass
+    assert controller.limit == 5
+    assert limiter.max_concurrency == 5
+
+    # Latency far above the smoothed baseline holds the limit instead of raising it
+    controller.record(10.0)
+    assert controller.limit == 5
+
+    with pytest.raises(httpx.ReadTimeout):
+        with tracker.track_request():
+            raise httpx.ReadTimeout("timed out")
+    assert controller.limit == 2
+    assert limiter.max_concurrency == 2
+
+    # A failure of a request that started before the decrease belongs to the same overload burst
+    request = httpx.Request("GET", "https://langfuse.test/api/public/observations")
+    server_error = httpx.HTTPStatusError("boom", request=request, response=httpx.Response(503, request=request))
+    controller.record(5.0, server_error)
+    assert controller.limit == 2
+
+    # Non-capacity errors do not change the limit
+    not_found = httpx.HTTPStatusError("missing", request=request, response=httpx.Response(404, request=request))
+    controller.record(0.0, not_found)
+    assert controller.stats()["decreases"] == 1
+
+
+def test_adaptive_concurrency_keeps_configured_ceiling_across_states():
+    """A controller created for a new state is capped by the configured limit, not the adapted one."""
+    from langfuse_mcp.__main__ import MCPState, RateLimiter
+
+    limiter = RateLimiter(rate=0, max_concurrency=16)
+    first = MCPState(langfuse_client=FakeLangfuse(), rate_limiter=limiter)
+    assert (first.concurrency.max_limit, limiter.max_concurrency) == (16, 8)
+
+    second = MCPState(langfuse_client=FakeLangfuse(), rate_limiter=limiter)
+    assert second.concurrency.max_limit == 16
+    assert limiter.concurrency_ceiling == 16
+
+
+def test_rate_limited_requests_lower_adaptive_limit(tmp_path):
+    """Upstream 429s seen through the shared client should shrink the concurrency limit."""
+    from langfuse_mcp.__main__ import MCPState, RateLimiter, RetryConfig, RetryManager, fetch_observation
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(429, headers={"Retry-After": "0"})
+
+    async def run():
+        state = MCPState(
+            langfuse_client=FakeLangfuse(),
+            dump_dir=str(tmp_path),
+            api_client=_make_client(handler),
+            rate_limiter=RateLimiter(rate=0, max_concurrency=8),
+            retry_manager=RetryManager(RetryConfig(max_retries=0)),
+        )
+        try:
+            with pytest.raises(httpx.HTTPStatusError):
+                await fetch_observation(FakeContext(state), observation_id="obs_a", output_mode="compact")
+        finally:
+            await state.api_client.aclose()
+        return state
+
+    state = asyncio.run(run())
+    assert state.concurrency.limit == 2
+    assert state.rate_limiter.max_concurrency == 2
+
+
+def test_rest_records_skip_sdk_conversion(tmp_path, monkeypatch):
+    """Records decoded from the REST body should reach the tool without a second conversion walk."""
+    import langfuse_mcp.__main__ as main_mod
+
+    def fail(obj):
+        raise AssertionError("REST records must not be re-walked")
+
+    monkeypatch.setattr(main_mod, "_sdk_object_to_python", fail)
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        item = {"id": "obs_1", "traceId": "trace_1", "type": "GENERATION", "input": {"userMessage": "你好"}}
+        return httpx.Response(200, json=_observation_page([item]))
+
+    async def run():
+        state = main_mod.MCPState(langfuse_client=FakeLangfuse(), dump_dir=str(tmp_path), api_client=_make_client(handler))
+        try:
+            return await main_mod.fetch_observations(
+                FakeContext(state),
+                type="GENERATION",
+                age=60,
+                name=None,
+                user_id=None,
+                trace_id=None,
+                parent_observation_id=None,
+                page=1,
+                limit=10,
+                output_mode="compact",
+            )
+        finally:
+            await state.api_client.aclose()
+
+    result = asyncio.run(run())
+    assert result["data"] == [{"id": "obs_1", "trace_id": "trace_1", "type": "GENERATION", "input": {"userMessage": "你好"}}]
+
+
+def test_sdk_adapter_returns_plain_pages():
+    """The SDK adapter should hand back plain dicts in the REST client's page shape."""
+    from langfuse_mcp.__main__ import LangfuseSDKAdapter
+
+    page = asyncio.run(LangfuseSDKAdapter(FakeLangfuse()).list_observations(type="SPAN"))
+    assert set(page) == {"data", "meta"}
+    record = page["data"][0]
+    assert isinstance(record, dict)
+    assert isinstance(record["start_time"], str)
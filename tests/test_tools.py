@@ -4,6 +4,7 @@ from __future__ import annotations
 
 import asyncio
 import json
+from datetime import datetime, timedelta, timezone
 
 import pytest
 
@@ -190,18 +191,280 @@ def test_negative_age_rejected(state):
         )
 
 
-def test_truncate_large_strings_case_insensitive():
+def test_compact_encode_case_insensitive():
     """Large field detection should be case-insensitive."""
-    from langfuse_mcp.__main__ import MAX_FIELD_LENGTH, truncate_large_strings
+    from langfuse_mcp.__main__ import MAX_FIELD_LENGTH, compact_encode
 
     payload = {"Metadata.langfusePrompt": "x" * (MAX_FIELD_LENGTH + 50)}
-    truncated, _ = truncate_large_strings(payload)
+    truncated, _ = compact_encode(payload)
     value = truncated["Metadata.langfusePrompt"]
     assert isinstance(value, str)
     assert value.endswith("...")
     assert len(value) <= MAX_FIELD_LENGTH + len("...")
 
 
+def test_compact_encode_truncates_to_fixed_outputs():
+    """Stack traces, long text, size notes and list items are truncated to known outputs and byte sizes."""
+    from langfuse_mcp.__main__ import compact_encode
+
+    stack = "\n".join(f"l{i}" for i in range(10))
+    payload = {"id": "e1", "stackTrace": stack, "input": "é" * 60, "count": 3}
+    assert compact_encode(payload, 20, 1000) == (
+        {"id": "e1", "stackTrace": "l0\nl1\nl2\n...\nl7\nl8\nl9", "input": "é" * 20 + "...", "count": 3},
+        118,
+    )
+
+    payload = {"id": "t1", "input": "x" * 300, "output": "z" * 300, "n": [1, 2], "extra": {"k": "v"}}
+    assert compact_encode(payload, 40, 100) == (
+        {
+            "id": "t1",
+            "input": "x" * 40 + "...",
+            "output": "z" * 40 + "...",
+            "_truncation_note": "Response truncated due to size constraints",
+            "n": "[TRUNCATED]",
+            "extra": "[TRUNCATED]",
+        },
+        224,
+    )
+
+    payload = [{"id": f"o{i}", "output": "y" * 100, "tags": ["a"]} for i in range(40)]
+    expected = (
+        [{"id": f"o{i}", "output": "y" * 50 + "...", "tags": ["a"]} for i in range(4)]
+        + [{"id": f"o{i}", "_note": "2 non-essential fields omitted"} for i in range(4, 9)]
+        + ["[TRUNCATED]"] * 31
+    )
+    assert compact_encode(payload, 50, 400) == (expected, 1060)
+
+
+def test_compact_encode_visits_every_node_once(monkeypatch):
+    """Lists pick their truncation level up front, so no item is encoded twice, however deep."""
+    from collections import Counter
+
+    import langfuse_mcp.__main__ as main
+
+    visits = Counter()
+    encode = main._compact_encode
+
+    def counting_encode(obj, *args):
+        if isinstance(obj, dict | list):
+            visits[id(obj)] += 1
+        return encode(obj, *args)
+
+    monkeypatch.setattr(main, "_compact_encode", counting_encode)
+
+    def observation(i):
+        return {"id": f"obs_{i}", "input": {"messages": [{"role": "user", "content": "q" * 3000}]}, "output": "a" * 3000}
+
+    nested = observation(0)
+    for depth in range(6):
+        nested = {"id": f"level_{depth}", "children": [nested] + [observation(i) for i in range(1, 50)]}
+    for payload in ([observation(i) for i in range(2000)], nested):
+        visits.clear()
+        main.compact_encode(payload)
+        assert visits
+        assert set(visits.values()) == {1}
+
+
+def test_compact_encode_reports_serialized_byte_size():
+    """The reported size is the UTF-8 byte length of the output as compact JSON."""
+    import random
+
+    from langfuse_mcp.__main__ import compact_encode
+
+    rng = random.Random(7)
+    stack = "\n".join(f"  File \"app.py\", line {i}" for i in range(12))
+
+    def observation(i):
+        return {
+            "id": f"obs_{i}",
+            "type": "GENERATION",
+            "input": {"messages": [{"role": "user", "content": "问" * rng.randint(10, 3000)}]},
+            "output": 'a"' * rng.randint(10, 5000),
+            "metadata": {"stackTrace": stack, "langgraph_node": "llm", "Extra": [1, 2.5, None, True], 3: "x"},
+            "events": [{"attributes": {"exception.stacktrace": stack, "exception.message": "boom"}}],
+            "statusMessage": "ok",
+        }
+
+    payloads = [
+        [observation(i) for i in range(3)],
+        [observation(i) for i in range(60)],
+        [observation(i) for i in range(400)],
+        {"data": [[observation(i) for i in range(20)] for _ in range(20)], "name": "n" * 900},
+        {"stack": {"frames": stack, "deep": [stack, "s" * 800]}},
+        [],
+        "plain string",
+        42,
+    ]
+    for payload in payloads:
+        for args in ((), (200, 5000)):
+            processed, size = compact_encode(payload, *args)
+            assert size == len(json.dumps(processed, separators=(",", ":"), ensure_ascii=False).encode("utf-8"))
+
+
+def test_full_json_file_streams_compressed_dump(state):
+    """full_json_file dumps should be streamed through gzip and report both byte counts."""
+    import gzip
+    import os
+
+    from langfuse_mcp.__main__ import fetch_observation
+
+    state.dump_compression = "gzip"
+    result = asyncio.run(fetch_observation(FakeContext(state), observation_id="obs_1", output_mode="full_json_file"))
+
+    file_info = result["metadata"]["file_info"]
+    path = result["metadata"]["file_path"]
+    assert file_info["status"] == "success"
+    assert path.endswith(".json.gz")
+    assert file_info["compression"] == "gzip"
+    assert file_info["bytes_written"] == os.path.getsize(path)
+
+    with gzip.open(path, "rb") as f:
+        raw = f.read()
+    assert file_info["uncompressed_bytes"] == len(raw)
+    assert json.loads(raw)["id"] == "obs_1"
+    assert not [name for name in os.listdir(state.dump_dir) if name.endswith(".partial")]
+
+
+def test_json_codec_streams_dump_identical_to_json_module(monkeypatch):
+    """The piecewise dump writer should produce the same document as json.dumps(indent=2)."""
+    import io
+    from datetime import datetime, timezone
+
+    import langfuse_mcp.__main__ as main_mod
+
+    monkeypatch.setattr(main_mod, "json_codec", main_mod.JSONCodec("json"))
+    data = {
+        "traces": [
+            {"id": "t1", "name": "中文追踪", "observations": [{"input": {"messages": ["你好", {"deep": [1, 2]}]}}]},
+            {"id": "t2", "timestamp": datetime(2024, 1, 1, tzinfo=timezone.utc), "tags": [], "metadata": {}},
+        ],
+        "count": 2,
+        1: None,
+        "empty": [],
+    }
+
+    sink = io.BytesIO()
+    written = main_mod._write_json_stream(data, sink)
+
+    expected = json.dumps(data, default=str, ensure_ascii=False, indent=2).encode("utf-8")
+    assert sink.getvalue() == expected
+    assert written == len(expected)
+    assert "中文追踪" in main_mod.serialize_full_json_string(data)
+
+
+def test_dump_writer_streams_nested_containers(monkeypatch):
+    """Containers at any depth are framed piece by piece; the codec only encodes single scalars."""
+    import io
+    from datetime import datetime, timezone
+
+    import langfuse_mcp.__main__ as main_mod
+
+    class ScalarOnlyCodec(main_mod.JSONCodec):
+        def dumps_bytes(self, obj, indent=False):
+            assert not isinstance(obj, dict | list | tuple), f"container encoded whole: {obj!r}"
+            return super().dumps_bytes(obj, indent)
+
+    class RecordingSink(io.BytesIO):
+        def __init__(self):
+            super().__init__()
+            self.sizes = []
+
+        def write(self, chunk):
+            self.sizes.append(len(chunk))
+            return super().write(chunk)
+
+    monkeypatch.setattr(main_mod, "json_codec", ScalarOnlyCodec("json"))
+    monkeypatch.setattr(main_mod, "DUMP_WRITE_BUFFER", 4096)
+    observations = [
+        {"id": f"obs-{i}", "start_time": datetime(2024, 1, 1, tzinfo=timezone.utc), "input": {"messages": [{"content": "x" * 500}]}}
+        for i in range(50)
+    ]
+    data = {"trace": {"id": "t1", "observations": observations, "scores": (0.5, 1.25), "flags": [True, False, None]}}
+    lazy = {"trace": {"id": "t1", "observations": iter(observations), "scores": (0.5, 1.25), "flags": [True, False, None]}}
+
+    sink = RecordingSink()
+    written = main_mod._write_json_stream(lazy, sink)
+
+    expected = json.dumps(data, default=str, ensure_ascii=False, indent=2).encode("utf-8")
+    assert sink.getvalue() == expected
+    assert written == len(expected)
+    # The buffer is handed over in bounded pieces, not as one document
+    assert len(sink.sizes) > 5
+    assert max(sink.sizes) < 4096 + 1024
+
+
+def test_json_codec_rejects_missing_backend(monkeypatch):
+    """Auto selection falls back to the json module; naming a missing backend is an error."""
+    import langfuse_mcp.__main__ as main_mod
+
+    monkeypatch.setattr(main_mod, "orjson", None)
+    monkeypatch.setattr(main_mod, "msgspec", None)
+    assert main_mod.JSONCodec().backend == "json"
+    with pytest.raises(ValueError):
+        main_mod.JSONCodec("orjson")
+    with pytest.raises(ValueError):
+        main_mod.JSONCodec("yaml")
+
+
+def test_fields_projection_pushes_down_and_prunes(state):
+    """A fields projection should narrow the API selector and return only the requested paths."""
+    from langfuse_mcp.__main__ import fetch_observation, fetch_traces
+
+    ctx = FakeContext(state)
+    traces = asyncio.run(
+        fetch_traces(
+            ctx,
+            age=10,
+            name=None,
+            user_id=None,
+            session_id=None,
+            metadata=None,
+            page=1,
+            limit=50,
+            tags=None,
+            include_observations=True,
+            fields="id,name",
+            output_mode="compact",
+        )
+    )
+    # Neither io nor observations are needed, so they are neither requested nor embedded
+    assert state.langfuse_client.api.trace.last_list_kwargs["fields"] == "core"
+    assert traces["data"] == [{"id": "trace_1", "name": "test-trace"}]
+    assert traces["metadata"]["fields"] == "id,name"
+
+    traces = asyncio.run(
+        fetch_traces(
+            ctx,
+            age=10,
+            name=None,
+            user_id=None,
+            session_id=None,
+            metadata=None,
+            page=1,
+            limit=50,
+            tags=None,
+            include_observations=True,
+            fields="id, observations.name, observations.metadata.code.filepath",
+            output_mode="compact",
+        )
+    )
+    assert state.langfuse_client.api.trace.last_list_kwargs["fields"] == "core,observations"
+    assert traces["data"] == [{"id": "trace_1", "observations": [{"name": "root_span", "metadata": {"code.filepath": "app.py"}}]}]
+
+    observation = asyncio.run(fetch_observation(ctx, observation_id="obs_1", fields="id,type,metadata", output_mode="compact"))
+    assert observation["data"] == {"id": "obs_1", "type": "SPAN", "metadata": {"code.filepath": "app.py"}}
+
+
+def test_parse_field_paths_merges_prefixes():
+    """Overlapping paths should merge, and a whole-value path should win over its children."""
+    from langfuse_mcp.__main__ import _parse_field_paths
+
+    assert _parse_field_paths("metadata.a, metadata.b,id") == {"metadata": {"a": None, "b": None}, "id": None}
+    assert _parse_field_paths("metadata.a,metadata") == {"metadata": None}
+    assert _parse_field_paths("metadata,metadata.a") == {"metadata": None}
+    assert _parse_field_paths(" , ") is None
+
+
 def test_fetch_llm_training_data_openai_format(state):
     """fetch_llm_training_data should format data in OpenAI format."""
     from langfuse_mcp.__main__ import fetch_llm_training_data
@@ -514,3 +777,1116 @@ def test_fetch_llm_training_data_time_segmentation(state):
     assert result["metadata"]["item_count"] > 0  # Should have some data
     # Note: The fake API returns the same mock observations for each segment,
     # so we may get duplicates. This is OK for testing the segmentation logic.
+
+
+def _paged_generations(state, pages_per_segment, delay=0.0):
+    """Serve GENERATION pages of 100 items per segment; returns a call log of (from_start_time, page)."""
+    import threading
+    import time
+
+    calls = []
+    lock = threading.Lock()
+    in_flight = {"now": 0, "max": 0}
+
+    def get_many(**kwargs):
+        with lock:
+            calls.append((kwargs["from_start_time"], kwargs["page"]))
+            in_flight["now"] += 1
+            in_flight["max"] = max(in_flight["max"], in_flight["now"])
+        time.sleep(delay)
+        with lock:
+            in_flight["now"] -= 1
+        page = kwargs["page"]
+        segment_key = (datetime.now(timezone.utc) - kwargs["from_start_time"]).days
+        count = 100 if page < pages_per_segment else (40 if page == pages_per_segment else 0)
+        data = [
+            {
+                "id": f"{segment_key}-{page}-{i}",
+                "type": "GENERATION",
+                "input": f"prompt {page}-{i}",
+                "output": "done",
+                "metadata": {"langgraph_node": "llm_call"},
+            }
+            for i in range(count)
+        ]
+        return {"data": data, "meta": {}}
+
+    state.langfuse_client.api.observations.get_many = get_many
+    return calls, in_flight
+
+
+def _serve_generations(state, observations, fail_after_page=None):
+    """Serve `observations` filtered by the requested window and `filter` conditions, paged; returns the request log.
+
+    Pages after `fail_after_page` fail like a dropped connection.
+    """
+    calls = []
+
+    def in_window(obs, kwargs):
+        if "start_time" not in obs:
+            return True
+        return kwargs["from_start_time"] <= datetime.fromisoformat(obs["start_time"]) <= kwargs["to_start_time"]
+
+    def get_many(**kwargs):
+        calls.append(kwargs)
+        if fail_after_page is not None and kwargs["page"] > fail_after_page:
+            raise ValueError("connection dropped")
+        conditions = json.loads(kwargs["filter"]) if "filter" in kwargs else []
+        matching = [
+            obs
+            for obs in observations
+            if in_window(obs, kwargs) and all(obs["metadata"].get(c["key"]) == c["value"] for c in conditions)
+        ]
+        offset = (kwargs["page"] - 1) * kwargs["limit"]
+        return {"data": matching[offset : offset + kwargs["limit"]], "meta": {}}
+
+    state.langfuse_client.api.observations.get_many = get_many
+    return calls
+
+
+def _training_call(state, ctx=None, **overrides):
+    """Return a fetch_llm_training_data call with every argument set; `overrides` replace the defaults."""
+    from langfuse_mcp.__main__ import fetch_llm_training_data
+
+    arguments = {
+        "age": 60,
+        "langgraph_node": "llm_call",
+        "agent_name": None,
+        "ls_model_name": None,
+        "limit": 1000,
+        "output_format": "generic",
+        "include_metadata": False,
+        "output_mode": "compact",
+        "allow_partial_results": True,
+        "incremental_save": False,
+        "fetch_concurrency": 1,
+        "dedupe": "off",
+        "near_dedupe_threshold": None,
+        "shard_max_samples": None,
+        "shard_max_bytes": None,
+        "resume_from": None,
+    }
+    return fetch_llm_training_data(ctx or FakeContext(state), **{**arguments, **overrides})
+
+
+def _run_training(state, ctx=None, **overrides):
+    """Run fetch_llm_training_data with every argument set; `overrides` replace the defaults."""
+    return asyncio.run(_training_call(state, ctx, **overrides))
+
+
+def test_fetch_llm_training_data_prefetch_is_deterministic(tmp_path):
+    """Concurrent prefetching should return exactly what a sequential walk returns."""
+    from langfuse_mcp.__main__ import MCPState
+
+    sequential_state = MCPState(langfuse_client=FakeLangfuse(), dump_dir=str(tmp_path))
+    _paged_generations(sequential_state, pages_per_segment=3)
+    sequential = json.loads(
+        _run_training(sequential_state, age=3 * 7 * 1440, limit=10_000, include_metadata=True, output_mode="full_json_string")
+    )
+
+    concurrent_state = MCPState(langfuse_client=FakeLangfuse(), dump_dir=str(tmp_path))
+    calls, in_flight = _paged_generations(concurrent_state, pages_per_segment=3, delay=0.01)
+    concurrent = json.loads(
+        _run_training(
+            concurrent_state, age=3 * 7 * 1440, limit=10_000, include_metadata=True, fetch_concurrency=4, output_mode="full_json_string"
+        )
+    )
+
+    assert len(sequential) == 3 * 240
+    assert [s["metadata"]["observation_id"] for s in concurrent] == [s["metadata"]["observation_id"] for s in sequential]
+    assert in_flight["max"] > 1
+
+
+def test_fetch_llm_training_data_prefetch_stops_at_limit(state):
+    """Reaching the limit should stop scheduling further pages and segments."""
+    calls, _ = _paged_generations(state, pages_per_segment=50)
+    result = _run_training(state, age=3 * 7 * 1440, limit=150, include_metadata=True, fetch_concurrency=3)
+
+    assert result["metadata"]["item_count"] == 150
+    assert result["metadata"]["pages_fetched"] == 2
+    # Two pages are needed; anything else requested is bounded by the concurrency window
+    # (plus the one-row filter pushdown probe, since formatting off the event loop lets scheduled pages start).
+    assert len(calls) <= 1 + 2 + 3
+
+
+def test_page_prefetcher_reports_failures_in_order():
+    """A failed page should end its segment and be yielded at its position."""
+    from langfuse_mcp.__main__ import PagePrefetcher
+
+    async def fetch_page(segment_index, page):
+        await asyncio.sleep(0.001 * (5 - page))  # later pages finish first
+        if segment_index == 0 and page == 2:
+            raise RuntimeError("boom")
+        return [page] * (10 if page < 4 else 3), {}
+
+    async def run():
+        async with PagePrefetcher(fetch_page, segment_count=2, page_size=10, concurrency=4) as pages:
+            return [(r.segment_index, r.page, r.error is not None) async for r in pages]
+
+    assert asyncio.run(run()) == [(0, 1, False), (0, 2, True), (1, 1, False), (1, 2, False), (1, 3, False), (1, 4, False)]
+
+
+def test_embed_observations_uses_bulk_listing_per_trace(state):
+    """Hydration should list observations per trace and only get missing IDs individually."""
+    from langfuse_mcp.__main__ import fetch_trace
+    from tests.fakes import FakeObservation
+
+    store = state.langfuse_client._store
+    base = store.observations["obs_1"]
+    for obs_id in ("obs_2", "obs_3"):
+        store.observations[obs_id] = FakeObservation(
+            id=obs_id, type="SPAN", name=obs_id, status="SUCCEEDED", start_time=base.start_time, end_time=base.end_time
+        )
+    store.traces["trace_1"].observations = ["obs_3", "obs_1", "obs_missing", "obs_2"]
+
+    result = asyncio.run(fetch_trace(FakeContext(state), trace_id="trace_1", include_observations=True, output_mode="compact"))
+
+    assert [obs.get("id") for obs in result["data"]["observations"]] == ["obs_3", "obs_1", None, "obs_2"]
+    observations_api = state.langfuse_client.api.observations
+    assert observations_api.last_get_many_kwargs["trace_id"] == "trace_1"
+    assert observations_api.last_get_kwargs == {"observation_id": "obs_missing"}
+
+
+def test_observation_store_plans_gaps_around_covered_ranges(tmp_path):
+    """Covered settled ranges are served locally; gaps and the unsettled tail are fetched."""
+    from datetime import timedelta
+
+    from langfuse_mcp.__main__ import ObservationStore
+
+    store = ObservationStore(str(tmp_path), settle_delay=3600)
+    now = datetime(2024, 6, 10, 12, tzinfo=timezone.utc)
+    start = now - timedelta(days=3)
+    store.mark_covered("GENERATION", now - timedelta(days=2), now - timedelta(days=1), now=now)
+    # The unsettled last hour is never recorded as covered
+    store.mark_covered("GENERATION", now - timedelta(hours=2), now, now=now)
+
+    parts = [(part.start, part.end, part.local) for part in store.plan("GENERATION", start, now, now=now)]
+    settled = now - timedelta(hours=1)
+    assert parts == [
+        (settled, now, False),
+        (now - timedelta(hours=2), settled, True),
+        (now - timedelta(days=1), now - timedelta(hours=2), False),
+        (now - timedelta(days=2), now - timedelta(days=1), True),
+        (start, now - timedelta(days=2), False),
+    ]
+    assert store.plan("SPAN", start, now, now=now)[-1].local is False
+    store.close()
+
+
+def test_fetch_llm_training_data_pushes_metadata_filters_down(state):
+    """Exact-match predicates should be sent as the observations filter when the server applies it."""
+    generations = [
+        {"id": f"gen-{k}", "type": "GENERATION", "input": "q", "output": "a", "metadata": {"langgraph_node": node, "ls_model_name": model}}
+        for k, (node, model) in enumerate([("llm_call", "gpt-4o"), ("llm_call", "Qwen3_235B"), ("router", "gpt-4o")])
+    ]
+    requests = _serve_generations(state, generations)
+
+    result = _run_training(state, limit=100, langgraph_node="llm_call", ls_model_name="qwen3")
+    assert json.loads(requests[0]["filter"]) == [
+        {"type": "stringObject", "column": "metadata", "key": "langgraph_node", "operator": "=", "value": "llm_call"}
+    ]
+    assert all("filter" in kwargs for kwargs in requests)
+    assert result["metadata"]["item_count"] == 1
+    assert result["metadata"]["filter_pushdown"] == {
+        "server": ["langgraph_node"],
+        "client_only": ["ls_model_name"],
+        "observations_downloaded": 2,
+        "dropped_client_side": 1,
+    }
+
+    # A server that ignores the parameter is detected once and filtering moves client-side
+    state.filter_pushdown = None
+    get_many = state.langfuse_client.api.observations.get_many
+    state.langfuse_client.api.observations.get_many = lambda **kwargs: get_many(**{k: v for k, v in kwargs.items() if k != "filter"})
+    result = _run_training(state, limit=100, langgraph_node="router")
+    assert state.filter_pushdown is False
+    assert result["metadata"]["item_count"] == 1
+    assert result["metadata"]["filter_pushdown"]["server"] == []
+    assert result["metadata"]["filter_pushdown"]["dropped_client_side"] == 2
+
+
+def test_fetch_llm_training_data_reuses_observation_store(tmp_path):
+    """A repeat extraction should only fetch the unsettled tail and serve the rest from the store."""
+    from datetime import timedelta
+
+    from langfuse_mcp.__main__ import MCPState, ObservationStore
+
+    now = datetime.now(timezone.utc)
+    observations = [
+        {
+            "id": f"gen-{k}",
+            "type": "GENERATION",
+            "start_time": (now - timedelta(minutes=15 * k)).isoformat(),
+            "input": f"prompt {k}",
+            "output": "done",
+            "metadata": {"langgraph_node": "llm_call"},
+        }
+        for k in range(1, 151)
+    ]
+    store = ObservationStore(str(tmp_path / "store"), settle_delay=3600)
+
+    def run():
+        state = MCPState(langfuse_client=FakeLangfuse(), dump_dir=str(tmp_path), observation_store=store)
+        requests = _serve_generations(state, observations)
+        result = _run_training(state, age=2 * 1440, limit=10_000, include_metadata=True, fetch_concurrency=2)
+        # Single-item requests probe filter pushdown
+        return result, [kwargs["from_start_time"] for kwargs in requests if kwargs["limit"] > 1]
+
+    first, first_calls = run()
+    second, calls = run()
+
+    assert first["metadata"]["item_count"] == second["metadata"]["item_count"] == 150
+    assert first["metadata"]["pages_from_store"] == 0
+    assert second["metadata"]["pages_from_store"] > 0
+    # Only the recent, unsettled hour (plus the sliver that settled in between) is requested again
+    assert min(first_calls) < now - timedelta(days=1)
+    assert all(from_start_time >= now - timedelta(hours=1, minutes=1) for from_start_time in calls)
+    assert second["data"] == first["data"]
+    store.close()
+
+
+@pytest.mark.parametrize("sharded", [False, True])
+def test_fetch_llm_training_data_keeps_file_work_off_the_event_loop(state, monkeypatch, sharded):
+    """Creating the output and checkpoint and recording every page happen in worker threads."""
+    import threading
+    from datetime import timedelta
+
+    import langfuse_mcp.__main__ as main
+
+    calls = []
+
+    def tracked(name, func):
+        def wrapper(*args, **kwargs):
+            calls.append((name, threading.current_thread() is threading.main_thread()))
+            return func(*args, **kwargs)
+
+        return wrapper
+
+    checkpoint_cls = main.ExtractionCheckpoint
+    monkeypatch.setattr(checkpoint_cls, "record", tracked("record", checkpoint_cls.record))
+    monkeypatch.setattr(checkpoint_cls, "create", classmethod(tracked("create", checkpoint_cls.create.__func__)))
+    monkeypatch.setattr(main.ShardedJSONLWriter, "__init__", tracked("shards", main.ShardedJSONLWriter.__init__))
+
+    now = datetime.now(timezone.utc)
+    observations = [
+        {
+            "id": f"gen-{k}",
+            "type": "GENERATION",
+            "start_time": (now - timedelta(seconds=10 * k)).isoformat(),
+            "input": f"prompt {k}",
+            "output": "done",
+            "metadata": {"langgraph_node": "llm_call"},
+        }
+        for k in range(1, 251)
+    ]
+    _serve_generations(state, observations)
+
+    result = _run_training(state, incremental_save=True, shard_max_samples=100 if sharded else None)
+    assert result["metadata"]["item_count"] == 250
+    assert result["metadata"]["checkpoint"]["complete"] is True
+    # Three pages plus the final record, all from worker threads
+    assert [name for name, _ in calls].count("record") == 4
+    assert {name for name, _ in calls} == ({"create", "record", "shards"} if sharded else {"create", "record"})
+    assert not [name for name, on_loop in calls if on_loop]
+
+
+def test_fetch_llm_training_data_resumes_from_checkpoint(state):
+    """An interrupted extraction should resume from its checkpoint without losing or repeating samples."""
+    from datetime import timedelta
+
+    now = datetime.now(timezone.utc)
+    observations = [
+        {
+            "id": f"gen-{k}",
+            "type": "GENERATION",
+            "start_time": (now - timedelta(seconds=10 * k)).isoformat(),
+            "input": f"prompt {k}",
+            "output": "done",
+            "metadata": {"langgraph_node": "llm_call"},
+        }
+        for k in range(1, 251)
+    ]
+    _serve_generations(state, observations, fail_after_page=1)
+
+    first = _run_training(state, incremental_save=True)
+    checkpoint = first["metadata"]["checkpoint"]
+    data_file = first["metadata"]["incremental_save_file"]["path"]
+    assert first["metadata"]["item_count"] == 100
+    assert checkpoint["complete"] is False
+
+    # A crash between writing a page and checkpointing it leaves extra lines and a torn record
+    with open(data_file, "a", encoding="utf-8") as f:
+        f.write('{"prompt": "prompt 101", "completion": "done"}\n')
+    with open(checkpoint["path"], "a", encoding="utf-8") as f:
+        f.write('{"remaining": [')
+
+    _serve_generations(state, observations)
+    resumed = _run_training(state, incremental_save=True, langgraph_node=None, output_format="openai", resume_from=data_file)
+
+    prompts = [f"prompt {k}" for k in range(1, 251)]
+    assert resumed["metadata"]["item_count"] == 250
+    assert [sample["prompt"] for sample in resumed["data"]] == prompts[:20]  # preview of the streamed file
+    assert resumed["metadata"]["output_format"] == "generic"
+    assert resumed["metadata"]["checkpoint"]["resumed_samples"] == 100
+    assert resumed["metadata"]["checkpoint"]["complete"] is True
+    with open(data_file, encoding="utf-8") as f:
+        assert [json.loads(line)["prompt"] for line in f] == prompts
+
+    # A finished extraction is returned from the file without further requests
+    state.langfuse_client.api.observations.get_many = None
+    again = _run_training(state, incremental_save=True, resume_from=checkpoint["path"])
+    assert again["metadata"]["item_count"] == 250
+    assert [sample["prompt"] for sample in again["data"]] == prompts[:20]
+    with pytest.raises(ValueError):
+        _run_training(state, incremental_save=True, langgraph_node="router", resume_from=data_file)
+
+
+def test_fetch_llm_training_data_dedupes_samples_across_pages_and_runs(state):
+    """Repeated prompt/completion pairs should be dropped while streaming and remembered for later runs."""
+    from datetime import timedelta
+
+    from langfuse_mcp.__main__ import SampleDeduplicator
+
+    now = datetime.now(timezone.utc)
+    # 30 distinct pairs, each retried (with extra whitespace) across a 240-observation, three-page scan
+    observations = [
+        {
+            "id": f"gen-{k}",
+            "type": "GENERATION",
+            "start_time": (now - timedelta(seconds=10 * k)).isoformat(),
+            "input": f"prompt  {k % 30}" if k % 2 else f"prompt {k % 30}",
+            "output": "done",
+            "metadata": {"langgraph_node": "llm_call"},
+        }
+        for k in range(1, 241)
+    ]
+    _serve_generations(state, observations)
+
+    def run(dedupe):
+        return _run_training(state, include_metadata=True, incremental_save=True, dedupe=dedupe)
+
+    first = run("exact")
+    assert first["metadata"]["item_count"] == 30
+    assert first["metadata"]["dedupe"]["duplicates_dropped"] == 210
+    with open(first["metadata"]["incremental_save_file"]["path"], encoding="utf-8") as f:
+        saved = [json.loads(line) for line in f]
+    assert sorted(" ".join(sample["prompt"].split()) for sample in saved) == sorted(f"prompt {k}" for k in range(30))
+
+    # The persisted seen set makes a later run skip everything exported before
+    second = run("exact")
+    assert second["metadata"]["item_count"] == 0
+    assert second["metadata"]["dedupe"]["persisted_to"] == first["metadata"]["dedupe"]["persisted_to"]
+
+    assert run("bloom")["metadata"]["item_count"] == 30
+    assert run("bloom")["metadata"]["item_count"] == 0
+    assert run("off")["metadata"]["item_count"] == 240
+
+    # Spilling to disk keeps exact answers with a tiny memory budget
+    dedupe = SampleDeduplicator("exact", memory_limit=4)
+    samples = [{"prompt": f"p{k % 10}", "completion": "c", "metadata": {"id": k}} for k in range(50)]
+    kept = []
+    for offset in range(0, 50, 7):
+        keep, digests = dedupe.filter(samples[offset : offset + 7])
+        dedupe.commit(digests)
+        kept.extend(keep)
+    assert sum(kept) == 10 and dedupe.duplicates == 40
+    dedupe.close()
+
+
+@pytest.mark.parametrize("mode", ["exact", "bloom"])
+def test_sample_deduplicator_overlapping_runs_keep_each_others_samples(tmp_path, mode):
+    """Two runs sharing a seen set at the same time both persist what they exported."""
+    import threading
+
+    from langfuse_mcp.__main__ import SampleDeduplicator
+
+    def sample(k):
+        return {"prompt": f"p{k}", "completion": "c"}
+
+    runs = [SampleDeduplicator(mode, str(tmp_path), memory_limit=3, capacity=10_000) for _ in range(2)]
+    barrier = threading.Barrier(2)
+
+    def export(dedupe, first):
+        barrier.wait()
+        for offset in range(first, first + 40, 5):
+            _, digests = dedupe.filter([sample(k) for k in range(offset, offset + 5)])
+            dedupe.commit(digests)
+        barrier.wait()
+        dedupe.close()
+
+    threads = [threading.Thread(target=export, args=(dedupe, first)) for dedupe, first in zip(runs, (0, 40))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    later = SampleDeduplicator(mode, str(tmp_path), capacity=10_000)
+    keep, _ = later.filter([sample(k) for k in range(81)])
+    later.close()
+    assert keep == [False] * 80 + [True]
+
+
+def test_sample_digest_does_not_depend_on_json_backend(monkeypatch):
+    """Persisted dedupe digests hash a fixed encoding, not the output of the selected JSON backend."""
+    import hashlib
+
+    import langfuse_mcp.__main__ as main
+
+    sample = {"prompt": "héllo  world", "completion": {"b": 1, "a": [1, 2]}, "metadata": {"id": "gen-1"}}
+    expected = hashlib.blake2b('{"completion":{"a":[1,2],"b":1},"prompt":"héllo world"}'.encode(), digest_size=16).digest()
+    assert main.SampleDeduplicator.digest(sample) == expected
+
+    class CompactCodec:
+        def dumps_bytes(self, obj, indent=False):
+            return json.dumps(obj, separators=(",", ":"), ensure_ascii=False).encode()
+
+    monkeypatch.setattr(main, "json_codec", CompactCodec())
+    assert main.SampleDeduplicator.digest(sample) == expected
+
+
+def test_training_formats_do_not_depend_on_json_backend(monkeypatch):
+    """Structured prompts and completions are rendered with the standard library, whatever backend is selected."""
+    import langfuse_mcp.__main__ as main
+
+    obs_input = {"question": "ünïcode", "context": [1, 2]}
+    obs_output = {"answer": "ok"}
+    observation = {"input": obs_input, "output": obs_output}
+    expected = {fmt: main._format_training_sample(observation, fmt, False) for fmt in ("openai", "anthropic", "generic", "dpo")}
+    assert expected["generic"] == {"prompt": '{"question": "ünïcode", "context": [1, 2]}', "completion": '{"answer": "ok"}'}
+
+    class CompactCodec:
+        def dumps(self, obj):
+            return json.dumps(obj, separators=(",", ":"))
+
+    monkeypatch.setattr(main, "json_codec", CompactCodec())
+    for fmt in expected:
+        assert main._format_training_sample(observation, fmt, False) == expected[fmt]
+
+
+def test_fetch_llm_training_data_dedupe_keeps_samples_of_cancelled_pages(state, monkeypatch):
+    """Samples queued but never checkpointed by a cancelled run are exported when it is resumed."""
+    import glob
+    import os
+    import time
+    from datetime import timedelta
+
+    import langfuse_mcp.__main__ as main
+
+    now = datetime.now(timezone.utc)
+    observations = [
+        {
+            "id": f"gen-{k}",
+            "type": "GENERATION",
+            "start_time": (now - timedelta(seconds=k)).isoformat(),
+            "input": f"prompt {k}",
+            "output": "done",
+            "metadata": {"langgraph_node": "llm_call"},
+        }
+        for k in range(1, 1001)
+    ]
+    requests = _serve_generations(state, observations)
+    # A slow disk lets formatted pages pile up in the write queue
+    write = main._SampleWriter._write
+    monkeypatch.setattr(main._SampleWriter, "_write", lambda self, samples: time.sleep(0.05) or write(self, samples))
+
+    async def cancelled_run():
+        task = asyncio.create_task(_training_call(state, incremental_save=True, dedupe="exact"))
+        while len(requests) < 7:
+            await asyncio.sleep(0.005)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(cancelled_run())
+    (data_file,) = glob.glob(os.path.join(state.dump_dir, "*.jsonl"))
+    with open(data_file, encoding="utf-8") as f:
+        assert len(f.readlines()) < 500
+
+    monkeypatch.setattr(main._SampleWriter, "_write", write)
+    resumed = _run_training(state, incremental_save=True, dedupe="exact", resume_from=data_file)
+    assert resumed["metadata"]["item_count"] == 1000
+    assert resumed["metadata"]["dedupe"]["duplicates_dropped"] == 0
+    with open(data_file, encoding="utf-8") as f:
+        assert sorted(json.loads(line)["prompt"] for line in f) == sorted(f"prompt {k}" for k in range(1, 1001))
+
+
+def test_fetch_llm_training_data_drops_near_duplicate_prompts(state):
+    """Prompts differing only in timestamps or IDs should collapse to one sample with MinHash/LSH."""
+    pytest.importorskip("numpy")
+    from datetime import timedelta
+
+    from langfuse_mcp.__main__ import NearDuplicateFilter
+
+    topics = ["refund a damaged order", "change the delivery address", "reset a forgotten password", "upgrade the plan"]
+    now = datetime.now(timezone.utc)
+    observations = [
+        {
+            "id": f"gen-{k}",
+            "type": "GENERATION",
+            "start_time": (now - timedelta(seconds=10 * k)).isoformat(),
+            "input": [
+                {"role": "system", "content": "You are a support agent for the ACME online store. Answer politely."},
+                {"role": "user", "content": f"[{now - timedelta(minutes=k)}] ticket #{1000 + k}: customer asks how to {topics[k % 4]}"},
+            ],
+            "output": f"answer {k}",
+            "metadata": {"langgraph_node": "llm_call"},
+        }
+        for k in range(1, 161)
+    ]
+
+    _serve_generations(state, observations)
+    result = _run_training(state, output_format="openai", near_dedupe_threshold=0.8)
+    assert result["metadata"]["item_count"] == 4
+    assert result["metadata"]["near_dedupe"]["duplicates_dropped"] == 156
+
+    near = NearDuplicateFilter(0.5)
+    signatures, valid = near.signatures(["the quick brown fox jumps over the lazy dog", "", "the quick brown fox jumps over the lazy cat"])
+    assert valid.tolist() == [True, False, True]
+    assert 0.6 < (signatures[0] == signatures[2]).mean() < 1
+    with pytest.raises(ValueError):
+        NearDuplicateFilter(1.5)
+
+
+def test_fetch_llm_training_data_writes_resumable_shards_with_manifest(state):
+    """Sharded output should roll files by sample count or size and keep a checksummed manifest across resumes."""
+    import hashlib
+    import os
+    from datetime import timedelta
+
+    from langfuse_mcp.__main__ import ShardedJSONLWriter
+
+    now = datetime.now(timezone.utc)
+    observations = [
+        {
+            "id": f"gen-{k}",
+            "type": "GENERATION",
+            "start_time": (now - timedelta(seconds=10 * k)).isoformat(),
+            "input": f"prompt {k}",
+            "output": "done",
+            "metadata": {"langgraph_node": "llm_call"},
+        }
+        for k in range(1, 151)
+    ]
+    _serve_generations(state, observations, fail_after_page=1)
+
+    def run(**kwargs):
+        return _run_training(state, output_mode="full_json_file", **kwargs)
+
+    first = run(shard_max_samples=40)
+    assert first["metadata"]["shards"]["complete"] is False
+    assert [shard["samples"] for shard in _manifest(first)["shards"]] == [40, 40, 20]
+
+    _serve_generations(state, observations)
+    resumed = run(langgraph_node=None, resume_from=first["metadata"]["file_path"])
+    manifest = _manifest(resumed)
+    assert resumed["metadata"]["file_path"] == first["metadata"]["file_path"]
+    assert manifest["complete"] is True
+    assert [shard["samples"] for shard in manifest["shards"]] == [40, 40, 40, 30]
+    prompts = []
+    for shard in manifest["shards"]:
+        with open(os.path.join(resumed["metadata"]["shards"]["directory"], shard["file"]), "rb") as f:
+            data = f.read()
+        assert len(data) == shard["bytes"]
+        assert hashlib.sha256(data).hexdigest() == shard["sha256"]
+        prompts.extend(json.loads(line)["prompt"] for line in data.splitlines())
+    assert prompts == [f"prompt {k}" for k in range(1, 151)]
+    assert manifest["total_samples"] == resumed["metadata"]["item_count"] == 150
+    assert not any(name.endswith(".partial") for name in os.listdir(resumed["metadata"]["shards"]["directory"]))
+
+    # A byte limit keeps shards below the limit unless one sample is larger on its own
+    writer = ShardedJSONLWriter(os.path.join(state.dump_dir, "by_size"), max_bytes=100)
+    writer.write([b"x" * 39 + b"\n"] * 5 + [b"y" * 149 + b"\n"])
+    writer.close(complete=True)
+    assert [shard["bytes"] for shard in writer.shards] == [80, 80, 40, 150]
+
+
+def _manifest(result):
+    with open(result["metadata"]["file_path"], encoding="utf-8") as f:
+        return json.load(f)
+
+
+def test_fetch_llm_training_data_formats_each_sample_once(state, monkeypatch):
+    """Samples are formatted once per observation and shared by the incremental file and the result."""
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+    from datetime import timedelta
+
+    import langfuse_mcp.__main__ as main
+
+    now = datetime.now(timezone.utc)
+    observations = [
+        {
+            "id": f"gen-{k}",
+            "type": "GENERATION",
+            "start_time": (now - timedelta(seconds=10 * k)).isoformat(),
+            "input": f"prompt {k}",
+            "output": "" if k % 10 == 0 else f"answer {k}",
+            "metadata": {"langgraph_node": "llm_call"},
+        }
+        for k in range(1, 121)
+    ]
+    _serve_generations(state, observations)
+
+    def run():
+        return _run_training(state, limit=100, output_format="openai", incremental_save=True)
+
+    calls = []
+    format_sample = main._format_training_sample
+    monkeypatch.setattr(main, "_format_training_sample", lambda obs, *args: calls.append(obs["id"]) or format_sample(obs, *args))
+    threaded = run()
+    # 100 observations reach the limit; the 10 without output are counted but not exported
+    assert sorted(calls) == sorted(obs["id"] for obs in observations[:100])
+    assert threaded["metadata"]["item_count"] == 90
+    with open(threaded["metadata"]["incremental_save_file"]["path"], encoding="utf-8") as f:
+        samples = [json.loads(line) for line in f]
+    assert len(samples) == 90 and threaded["data"] == samples[:20]
+
+    # A process pool formats every page in FORMAT_CHUNK_SIZE chunks and yields the same samples in the same order
+    monkeypatch.setattr(main, "_format_training_sample", format_sample)
+    tasks = []
+
+    class CountingPool(ProcessPoolExecutor):
+        def submit(self, fn, *args, **kwargs):
+            tasks.append(len(args[0]))
+            return super().submit(fn, *args, **kwargs)
+
+    state.format_executor = CountingPool(max_workers=2, mp_context=multiprocessing.get_context("fork"))
+    try:
+        state.format_executor.submit(len, [()]).result()  # start the workers before the event loop spawns threads
+        tasks.clear()
+        pooled = run()
+    finally:
+        state.format_executor.shutdown()
+    with open(pooled["metadata"]["incremental_save_file"]["path"], encoding="utf-8") as f:
+        assert [json.loads(line) for line in f] == samples
+    # The 100-observation page that reaches the limit is split across the pool
+    assert tasks == [main.FORMAT_CHUNK_SIZE] * (100 // main.FORMAT_CHUNK_SIZE)
+
+
+def test_fetch_llm_training_data_streams_samples_with_flat_memory(state):
+    """Samples stream to disk; responses carry a preview and memory does not grow with the limit."""
+    import tracemalloc
+    from datetime import timedelta
+
+    now = datetime.now(timezone.utc)
+    _serve_generations(
+        state,
+        [
+            {
+                "id": f"gen-{k}",
+                "type": "GENERATION",
+                "start_time": (now - timedelta(milliseconds=k)).isoformat(),
+                "input": f"prompt {k} " + "context " * 500,
+                "output": f"answer {k}",
+                "metadata": {"langgraph_node": "llm_call"},
+            }
+            for k in range(3000)
+        ],
+    )
+
+    def run(limit, output_mode="compact"):
+        return _run_training(state, limit=limit, output_mode=output_mode, incremental_save=True, fetch_concurrency=2)
+
+    def peak(limit):
+        tracemalloc.start()
+        try:
+            result = run(limit)
+            return tracemalloc.get_traced_memory()[1], result
+        finally:
+            tracemalloc.stop()
+
+    small_peak, small = peak(300)
+    large_peak, large = peak(3000)
+    assert small["metadata"]["item_count"] == 300 and large["metadata"]["item_count"] == 3000
+    assert len(large["data"]) == 20
+    assert large["metadata"]["preview"] == {
+        "samples": 20,
+        "total_samples": 3000,
+        "source": large["metadata"]["incremental_save_file"]["path"],
+    }
+    # Ten times the samples needs far less than ten times the memory
+    assert large_peak < 2 * small_peak
+
+    # The file modes read the streamed samples back, trimmed to the limit
+    dumped = run(150, "full_json_file")
+    assert len(dumped["data"]) == 20
+    with open(dumped["metadata"]["file_path"], encoding="utf-8") as f:
+        assert [sample["prompt"].split()[1] for sample in json.load(f)] == [str(k) for k in range(150)]
+    assert [sample["completion"] for sample in json.loads(run(150, "full_json_string"))] == [f"answer {k}" for k in range(150)]
+
+
+def test_training_data_job_reports_progress_and_can_be_cancelled(state):
+    """Extractions should run as background jobs with progress, results in the dump dir and cancellation."""
+    import os
+    from datetime import timedelta
+
+    from langfuse_mcp.__main__ import (
+        cancel_training_data_job,
+        get_training_data_job,
+        start_training_data_job,
+    )
+
+    now = datetime.now(timezone.utc)
+    observations = [
+        {
+            "id": f"gen-{k}",
+            "type": "GENERATION",
+            "start_time": (now - timedelta(seconds=10 * k)).isoformat(),
+            "input": f"prompt {k}",
+            "output": "done",
+            "metadata": {"langgraph_node": "llm_call"},
+        }
+        for k in range(1, 151)
+    ]
+
+    _serve_generations(state, observations)
+    progress = []
+
+    class ProgressContext(FakeContext):
+        async def report_progress(self, progress_value, total=None, message=None):
+            progress.append((progress_value, total, message))
+
+    async def run():
+        ctx = ProgressContext(state)
+
+        async def start():
+            return await start_training_data_job(
+                ctx,
+                age=60,
+                langgraph_node="llm_call",
+                agent_name=None,
+                ls_model_name=None,
+                limit=1000,
+                output_format="generic",
+                include_metadata=False,
+                fetch_concurrency=1,
+                resume_from=None,
+            )
+
+        started = await start()
+        assert started["data"]["status"] == "queued"
+        await state.jobs.get(started["data"]["job_id"]).task
+        finished = await get_training_data_job(ctx, job_id=started["data"]["job_id"])
+
+        # A job whose pages never arrive keeps running until it is cancelled
+        list_observations = state.api_client.list_observations
+        gate = asyncio.Event()
+
+        async def stalled(**kwargs):
+            await gate.wait()
+            return await list_observations(**kwargs)
+
+        state.api_client.list_observations = stalled
+        stuck = await start()
+        await asyncio.sleep(0.05)
+        listed = await get_training_data_job(ctx, job_id=None)
+        cancelled = await cancel_training_data_job(ctx, job_id=stuck["data"]["job_id"])
+        state.api_client.list_observations = list_observations
+        return finished, listed, cancelled
+
+    finished, listed, cancelled = asyncio.run(run())
+
+    job = finished["data"]
+    assert job["status"] == "completed"
+    assert job["progress"]["samples"] == 150
+    assert job["progress"]["pages"] == 2
+    assert job["result"]["item_count"] == 150
+    assert os.path.dirname(job["result"]["file_path"]) == state.dump_dir
+    assert os.path.exists(os.path.join(state.dump_dir, "jobs", f"{job['job_id']}.json"))
+    assert [entry["status"] for entry in listed["data"]] == ["running", "completed"]
+    assert cancelled["data"]["status"] == "cancelled"
+    assert cancelled["metadata"]["resume_from"].endswith(".jsonl")
+    # Jobs report through their status record, not through the request that started them
+    assert progress == []
+
+    # Direct tool calls stream progress through the request context
+    _run_training(state, ctx=ProgressContext(state))
+    assert any(message.endswith("page 2: 150 samples") for _, _, message in progress)
+    assert progress[-1][:2] == (1000, 1000)
+
+
+def _exception_spans(now, count, interval_minutes=10):
+    """Build SPAN dicts with one exception event each, newest first."""
+    from datetime import timedelta
+
+    return [
+        {
+            "id": f"span-{k}",
+            "trace_id": f"trace-{k % 3}",
+            "type": "SPAN",
+            "start_time": (now - timedelta(minutes=interval_minutes * k)).isoformat(),
+            "metadata": {"code.filepath": "app.py", "code.function": f"handler_{k % 2}"},
+            "events": [{"attributes": {"exception.type": "ValueError", "exception.message": f"bad {k}"}}],
+        }
+        for k in range(1, count + 1)
+    ]
+
+
+def _serve_spans(state, spans):
+    """Serve `spans` filtered by the requested window and paged; returns the call log."""
+    calls = []
+
+    def get_many(**kwargs):
+        calls.append((kwargs["from_start_time"], kwargs["to_start_time"], kwargs["page"]))
+        matching = [
+            span
+            for span in spans
+            if kwargs["from_start_time"] <= datetime.fromisoformat(span["start_time"]) <= kwargs["to_start_time"]
+        ]
+        offset = (kwargs["page"] - 1) * kwargs["limit"]
+        return {"data": matching[offset : offset + kwargs["limit"]], "meta": {}}
+
+    state.langfuse_client.api.observations.get_many = get_many
+    return calls
+
+
+def test_bucket_cache_expires_only_unsettled_buckets():
+    """Settled buckets stay cached; recent buckets are refetched once their TTL passes."""
+    from datetime import timedelta
+
+    from cachetools import LRUCache
+
+    from langfuse_mcp.__main__ import ObservationBucketCache
+
+    cache = ObservationBucketCache(LRUCache(maxsize=100), bucket_seconds=3600, settle_delay=3600, ttl=60)
+    now = datetime(2024, 6, 10, 12, 30, tzinfo=timezone.utc)
+    start = now - timedelta(hours=5)
+
+    hits, runs = cache.lookup("SPAN", start, now, now=now)
+    assert hits == {}
+    assert runs == [(datetime(2024, 6, 10, 7, tzinfo=timezone.utc), datetime(2024, 6, 10, 13, tzinfo=timezone.utc))]
+    cache.store("SPAN", *runs[0], [{"id": "a", "start_time": "2024-06-10T09:15:00+00:00"}], now=now)
+
+    later = now + timedelta(minutes=5)
+    hits, runs = cache.lookup("SPAN", start + timedelta(minutes=5), later, now=later)
+    # 11:00-12:00 and 12:00-13:00 had not settled when fetched and have expired
+    assert runs == [(datetime(2024, 6, 10, 11, tzinfo=timezone.utc), datetime(2024, 6, 10, 13, tzinfo=timezone.utc))]
+    assert len(hits) == 4
+    assert ObservationBucketCache.stitch(hits, start, later) == [{"id": "a", "start_time": "2024-06-10T09:15:00+00:00"}]
+
+
+def test_exception_tools_reuse_cached_buckets(state):
+    """Repeated exception queries over overlapping windows should not refetch cached buckets."""
+    from langfuse_mcp.__main__ import find_exceptions_in_file, get_error_count
+
+    now = datetime.now(timezone.utc)
+    calls = _serve_spans(state, _exception_spans(now, 12))
+    ctx = FakeContext(state)
+
+    first = asyncio.run(get_error_count(ctx, age=180))
+    assert first["data"]["exception_count"] == 12
+    assert first["data"]["trace_count"] == 3
+    fetched = len(calls)
+    assert fetched > 0
+
+    second = asyncio.run(find_exceptions_in_file(ctx, filepath="app.py", age=120, output_mode="compact"))
+    assert len(calls) == fetched
+    assert second["metadata"]["item_count"] == 10
+    assert second["data"][0]["exception_message"] == "bad 1"
+
+
+def test_find_exceptions_scans_every_page(state):
+    """Counts should cover the whole window, not just the first page of spans."""
+    from langfuse_mcp.__main__ import find_exceptions
+
+    now = datetime.now(timezone.utc)
+    calls = _serve_spans(state, _exception_spans(now, 250, interval_minutes=1))
+
+    result = asyncio.run(find_exceptions(FakeContext(state), age=300, group_by="function"))
+
+    assert {item["group"]: item["count"] for item in result["data"]} == {"handler_0": 125, "handler_1": 125}
+    assert result["metadata"]["total_exceptions"] == 250
+    assert result["metadata"]["pages_scanned"] == 3
+    assert len(calls) >= 3
+    assert result["metadata"]["coverage"] == 1.0
+    assert result["metadata"]["failed_ranges"] == []
+
+
+def test_get_error_count_reports_partial_coverage(state):
+    """A failing part of the window should be reported instead of silently dropped."""
+    from datetime import timedelta
+
+    from langfuse_mcp.__main__ import RetryConfig, RetryManager, get_error_count
+
+    state.retry_manager = RetryManager(RetryConfig(max_retries=0))
+    now = datetime.now(timezone.utc)
+    _serve_spans(state, _exception_spans(now, 5, interval_minutes=5))
+    ctx = FakeContext(state)
+    asyncio.run(get_error_count(ctx, age=30))
+
+    def failing_get_many(**kwargs):
+        raise RuntimeError("upstream unavailable")
+
+    state.langfuse_client.api.observations.get_many = failing_get_many
+    result = asyncio.run(get_error_count(ctx, age=6 * 60))
+
+    metadata = result["metadata"]
+    assert result["data"]["exception_count"] == 5
+    assert 0 < metadata["coverage"] < 1
+    assert len(metadata["failed_ranges"]) == 1
+    assert datetime.fromisoformat(metadata["failed_ranges"][0]["to"]) <= now - timedelta(minutes=30)
+    assert metadata["buckets_from_cache"] >= 1
+
+
+def test_exception_tools_answer_from_index(state):
+    """Grouping and file lookups should come from the per-bucket index, rebuilt if evicted."""
+    from langfuse_mcp.__main__ import find_exceptions, find_exceptions_in_file
+
+    now = datetime.now(timezone.utc)
+    spans = _exception_spans(now, 20, interval_minutes=5)
+    for span in spans[::4]:
+        span["metadata"] = {"code.filepath": "worker.py", "code.function": "run"}
+        span["events"].append({"attributes": {"exception.type": "KeyError"}})
+    calls = _serve_spans(state, spans)
+    ctx = FakeContext(state)
+
+    by_type = asyncio.run(find_exceptions(ctx, age=180, group_by="type"))
+    assert {item["group"]: item["count"] for item in by_type["data"]} == {"ValueError": 20, "KeyError": 5}
+    fetched = len(calls)
+
+    # Postings are evicted independently of the cached buckets and rebuilt without refetching
+    state.exceptions_by_filepath.clear()
+    state.file_to_observations_map.clear()
+    by_file = asyncio.run(find_exceptions(ctx, age=180, group_by="file"))
+    assert {item["group"]: item["count"] for item in by_file["data"]} == {"app.py": 15, "worker.py": 10}
+    in_file = asyncio.run(find_exceptions_in_file(ctx, filepath="worker.py", age=180, output_mode="compact"))
+    assert in_file["metadata"]["total_exceptions"] == 10
+    assert {item["exception_type"] for item in in_file["data"]} == {"ValueError", "KeyError"}
+    assert len(calls) == fetched
+
+
+def test_exception_scans_cache_compact_span_records(state):
+    """Scans keep only the span fields the exception tools read, as slotted records."""
+    from langfuse_mcp.__main__ import SpanRecord, get_error_count
+
+    now = datetime.now(timezone.utc)
+    spans = _exception_spans(now, 6)
+    for span in spans:
+        span["input"] = {"query": "x" * 10_000}
+        span["metadata"]["code.lineno"] = 7
+    spans.append({"id": "quiet", "trace_id": "trace-9", "start_time": now.isoformat(), "events": [{"attributes": {}}]})
+    _serve_spans(state, spans)
+
+    result = asyncio.run(get_error_count(FakeContext(state), age=120))
+    assert result["data"] == {**result["data"], "exception_count": 6, "observation_count": 6, "trace_count": 3}
+
+    cached = [record for bucket in state.observation_cache.values() for record in bucket.observations]
+    assert len(cached) == 6 and all(isinstance(record, SpanRecord) for record in cached)
+    assert not hasattr(cached[0], "__dict__")
+    record = min(cached, key=lambda record: record.id)
+    assert (record.id, record.trace_id, record.filepath, record.function, record.lineno) == ("span-1", "trace-1", "app.py", "handler_1", 7)
+    assert record.exceptions == (("ValueError", "bad 1", ""),)
+    assert SpanRecord.from_item(spans[-1]) is None
+
+
+def _serve_user_traces(state, traces):
+    """Serve `traces` (newest first) through the trace listing, honoring paging and filters; return the request log."""
+    calls = []
+
+    def list_traces(**kwargs):
+        calls.append(kwargs)
+        matching = [
+            trace
+            for trace in traces
+            if (kwargs.get("session_id") is None or trace["session_id"] == kwargs["session_id"])
+            and (kwargs.get("to_timestamp") is None or trace["timestamp"] <= kwargs["to_timestamp"].isoformat())
+        ]
+        limit, page = kwargs["limit"], kwargs["page"]
+        data = matching[(page - 1) * limit : page * limit]
+        return {"data": data, "meta": {"total": len(matching), "total_pages": -(-len(matching) // limit)}}
+
+    state.langfuse_client.api.trace.list = list_traces
+    return calls
+
+
+def test_get_user_sessions_pages_and_limits_sessions(state):
+    """All pages of the user's traces are grouped; a limit stops the walk and completes only the kept sessions."""
+    from langfuse_mcp.__main__ import get_user_sessions
+
+    now = datetime.now(timezone.utc).replace(microsecond=0)
+    # 250 traces, newest first: the newest session interleaves with session "s-1" and reaches back past page 1.
+    traces = []
+    for k in range(250):
+        session_id = "s-0" if k % 2 == 0 and k < 160 else f"s-{1 + k // 40}"
+        timestamp = (now - timedelta(minutes=k)).isoformat()
+        traces.append({"id": f"t-{k}", "session_id": session_id, "timestamp": timestamp, "user_id": "u"})
+    traces.append({"id": "t-none", "session_id": None, "timestamp": (now - timedelta(minutes=300)).isoformat(), "user_id": "u"})
+    expected = {}
+    for trace in traces:
+        if trace["session_id"]:
+            expected[trace["session_id"]] = expected.get(trace["session_id"], 0) + 1
+
+    calls = _serve_user_traces(state, traces)
+    ctx = FakeContext(state)
+    sessions = json.loads(
+        asyncio.run(get_user_sessions(ctx, user_id="u", age=600, include_observations=False, limit=None, output_mode="full_json_string"))
+    )
+    assert {session["id"]: session["trace_count"] for session in sessions} == expected
+    assert sorted(call["page"] for call in calls) == [1, 2, 3]
+    newest = sessions[0]
+    assert newest["id"] == "s-0"
+    assert (newest["last_timestamp"], newest["first_timestamp"]) == (traces[0]["timestamp"], traces[158]["timestamp"])
+
+    result = asyncio.run(get_user_sessions(ctx, user_id="u", age=600, include_observations=False, limit=None, output_mode="compact"))
+    assert result["metadata"]["trace_count"] == 250 and result["metadata"]["has_more"] is False
+
+    calls.clear()
+    sessions = json.loads(
+        asyncio.run(get_user_sessions(ctx, user_id="u", age=600, include_observations=False, limit=2, output_mode="full_json_string"))
+    )
+    assert [session["id"] for session in sessions] == ["s-0", "s-1"]
+    assert [session["trace_count"] for session in sessions] == [expected["s-0"], expected["s-1"]]
+    assert len({trace["id"] for session in sessions for trace in session["traces"]}) == expected["s-0"] + expected["s-1"]
+    user_pages = [call for call in calls if call.get("session_id") is None]
+    assert [call["page"] for call in user_pages] == [1]
+    assert {call["session_id"] for call in calls if call.get("session_id")} == {"s-0", "s-1"}
+    result = asyncio.run(get_user_sessions(ctx, user_id="u", age=600, include_observations=False, limit=2, output_mode="compact"))
+    assert result["metadata"]["item_count"] == 2 and result["metadata"]["has_more"] is True
+
+
+def test_get_session_details_pages_from_session_start_and_caches_idle_sessions(state):
+    """All trace pages of a session are fetched from its start; idle sessions are served from memory."""
+    from langfuse_mcp.__main__ import get_session_details
+
+    now = datetime.now(timezone.utc).replace(microsecond=0)
+
+    def session_traces(session_id, newest, count):
+        return [
+            {"id": f"{session_id}-{k}", "session_id": session_id, "timestamp": (newest - timedelta(seconds=k)).isoformat(), "user_id": "u"}
+            for k in range(count)
+        ]
+
+    idle = session_traces("idle", now - timedelta(hours=3), 230)
+    active = session_traces("active", now, 30)
+    calls = _serve_user_traces(state, sorted(idle + active, key=lambda trace: trace["timestamp"], reverse=True))
+    sessions = {"idle": idle, "active": active}
+    state.langfuse_client.api.sessions.get = lambda session_id: (
+        {"id": session_id, "created_at": sessions[session_id][-1]["timestamp"], "traces": []} if session_id in sessions else {}
+    )
+    ctx = FakeContext(state)
+
+    def details(session_id):
+        return json.loads(
+            asyncio.run(
+                get_session_details(ctx, session_id=session_id, include_observations=False, fields=None, output_mode="full_json_string")
+            )
+        )
+
+    session = details("idle")
+    assert session["trace_count"] == 230 and len({trace["id"] for trace in session["traces"]}) == 230
+    assert (session["first_timestamp"], session["last_timestamp"]) == (idle[-1]["timestamp"], idle[0]["timestamp"])
+    assert sorted(call["page"] for call in calls) == [1, 2, 3]
+    assert {call["from_timestamp"].isoformat() for call in calls} == {idle[-1]["timestamp"]}
+
+    calls.clear()
+    assert details("idle") == session
+    compact = asyncio.run(get_session_details(ctx, session_id="idle", include_observations=False, fields=None, output_mode="compact"))
+    assert calls == [] and compact["metadata"]["cached"] is True
+
+    assert details("active")["trace_count"] == 30
+    assert details("active")["trace_count"] == 30
+    assert len(calls) == 2
+
+    calls.clear()
+    assert details("missing")["found"] is False
+    assert calls == []